@@ -0,0 +1,398 @@
+"""
+Benchmarks prompt generation against synthetic schemas: many tables, wide tables and large tables.
+
+SQLite fixtures are generated on the fly. PostgreSQL and MySQL fixtures are created on the servers
+named by LLM_SQL_PROMPT_BENCH_POSTGRES and LLM_SQL_PROMPT_BENCH_MYSQL (one schema/database per
+fixture, prefixed `bench_`), and skipped when a variable is unset or the server is unreachable.
+Fixtures are reused across runs.
+
+Every case runs in a fresh process, and reports wall time, round trips (statements sent to the
+database), peak RSS and prompt size. Results can be saved with --save and compared to a previous run
+with --baseline.
+
+    uv run python benchmarks/bench.py --fixtures tables-10,wide-520 --strategies auto,random
+
+--formats sql,compact runs every case with both renderings, to compare prompt tokens.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+BACKENDS = ["sqlite", "postgres", "mysql"]
+STRATEGIES = ["auto", "fast", "random"]
+
+
+@dataclass
+class Fixture:
+    name: str
+    tables: int
+    # including the `id` primary key and the `parent_id` foreign key
+    columns: int
+    rows: int
+
+
+FIXTURES = {
+    fixture.name: fixture
+    for fixture in [
+        Fixture("tables-10", 10, 8, 1_000),
+        Fixture("tables-1000", 1_000, 8, 10),
+        Fixture("tables-10000", 10_000, 6, 3),
+        Fixture("wide-520", 3, 520, 100),
+        Fixture("rows-2m", 2, 8, 2_000_000),
+    ]
+}
+DEFAULT_FIXTURES = ["tables-10", "tables-1000", "wide-520", "rows-2m"]
+
+# column types cycle through these, after `id` and `parent_id`
+COLUMN_TYPES = {
+    "sqlite": ["INTEGER", "TEXT", "REAL"],
+    "postgres": ["bigint", "text", "double precision"],
+    "mysql": ["BIGINT", "VARCHAR(64)", "DOUBLE"],
+}
+ID_TYPES = {"sqlite": "INTEGER", "postgres": "bigint", "mysql": "BIGINT"}
+
+
+def table_name(index: int) -> str:
+    return f"t{index:05d}"
+
+
+def create_table_sql(backend: str, fixture: Fixture, index: int, prefix: str = "") -> str:
+    id_type = ID_TYPES[backend]
+    columns = [f"id {id_type} PRIMARY KEY"]
+    if index:
+        # every table but the first references the first, so foreign keys are introspected too
+        columns.append(f"parent_id {id_type} REFERENCES {prefix}{table_name(0)}(id)")
+    else:
+        columns.append(f"parent_id {id_type}")
+
+    types = COLUMN_TYPES[backend]
+    for column in range(2, fixture.columns):
+        columns.append(f"c{column} {types[column % len(types)]}")
+
+    return f"CREATE TABLE {prefix}{table_name(index)} ({', '.join(columns)})"
+
+
+def column_values(backend: str, fixture: Fixture, n: str) -> list[str]:
+    "SQL expressions for a row's values, computed from the row number `n`"
+    values = [n, "1" if backend != "postgres" else "1::bigint"]
+    for column in range(2, fixture.columns):
+        kind = column % 3
+        if kind == 0:
+            values.append(f"{n} * {column}")
+        elif kind == 1:
+            values.append(
+                f"CONCAT('value ', {n})" if backend == "mysql" else f"'value ' || {n}"
+            )
+        else:
+            values.append(f"{n} / 7.0")
+
+    return values
+
+
+def create_sqlite_fixture(path: Path, fixture: Fixture):
+    partial = path.with_suffix(".partial")
+    partial.unlink(missing_ok=True)
+
+    with sqlite3.connect(partial) as conn:
+        for index in range(fixture.tables):
+            conn.execute(create_table_sql("sqlite", fixture, index))
+            conn.execute(
+                f"""
+                WITH RECURSIVE series(n) AS (
+                  SELECT 1 WHERE {fixture.rows} > 0
+                  UNION ALL SELECT n + 1 FROM series WHERE n < {fixture.rows}
+                )
+                INSERT INTO {table_name(index)}
+                SELECT {', '.join(column_values('sqlite', fixture, 'n'))} FROM series
+                """
+            )
+    conn.close()
+
+    partial.rename(path)
+
+
+def create_postgres_fixture(db_url: str, fixture: Fixture) -> str:
+    import psycopg
+
+    schema = f"bench_{fixture.name.replace('-', '_')}"
+    with psycopg.connect(db_url, autocommit=True) as conn:
+        exists = conn.execute(
+            "SELECT obj_description(oid, 'pg_namespace') FROM pg_namespace WHERE nspname = %s",
+            (schema,),
+        ).fetchone()
+        if exists and exists[0] == "complete":
+            return schema
+
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+        with conn.transaction():
+            for index in range(fixture.tables):
+                conn.execute(create_table_sql("postgres", fixture, index, f"{schema}."))
+                conn.execute(
+                    f"""
+                    INSERT INTO {schema}.{table_name(index)}
+                    SELECT {', '.join(column_values('postgres', fixture, 'n'))}
+                    FROM generate_series(1, {fixture.rows}) n
+                    """
+                )
+        conn.execute("ANALYZE")
+        conn.execute(f"COMMENT ON SCHEMA {schema} IS 'complete'")
+
+    return schema
+
+
+def create_mysql_fixture(db_url: str, fixture: Fixture) -> str:
+    from llm_sql_prompt.mysql import connect_to_mysql
+
+    database = f"bench_{fixture.name.replace('-', '_')}"
+    conn = connect_to_mysql(db_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT SCHEMA_COMMENT FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = %s",
+                (database,),
+            )
+            exists = cursor.fetchall()
+            if exists and exists[0][0] == "complete":
+                return database
+
+            cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+            cursor.execute(f"CREATE DATABASE {database}")
+            cursor.execute(f"SET SESSION cte_max_recursion_depth = {max(fixture.rows, 1000)}")
+
+            for index in range(fixture.tables):
+                cursor.execute(create_table_sql("mysql", fixture, index, f"{database}."))
+                if fixture.rows:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {database}.{table_name(index)}
+                        WITH RECURSIVE series(n) AS (
+                          SELECT 1 UNION ALL SELECT n + 1 FROM series WHERE n < {fixture.rows}
+                        )
+                        SELECT {', '.join(column_values('mysql', fixture, 'n'))} FROM series
+                        """
+                    )
+                conn.commit()
+
+            cursor.execute(f"ALTER DATABASE {database} COMMENT = 'complete'")
+    finally:
+        conn.close()
+
+    return database
+
+
+def prepare(backend: str, fixture: Fixture, data_dir: Path) -> dict | None:
+    "Create the fixture if needed, returns the arguments of a case, None if the backend is unavailable"
+    if backend == "sqlite":
+        path = data_dir / f"{fixture.name}.db"
+        if not path.exists():
+            create_sqlite_fixture(path, fixture)
+        return {"db_url": str(path), "schema": None}
+
+    env = f"LLM_SQL_PROMPT_BENCH_{backend.upper()}"
+    db_url = os.environ.get(env)
+    if not db_url:
+        return None
+
+    create = create_postgres_fixture if backend == "postgres" else create_mysql_fixture
+    try:
+        return {"db_url": db_url, "schema": create(db_url, fixture)}
+    except Exception as e:
+        print(f"skipping {backend} {fixture.name}: {e}", file=sys.stderr)
+        return None
+
+
+def count_round_trips(dialect) -> list[int]:
+    """
+    Count the statements every connection of `dialect` sends, by wrapping the driver's cursors. On
+    SQLite, which has no round trips, this counts statements including the ones behind table-valued
+    pragmas.
+    """
+    counter = [0]
+
+    if dialect.name == "PostgreSQL":
+        import psycopg
+
+        execute = psycopg.AsyncCursor.execute
+
+        async def counted_execute(self, *args, **kwargs):
+            counter[0] += 1
+            return await execute(self, *args, **kwargs)
+
+        psycopg.AsyncCursor.execute = counted_execute
+    elif dialect.name == "MySQL":
+        import mysql.connector.cursor
+
+        cursor_classes = [mysql.connector.cursor.MySQLCursor]
+        try:
+            import mysql.connector.cursor_cext
+
+            cursor_classes.append(mysql.connector.cursor_cext.CMySQLCursor)
+        except ImportError:
+            pass
+
+        for cursor_class in cursor_classes:
+
+            def counted_execute(self, *args, __execute=cursor_class.execute, **kwargs):
+                counter[0] += 1
+                return __execute(self, *args, **kwargs)
+
+            cursor_class.execute = counted_execute
+    else:
+        connect = dialect.connect
+
+        async def counted_connect():
+            conn = await connect()
+            conn.set_trace_callback(lambda statement: counter.__setitem__(0, counter[0] + 1))
+            return conn
+
+        dialect.connect = counted_connect
+
+    return counter
+
+
+def run_case(case: dict) -> dict:
+    "Runs in the benchmark's child process"
+    import asyncio
+    import io
+    import resource
+
+    from llm_sql_prompt.dialect import get_dialect
+    from llm_sql_prompt.output import PromptWriter
+    from llm_sql_prompt.prompt import PromptOptions, generate_prompt
+
+    dialect = get_dialect(case["db_url"], schema=case["schema"])
+    round_trips = count_round_trips(dialect)
+    options = PromptOptions(
+        all_tables=True,
+        include_data=case["include_data"],
+        sample_strategy=case["strategy"],
+        jobs=case["jobs"],
+        format=case.get("format", "sql"),
+    )
+    buffer = io.StringIO()
+    writer = PromptWriter(buffer)
+
+    start = time.perf_counter()
+    asyncio.run(generate_prompt(dialect, options, writer))
+    wall = time.perf_counter() - start
+
+    # kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+
+    return {
+        "wall_seconds": round(wall, 3),
+        "round_trips": round_trips[0],
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "prompt_bytes": len(buffer.getvalue().encode()),
+        "prompt_tokens": writer.tokens,
+    }
+
+
+def case_key(result: dict) -> str:
+    data = "data" if result["include_data"] else "no-data"
+    return (
+        f"{result['backend']} {result['fixture']} {result['strategy']} {data}"
+        f" {result.get('format', 'sql')} jobs={result['jobs']}"
+    )
+
+
+def format_delta(value, baseline) -> str:
+    if baseline is None or not baseline:
+        return ""
+    return f" ({(value - baseline) / baseline:+.0%})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--fixtures", default=",".join(DEFAULT_FIXTURES), help=f"any of {', '.join(FIXTURES)}")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--formats", default="sql", help="any of sql, compact")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--no-data", action="store_true", help="also run every case without sampling")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "llm-sql-prompt-bench")
+    parser.add_argument("--save", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare to results saved with --save")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    baseline = {}
+    if args.baseline:
+        baseline = {case_key(result): result for result in json.loads(args.baseline.read_text())}
+
+    results = []
+    print(
+        f"{'case':<60} {'wall s':>14} {'round trips':>16} {'peak RSS MB':>12} {'prompt KB':>10}"
+        f" {'prompt tokens':>20}"
+    )
+    for backend in args.backends.split(","):
+        for fixture_name in args.fixtures.split(","):
+            fixture = FIXTURES[fixture_name]
+            prepared = prepare(backend, fixture, args.data_dir)
+            if prepared is None:
+                continue
+
+            cases = [
+                (strategy, include_data, output_format)
+                for strategy in args.strategies.split(",")
+                for include_data in ([True, False] if args.no_data else [True])
+                for output_format in args.formats.split(",")
+            ]
+            for strategy, include_data, output_format in cases:
+                case = {
+                    **prepared,
+                    "backend": backend,
+                    "fixture": fixture.name,
+                    "strategy": strategy,
+                    "include_data": include_data,
+                    "format": output_format,
+                    "jobs": args.jobs,
+                }
+                process = subprocess.run(
+                    [sys.executable, __file__, "--run-case", json.dumps(case)],
+                    capture_output=True,
+                    text=True,
+                )
+                if process.returncode:
+                    print(f"{case_key(case)} failed:\n{process.stderr}", file=sys.stderr)
+                    continue
+
+                result = {**case, **json.loads(process.stdout.splitlines()[-1])}
+                del result["db_url"]
+                results.append(result)
+
+                previous = baseline.get(case_key(result), {})
+                print(
+                    f"{case_key(result):<60}"
+                    f" {result['wall_seconds']:>7.3f}{format_delta(result['wall_seconds'], previous.get('wall_seconds')):>7}"
+                    f" {result['round_trips']:>9}{format_delta(result['round_trips'], previous.get('round_trips')):>7}"
+                    f" {result['peak_rss_mb']:>12.1f}"
+                    f" {result['prompt_bytes'] / 1024:>10.1f}"
+                    f" {result['prompt_tokens']:>12}{format_delta(result['prompt_tokens'], previous.get('prompt_tokens')):>8}"
+                )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures CLI startup: wall time of `--version`, a SQLite run and a bare `import`, and which database
+drivers each of them imports. Driver imports are what dominate startup, so only the backend a run
+actually uses should show up.
+
+    python benchmarks/import_time.py [--runs 10]
+"""
+
+import argparse
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# modules which should only be imported by runs against their backend
+HEAVY_MODULES = ["psycopg", "mysql.connector", "asyncio"]
+
+# runs the CLI in-process, then reports which heavy modules it imported
+RUNNER = """
+import sys
+from llm_sql_prompt import main
+try:
+    main(sys.argv[1:], standalone_mode=False)
+finally:
+    heavy = [m for m in {heavy!r} if m in sys.modules]
+    print("imported:" + ",".join(heavy), file=sys.stderr)
+"""
+
+
+def create_database(path: Path):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.executemany(
+            "INSERT INTO users (email) VALUES (?)", [(f"u{i}@x",) for i in range(100)]
+        )
+
+
+def measure(args: list[str], runs: int) -> tuple[float, str]:
+    "Median wall time in milliseconds and the heavy modules imported"
+    timings = []
+    imported = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", RUNNER.format(heavy=HEAVY_MODULES), *args],
+            capture_output=True,
+            text=True,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+
+        for line in result.stderr.splitlines():
+            if line.startswith("imported:"):
+                imported = line.removeprefix("imported:")
+
+    return statistics.median(timings), imported or "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        create_database(db_path)
+
+        baseline = [sys.executable, "-c", "pass"]
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            subprocess.run(baseline)
+        interpreter = (time.perf_counter() - start) * 1000 / args.runs
+
+        cases = {
+            "--version": ["--version"],
+            "sqlite --no-data": [str(db_path), "users", "--no-data"],
+            "sqlite": [str(db_path), "users"],
+        }
+
+        print(f"{'case':<20} {'median ms':>10} {'over python':>12}  heavy imports")
+        print(f"{'python -c pass':<20} {interpreter:>10.1f} {0:>12.1f}  -")
+        for name, cli_args in cases.items():
+            median, imported = measure(cli_args, args.runs)
+            print(f"{name:<20} {median:>10.1f} {median - interpreter:>12.1f}  {imported}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,48 @@
-from pathlib import Path
+import logging
+import os
+import sys
+from importlib import import_module
+from typing import TextIO
 import click
-from importlib.metadata import version as get_version
-from . import sqlite
-from . import postgres
-from . import mysql
+from .cache import DEFAULT_CACHE_TTL
+from .compact import DEFAULT_FORMAT, FORMATS
+from .ranking import DEFAULT_TOP_K
+from .safe_mode import DEFAULT_SAFE_TIMEOUT
+from .sampling import DEFAULT_SAMPLE_STRATEGY, SAMPLE_STRATEGIES
 
+# The CLI is run from editor hooks, where startup time is what users feel. asyncio, the prompt
+# generator and the database drivers are only imported once a prompt is actually generated, and
+# the library API below is resolved on first access.
+LAZY_EXPORTS = {
+    "Dialect": ".dialect",
+    "get_dialect": ".dialect",
+    "PromptOptions": ".prompt",
+    "generate_prompt": ".prompt",
+    "render_prompt": ".prompt",
+    "PromptWriter": ".output",
+}
 
-@click.command()
+
+def __getattr__(name):
+    if name in LAZY_EXPORTS:
+        return getattr(import_module(LAZY_EXPORTS[name], __name__), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class PromptCommand(click.Command):
+    "`llm-sql-prompt serve ...` starts the prompt server, anything else generates a prompt"
+
+    def main(self, args=None, prog_name=None, **kwargs):
+        args = sys.argv[1:] if args is None else list(args)
+        if args[:1] == ["serve"]:
+            prog_name = prog_name or os.path.basename(sys.argv[0])
+            return serve.main(args[1:], f"{prog_name} serve", **kwargs)
+
+        return super().main(args, prog_name, **kwargs)
+
+
+@click.command(cls=PromptCommand)
 @click.argument(
     "database_url",
     required=False,
@@ -24,37 +60,392 @@ from . import mysql
     default=False,
     help="Exclude sample data from the generated prompt.",
 )
+@click.option(
+    "--stats",
+    is_flag=True,
+    default=False,
+    help="Add per-column statistics (distinct values, NULLs, common values, ranges) from the planner's statistics, without scanning tables.",
+)
+@click.option(
+    "--sample-strategy",
+    type=click.Choice(SAMPLE_STRATEGIES),
+    default=DEFAULT_SAMPLE_STRATEGY,
+    show_default=True,
+    help="How sample rows are picked. 'auto' only sorts small tables with ORDER BY RANDOM() and samples larger ones (TABLESAMPLE, primary key probes), 'fast' always samples, 'random' always does a full ORDER BY RANDOM() scan.",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of connections used to describe and sample tables concurrently.",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    default=False,
+    help="Cache introspected schemas on disk, reusing them until the database schema changes.",
+)
+@click.option(
+    "--cache-ttl",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CACHE_TTL,
+    show_default=True,
+    help="Seconds a cached schema may be reused, even if the schema has not changed.",
+)
+@click.option(
+    "--immutable",
+    is_flag=True,
+    default=False,
+    help="SQLite only: open the database file as immutable, skipping all locking. Only safe if nothing is writing to it.",
+)
+@click.option(
+    "--safe",
+    is_flag=True,
+    default=False,
+    help="For production databases and replicas: read-only connections, statement and lock timeouts, and tables that take longer than --table-timeout to read are described without sample rows.",
+)
+@click.option(
+    "--table-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_SAFE_TIMEOUT,
+    show_default=True,
+    help="Seconds a table's statistics and sample rows may take in --safe mode.",
+)
+@click.option(
+    "--max-tokens",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Approximate token budget for the prompt. Once reached, remaining tables are listed by name instead of being introspected.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w"),
+    default="-",
+    help="Write the prompt to this file instead of stdout.",
+)
+@click.option(
+    "--query",
+    "-q",
+    default=None,
+    help="Natural language question. Only the tables most relevant to it, and the tables they reference, are included.",
+)
+@click.option(
+    "--top-k",
+    type=click.IntRange(min=1),
+    default=DEFAULT_TOP_K,
+    show_default=True,
+    help="Number of tables picked for --query, before adding referenced tables.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(FORMATS),
+    default=DEFAULT_FORMAT,
+    show_default=True,
+    help="'compact' groups columns by type, shortens foreign keys and shows sample rows as a table, for fewer tokens.",
+)
+@click.option(
+    "--max-columns",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only show this many columns of each table (compact format).",
+)
+@click.option(
+    "--since",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Snapshot file of a previous run. Only tables whose definition changed since are introspected and sampled again, the others are copied from the snapshot, which is then updated.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running and rewrite the --output file whenever the schema changes, only describing the changed tables again. Stop with Ctrl-C.",
+)
+@click.option(
+    "--watch-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=5,
+    show_default=True,
+    help="Seconds between two checks of the catalog in --watch mode, on MySQL and on PostgreSQL without the event trigger.",
+)
+@click.option(
+    "--schema",
+    default=None,
+    help="Describe the tables of this schema (PostgreSQL) or database (MySQL) instead of the default one.",
+)
+@click.option(
+    "--batch",
+    "manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="TOML manifest of database URLs and schemas. Writes one prompt file per database and schema to --output-dir, in a single process.",
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    default=".",
+    show_default=True,
+    help="Directory the --batch prompt files are written to.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print how long every phase, query and table took to stderr.",
+)
+@click.option(
+    "--profile-output",
+    type=click.File("w"),
+    default=None,
+    help="Write every query's label, phase, table, duration, rows and bytes to this file.",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["json", "trace"]),
+    default="json",
+    show_default=True,
+    help="Format of --profile-output: plain JSON, or a Chrome trace for chrome://tracing and Perfetto.",
+)
 @click.option(
     "--version",
     is_flag=True,
     default=False,
     help="Show the version and exit.",
 )
-def main(database_url, table_names: tuple[str], all: bool, no_data: bool, version: bool):
+def main(
+    database_url,
+    table_names: tuple[str],
+    all: bool,
+    no_data: bool,
+    stats: bool,
+    sample_strategy: str,
+    jobs: int,
+    cache: bool,
+    cache_ttl: int,
+    immutable: bool,
+    safe: bool,
+    table_timeout: float,
+    max_tokens: int | None,
+    output: TextIO,
+    query: str | None,
+    top_k: int,
+    output_format: str,
+    max_columns: int | None,
+    since: str | None,
+    watch: bool,
+    watch_interval: float,
+    schema: str | None,
+    manifest: str | None,
+    output_dir: str,
+    profile: bool,
+    profile_output: TextIO | None,
+    profile_format: str,
+    version: bool,
+):
     """
     Generate a prompt for a table in a database for use in chatgpt or other LLMs to help write SQL.
 
     - DATABASE_URL Could be a file path or a database url reference. Supports sqlite, postgres, and mysql.
 
     - TABLE_NAME Name of the table to generate a prompt for. If not provided, will generate a prompt for all tables in the database.
+
+    Run `llm-sql-prompt serve --help` for the long-running prompt server.
     """
     if version:
+        from importlib.metadata import version as get_version
+
         print(get_version("llm-sql-prompt"))
         return
-    
-    if not database_url:
-        print("Error: DATABASE_URL is required when not using --version")
-        exit(1)
-    
+
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    )
+
+    import asyncio
+    from contextlib import nullcontext
+
+    from .batch import read_manifest, run_batch
+    from .profiling import Profiler
+    from .prompt import PromptOptions
+
     # Convert the no_data flag to include_data parameter (inverse logic)
     include_data = not no_data
 
-    if "postgresql" in database_url:
-        postgres.describe_database_and_table(database_url, table_names, all, include_data)
-    elif "mysql" in database_url:
-        mysql.describe_database_and_table(database_url, table_names, all, include_data)
-    elif ("sqlite" in database_url) or Path(database_url).exists():
-        sqlite.describe_database_and_table(database_url, table_names, all, include_data)
+    if not cache:
+        cache_ttl = None
+
+    safe_timeout = table_timeout if safe else None
+
+    options = PromptOptions(
+        include_data=include_data,
+        stats=stats,
+        sample_strategy=sample_strategy,
+        jobs=jobs,
+        cache_ttl=cache_ttl,
+        query=query,
+        top_k=top_k,
+        format=output_format,
+        max_columns=max_columns,
+    )
+
+    if watch and (manifest or output.name == "<stdout>"):
+        print("Error: --watch needs an --output file, and can't be combined with --batch")
+        exit(1)
+
+    if manifest:
+        job = run_batch(read_manifest(manifest), options, output_dir, immutable, max_tokens, safe_timeout)
     else:
+        job = prompt_job(database_url, table_names, all, since, schema, immutable, safe_timeout, output, max_tokens, options, watch_interval if watch else None)
+
+    with Profiler() if profile or profile_output else nullcontext() as profiler:
+        try:
+            # batch mode returns the failed targets
+            failed = asyncio.run(job)
+        except KeyboardInterrupt:
+            # the only way out of watch mode
+            failed = None
+
+    if profile:
+        profiler.print_summary()
+    if profile_output and profile_format == "trace":
+        profiler.write_chrome_trace(profile_output)
+    elif profile_output:
+        profiler.write_json(profile_output)
+
+    if failed:
+        exit(1)
+
+
+def prompt_job(database_url, table_names, all, since, schema, immutable, safe_timeout, output, max_tokens, options, watch_interval=None):
+    """
+    The coroutine generating a single prompt, after validating the arguments. With a
+    `watch_interval`, the coroutine keeps the output file up to date instead.
+    """
+    from .dialect import get_dialect
+    from .output import PromptWriter
+    from .prompt import generate_prompt
+    from .watch import watch_prompt
+
+    if not database_url:
+        print("Error: DATABASE_URL is required when not using --version or --batch")
+        exit(1)
+
+    try:
+        dialect = get_dialect(database_url, immutable, schema, safe_timeout)
+    except ValueError as e:
+        # e.g. --schema for a SQLite database
+        print(f"Error: {e}")
+        exit(1)
+
+    if dialect is None:
         print("Unknown database type. If you are referencing a SQLite database, make sure you've specified a valid file path")
         exit(1)
+
+    if not table_names and not all and not options.query:
+        print_table_name_options(dialect)
+        exit(1)
+
+    options.table_names = list(table_names)
+    options.all_tables = all
+    options.since = since
+    if watch_interval:
+        return watch_prompt(dialect, options, output.name, max_tokens, watch_interval)
+    return generate_prompt(dialect, options, PromptWriter(output, max_tokens))
+
+
+def print_table_name_options(dialect):
+    """Print available table names when none are provided."""
+    import asyncio
+
+    from .prompt import get_table_names
+
+    table_list = asyncio.run(get_table_names(dialect))
+    formatted_table_list = "\n- ".join(table_list)
+
+    print(
+        f"""
+No table name provided. Please provide a table name from the list below, or use --all:
+
+- {formatted_table_list}
+        """
+    )
+
+
+@click.command()
+@click.option(
+    "--host",
+    default="127.0.0.1",
+    show_default=True,
+    help="Interface to listen on.",
+)
+@click.option(
+    "--port",
+    type=click.IntRange(min=0, max=65535),
+    default=8765,
+    show_default=True,
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Listen on this Unix socket instead of a TCP port.",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Connections kept open per database.",
+)
+@click.option(
+    "--immutable",
+    is_flag=True,
+    default=False,
+    help="Open SQLite databases without locking (only if nothing writes to them).",
+)
+@click.option(
+    "--safe",
+    is_flag=True,
+    default=False,
+    help="For production databases and replicas: read-only connections, statement and lock timeouts, and tables that take longer than --table-timeout to read are described without sample rows.",
+)
+@click.option(
+    "--table-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_SAFE_TIMEOUT,
+    show_default=True,
+    help="Seconds a table's statistics and sample rows may take in --safe mode.",
+)
+def serve(
+    host: str,
+    port: int,
+    socket_path: str | None,
+    jobs: int,
+    immutable: bool,
+    safe: bool,
+    table_timeout: float,
+):
+    """
+    Serve prompts over HTTP, keeping connections and introspected schemas warm between requests.
+
+    POST a JSON object to /prompt with `url` and `tables`, `all` or `query`, plus any of `schema`,
+    `include_data`, `stats`, `sample_strategy`, `top_k`, `format`, `max_columns` and `max_tokens`.
+    """
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    )
+
+    import asyncio
+
+    from .server import serve as run_server
+
+    try:
+        asyncio.run(
+            run_server(host, port, socket_path, jobs, immutable, table_timeout if safe else None)
+        )
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,163 @@
+"""
+Batch mode: generate one prompt file per database and schema listed in a manifest, in a single
+process. Targets on the same database share a connection pool, and on PostgreSQL every schema of a
+database is introspected in one catalog pass (which bypasses the schema cache).
+
+The manifest is a TOML file:
+
+    [[databases]]
+    url = "postgresql://localhost/app"
+    schemas = ["tenant_a", "tenant_b"]  # optional, the default schema otherwise
+    tables = ["users", "orders"]        # optional, all tables otherwise
+    name = "app"                        # optional, output file name, the database name otherwise
+"""
+
+import logging
+import tomllib
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from urllib.parse import urlparse
+
+from llm_sql_prompt import profiling
+from llm_sql_prompt.concurrency import ConnectionPool
+from llm_sql_prompt.dialect import get_dialect
+from llm_sql_prompt.output import PromptWriter
+from llm_sql_prompt.prompt import PromptOptions, write_prompt
+from llm_sql_prompt.schema import Table
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchTarget:
+    db_url: str
+    # output file name, without the extension
+    name: str
+    schema: str | None = None
+    table_names: list[str] = field(default_factory=list)
+
+
+def read_manifest(path: str | Path) -> list[BatchTarget]:
+    with open(path, "rb") as f:
+        manifest = tomllib.load(f)
+
+    targets = []
+    for database in manifest.get("databases", []):
+        db_url = database["url"]
+        # never derive file names from credentials, only from the database name or file
+        base_name = database.get("name") or Path(urlparse(db_url).path).stem or "database"
+
+        for schema in database.get("schemas") or [None]:
+            targets.append(
+                BatchTarget(
+                    db_url,
+                    f"{base_name}.{schema}" if schema else base_name,
+                    schema,
+                    list(database.get("tables", [])),
+                )
+            )
+
+    names = [target.name for target in targets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Several manifest entries write to the same file, give them a `name`: {', '.join(duplicates)}"
+        )
+
+    return targets
+
+
+async def run_batch(
+    targets: list[BatchTarget],
+    options: PromptOptions,
+    output_dir: str | Path,
+    immutable: bool = False,
+    max_tokens: int | None = None,
+    safe_timeout: float | None = None,
+) -> list[BatchTarget]:
+    """
+    Write `{output_dir}/{target.name}.md` for every target. A failing target is logged and skipped,
+    the failed targets are returned.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    targets_by_url: dict[str, list[BatchTarget]] = {}
+    for target in targets:
+        targets_by_url.setdefault(target.db_url, []).append(target)
+
+    failed = []
+    for db_url, url_targets in targets_by_url.items():
+        dialect = get_dialect(db_url, immutable, safe_timeout=safe_timeout)
+        if dialect is None:
+            logger.error(f"Unknown database type: {db_url}")
+            failed.extend(url_targets)
+            continue
+
+        async with ConnectionPool(dialect.connect, dialect.close, options.jobs) as pool:
+            schemas = None
+            if any(target.schema for target in url_targets):
+                try:
+                    with profiling.phase("load schema"):
+                        async with pool.connection() as conn:
+                            schemas = await dialect.load_schemas(
+                                conn,
+                                [target.schema for target in url_targets if target.schema],
+                            )
+                except Exception:
+                    logger.exception(f"Failed to introspect the schemas of `{url_targets[0].name}`")
+                    failed.extend(url_targets)
+                    continue
+
+            for target in url_targets:
+                try:
+                    await write_target(
+                        target,
+                        pool,
+                        options,
+                        output_dir,
+                        immutable,
+                        max_tokens,
+                        schemas,
+                        safe_timeout,
+                    )
+                except Exception:
+                    logger.exception(f"Failed to generate the prompt for `{target.name}`")
+                    failed.append(target)
+
+    return failed
+
+
+async def write_target(
+    target: BatchTarget,
+    pool: ConnectionPool,
+    options: PromptOptions,
+    output_dir: Path,
+    immutable: bool,
+    max_tokens: int | None,
+    schemas: dict[str, dict[str, Table]] | None,
+    safe_timeout: float | None = None,
+):
+    dialect = get_dialect(target.db_url, immutable, target.schema, safe_timeout)
+    target_options = replace(
+        options,
+        table_names=target.table_names,
+        all_tables=not target.table_names and not options.query,
+    )
+    path = output_dir / f"{target.name}.md"
+
+    with open(path, "w") as f:
+        writer = PromptWriter(f, max_tokens)
+
+        if target.schema and schemas is None:
+            # the backend can't share connections across schemas (databases on MySQL)
+            async with ConnectionPool(dialect.connect, dialect.close, options.jobs) as target_pool:
+                await write_prompt(dialect, target_pool, target_options, writer)
+        elif target.schema:
+            await write_prompt(
+                dialect, pool, target_options, writer, schemas.get(target.schema, {})
+            )
+        else:
+            await write_prompt(dialect, pool, target_options, writer)
+
+    logger.info(f"Wrote {path}")
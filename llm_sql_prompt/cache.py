@@ -0,0 +1,168 @@
+"""
+Persistent cache of introspected schemas.
+
+Entries are keyed by database URL and table, and are only served while the catalog fingerprint of
+the database matches the one they were stored with. A warm run only pays for the fingerprint query.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from llm_sql_prompt.schema import Table, table_from_dict, table_to_dict
+
+# bump whenever the shape of cached values changes, old entries are then never served again
+CACHE_VERSION = 6
+
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+MAX_CACHE_ENTRIES = 50_000
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "llm-sql-prompt" / "schema-cache.sqlite3"
+
+
+class SchemaCache:
+    """
+    A small SQLite-backed key/value store with TTL and LRU eviction, scoped to a single database
+    and catalog fingerprint.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        fingerprint: str,
+        ttl: int = DEFAULT_CACHE_TTL,
+        path: Path | None = None,
+        max_entries: int = MAX_CACHE_ENTRIES,
+    ):
+        path = path or default_cache_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # the URL usually contains credentials, so only a hash of it is stored
+        self.database_key = hashlib.sha256(
+            f"{CACHE_VERSION}:{db_url}".encode()
+        ).hexdigest()
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        # keys served since the cache was opened, their access time is updated on close
+        self.accessed: set[str] = set()
+
+        # workers describing tables concurrently share the cache
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    database_key TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (database_key, key)
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_entries_accessed_at ON cache_entries (accessed_at)"
+            )
+            # entries from an older catalog or past their TTL can never be served again
+            self.conn.execute(
+                "DELETE FROM cache_entries WHERE database_key = ? AND (fingerprint != ? OR created_at < ?)",
+                (self.database_key, fingerprint, time.time() - ttl),
+            )
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache_entries WHERE database_key = ? AND key = ? AND fingerprint = ?",
+                (self.database_key, key, self.fingerprint),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        # written in one transaction on close, a warm run would otherwise commit once per table
+        self.accessed.add(key)
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+                (self.database_key, key, self.fingerprint, json.dumps(value), now, now),
+            )
+
+    def close(self):
+        with self.lock, self.conn:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE cache_entries SET accessed_at = ? WHERE database_key = ? AND key = ?",
+                [(now, self.database_key, key) for key in self.accessed],
+            )
+            # evict the least recently used entries, across all databases
+            self.conn.execute(
+                """
+                DELETE FROM cache_entries WHERE rowid IN (
+                    SELECT rowid FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def cached(cache: SchemaCache | None, key: str, compute: Callable[[], Awaitable]):
+    "Return the cached value for `key`, computing and storing it on a miss"
+    if cache is None:
+        return await compute()
+
+    value = cache.get(key)
+    if value is None:
+        value = await compute()
+        cache.set(key, value)
+
+    return value
+
+
+async def cached_tables(
+    cache: SchemaCache | None,
+    table_names: list[str],
+    load: Callable[[list[str]], Awaitable[dict[str, Table]]],
+) -> dict[str, Table]:
+    "Return introspected tables, only calling `load` for the tables missing from the cache"
+    if cache is None:
+        return await load(table_names)
+
+    tables = {}
+    for table_name in table_names:
+        data = cache.get(f"table:{table_name}")
+        if data is not None:
+            tables[table_name] = table_from_dict(data)
+
+    missing = [table_name for table_name in table_names if table_name not in tables]
+    if missing:
+        loaded = await load(missing)
+        for table in loaded.values():
+            cache.set(f"table:{table.name}", table_to_dict(table))
+        tables.update(loaded)
+
+    return tables
@@ -0,0 +1,168 @@
+"""
+Compact rendering of table sections, for `--format compact`.
+
+Carries the same information as the SQL rendering in fewer tokens:
+
+- columns are grouped by type, so every type is written once per table
+- long PostgreSQL type names are replaced by their standard short aliases
+- foreign keys are written as `column→table.column`
+- sample rows are a single table with one header, instead of an INSERT with the full column list
+  per row
+- with `max_columns`, only the first columns of wide tables are shown
+"""
+
+import datetime
+import re
+from decimal import Decimal
+
+from llm_sql_prompt.schema import Column, Table, format_partitions
+from llm_sql_prompt.stats import TableStats, format_table_stats
+
+# values of --format; kept here rather than in prompt so the CLI can offer them without importing
+# asyncio
+FORMATS = ["sql", "compact"]
+DEFAULT_FORMAT = "sql"
+
+# PostgreSQL's own aliases, understood anywhere PostgreSQL is
+TYPE_ALIASES = {
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "time without time zone": "time",
+    "time with time zone": "timetz",
+    "character varying": "varchar",
+    "character": "char",
+    "double precision": "float8",
+    "integer": "int",
+    "boolean": "bool",
+    "bit varying": "varbit",
+}
+
+# explains the notation to the model, added to the system prompt
+COMPACT_FORMAT_NOTE = (
+    "- Tables are described compactly: columns are grouped by type, `a→b.c` means column `a`"
+    " references `b.c`, comments follow columns in parentheses, and sample rows are tables"
+)
+
+
+def short_type(column: Column) -> str:
+    data_type = column.data_type
+    for long_name, alias in TYPE_ALIASES.items():
+        # keep modifiers and array brackets, e.g. character varying(255)[]
+        if data_type == long_name or data_type.startswith((f"{long_name}(", f"{long_name}[")):
+            data_type = alias + data_type[len(long_name) :]
+            break
+
+    if column.max_length:
+        data_type += f"({column.max_length})"
+
+    return data_type
+
+
+def format_compact_column(column: Column) -> str:
+    text = column.name
+    if column.foreign_key:
+        foreign_table, foreign_column = column.foreign_key
+        text += f"→{foreign_table}.{foreign_column}"
+    if column.comment:
+        text += f" ({column.comment})"
+
+    return text
+
+
+def format_compact_index(definition: str) -> str:
+    "`CREATE UNIQUE INDEX name ON schema.table (a, b)` becomes `unique index name (a, b)`"
+    return re.sub(
+        r"^CREATE (UNIQUE )?INDEX (\S+) ON (ONLY )?\S+ ",
+        lambda match: f"{(match[1] or '').lower()}index {match[2]} ",
+        definition,
+    )
+
+
+def format_compact_schema(table: Table, columns: list[Column]) -> str:
+    """
+    One line per type, listing its columns in table order, then one line per constraint and index,
+    and the view definition on a single line.
+    """
+    if table.ddl:
+        # CREATE statements (SQLite) also carry constraints and indexes, which the column model
+        # doesn't have, so they are kept as they are
+        return f"```sql\n{table.ddl}\n```"
+
+    by_type: dict[str, list[Column]] = {}
+    for column in columns:
+        by_type.setdefault(short_type(column), []).append(column)
+
+    lines = [
+        f"{data_type}: {', '.join(map(format_compact_column, type_columns))}"
+        for data_type, type_columns in by_type.items()
+    ]
+    lines.extend(table.constraints)
+    lines.extend(map(format_compact_index, table.indexes))
+    if partitions := format_partitions(table):
+        lines.append(partitions)
+    if table.view_definition:
+        lines.append(f"as: {' '.join(table.view_definition.split())}")
+
+    return "\n".join(lines)
+
+
+def format_value(value) -> str:
+    "Render a sample value for a markdown table cell"
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        if not value:
+            return '""'
+        return value.replace("\\", "\\\\").replace("|", "\\|").replace("\n", "\\n")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+
+    return format_value(str(value))
+
+
+def format_compact_table_section(
+    table: Table,
+    column_names: list[str],
+    sample_rows: list[tuple],
+    max_columns: int | None = None,
+    stats: TableStats | None = None,
+) -> str:
+    columns = table.columns[:max_columns] if max_columns else table.columns
+    # CREATE statements (SQLite) are kept whole, only their sample rows and statistics are capped
+    hidden_columns = 0 if table.ddl else len(table.columns) - len(columns)
+
+    heading = f"\n## `{table.name}`"
+    if table.kind != "table":
+        heading += f" ({table.kind})"
+    if table.comment:
+        heading += f" ({table.comment})"
+
+    output = [heading, format_compact_schema(table, columns)]
+    if hidden_columns:
+        output.append(f"(+{hidden_columns} more columns not shown)")
+
+    if stats and max_columns:
+        shown_names = {column.name for column in columns}
+        stats = TableStats(
+            stats.estimated_rows,
+            [column for column in stats.columns if column.name in shown_names],
+        )
+    if stats_section := format_table_stats(table.name, stats):
+        output.append(stats_section)
+
+    if sample_rows:
+        shown = min(len(column_names), max_columns) if max_columns else len(column_names)
+        if table.ddl and shown < len(column_names):
+            output.append(f"\n(Sample rows only show the first {shown} columns)")
+
+        output.append("")
+        output.append(f"| {' | '.join(column_names[:shown])} |")
+        output.append(f"|{'---|' * shown}")
+        for row in sample_rows:
+            output.append(f"| {' | '.join(map(format_value, row[:shown]))} |")
+
+    return "\n".join(output)
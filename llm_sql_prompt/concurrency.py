@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+from llm_sql_prompt import profiling
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+class ConnectionPool:
+    """
+    A bounded pool of lazily opened connections. A connection is only ever used by one task at a
+    time, since neither psycopg nor mysql-connector connections can run queries concurrently.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable],
+        close: Callable[[object], Awaitable],
+        size: int = 1,
+    ):
+        self.connect = connect
+        self.close = close
+        self.semaphore = asyncio.Semaphore(size)
+        self.idle = []
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self.semaphore:
+            if self.idle:
+                conn = self.idle.pop()
+            else:
+                started = time.perf_counter()
+                conn = await self.connect()
+                profiling.record_connect(conn, started)
+
+            try:
+                yield conn
+            except BaseException:
+                # the connection may be left mid-query or in a failed state, don't hand it out again
+                await self.close(conn)
+                raise
+
+            self.idle.append(conn)
+
+    async def aclose(self):
+        while self.idle:
+            await self.close(self.idle.pop())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+async def map_ordered(
+    fn: Callable[[Item], Awaitable[Result]],
+    items: Iterable[Item],
+    window: int,
+) -> AsyncIterator[Result]:
+    """
+    Run `fn` over `items` with up to `window` calls in flight, yielding results in the order of
+    `items`. Work only runs a window ahead of the consumer, so a consumer that stops early (e.g. a
+    token budget) doesn't pay for introspecting tables it will never use.
+    """
+    items = iter(items)
+    pending = deque(asyncio.ensure_future(fn(item)) for item in islice(items, window))
+
+    try:
+        while pending:
+            result = await pending.popleft()
+
+            for item in items:
+                pending.append(asyncio.ensure_future(fn(item)))
+                break
+
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def flatten(batches: AsyncIterator[list[Result]]) -> AsyncIterator[Result]:
+    "The items of every batch, closing `batches` when closed early"
+    async with aclosing(batches):
+        async for batch in batches:
+            for item in batch:
+                yield item
@@ -0,0 +1,219 @@
+"""
+The interface every database backend implements. The prompt generator only talks to a Dialect, so
+the describe-and-sample loop is written once, on asyncio, for all backends.
+
+Backends on blocking drivers (mysql-connector, sqlite3) run each call in a worker thread, so none of
+them block the event loop of an application embedding the generator.
+"""
+
+import asyncio
+import logging
+from importlib import import_module
+from pathlib import Path
+from typing import AsyncIterator
+from urllib.parse import urlparse
+
+from llm_sql_prompt.schema import Table
+from llm_sql_prompt.stats import TableStats
+
+logger = logging.getLogger(__name__)
+
+# a cancelled query running in a worker thread is interrupted again this often until it stops
+INTERRUPT_INTERVAL = 0.5
+
+
+class Dialect:
+    # how the database is described in the prompt and in messages
+    name = "SQL"
+
+    def __init__(
+        self, db_url: str, schema: str | None = None, safe_timeout: float | None = None
+    ):
+        self.db_url = db_url
+        # the schema (database on MySQL) to describe, the connection's default if None
+        self.schema = schema
+        # safe mode, for production databases: connections are read-only, statements are cancelled
+        # by the database after this many seconds, and tables which take longer are not sampled
+        self.safe_timeout = safe_timeout
+
+    @property
+    def cache_key(self) -> str:
+        "Identifies the described tables in the schema cache"
+        return self.db_url if self.schema is None else f"{self.db_url}#{self.schema}"
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def close(self, conn):
+        raise NotImplementedError
+
+    async def catalog_fingerprint(self, conn) -> str:
+        "Cheap checksum which changes whenever the schema changes, used to invalidate cached schemas"
+        raise NotImplementedError
+
+    async def list_tables(self, conn) -> list[str]:
+        raise NotImplementedError
+
+    async def table_fingerprints(self, conn, table_names: list[str]) -> dict[str, str]:
+        "Checksum of each table's definition, which changes whenever the table's schema changes"
+        raise NotImplementedError
+
+    async def describe_database(self, conn) -> str:
+        "Database specific lines added to the system prompt"
+        return f"- You are working with a {self.name} database"
+
+    async def load_schema(self, conn, table_names: list[str]) -> dict[str, Table]:
+        raise NotImplementedError
+
+    async def load_schemas(
+        self, conn, schemas: list[str]
+    ) -> dict[str, dict[str, Table]] | None:
+        """
+        Introspect every table of several schemas in one pass, for batch mode. Returns None if the
+        backend can't, each schema is then introspected on its own.
+        """
+        return None
+
+    async def sample_rows(
+        self, conn, table: Table, strategy: str
+    ) -> tuple[list[str], list[tuple]]:
+        "Returns the column names and a few sample rows of a table"
+        raise NotImplementedError
+
+    # tables `sample_rows_batch` samples at once, 0 if the backend samples one table at a time
+    sample_batch_size = 0
+
+    async def sample_rows_batch(
+        self, conn, tables: list[Table], strategy: str
+    ) -> list[tuple[list[str], list[tuple]]]:
+        "`sample_rows` for several tables, in fewer round trips than sampling them one by one"
+        raise NotImplementedError
+
+    async def table_stats(self, conn, table: Table) -> TableStats | None:
+        "Planner statistics of a table, None if there are none"
+        return None
+
+    def is_timeout(self, error: Exception) -> bool:
+        "Was the query cancelled by a statement or lock timeout?"
+        return False
+
+    def interrupt(self, conn):
+        "Stop the statement a worker thread is running on `conn`, for backends on blocking drivers"
+
+    async def run_in_thread(self, fn, conn, *args):
+        """
+        Run a blocking call on `conn` in a worker thread. When the call is cancelled (safe mode's
+        time budget, or a prompt that stopped early), its statement is interrupted and the thread
+        waited for, so the connection is never closed or handed out while a thread still uses it.
+        """
+        call = asyncio.ensure_future(asyncio.to_thread(fn, conn, *args))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            while not call.done():
+                try:
+                    await asyncio.to_thread(self.interrupt, conn)
+                except Exception:
+                    # the database's own statement timeout still ends it
+                    logger.exception("Failed to interrupt a query")
+                await asyncio.wait([call], timeout=INTERRUPT_INTERVAL)
+
+            # the statement failed because it was interrupted
+            call.exception()
+            raise
+
+    def skip_table(self, table_name: str) -> bool:
+        "Tables which should never be described, even when explicitly requested"
+        return False
+
+    async def connect_watcher(self):
+        "The connection `schema_changes` polls the catalog on"
+        return await self.connect()
+
+    async def schema_changes(self, interval: float) -> AsyncIterator[None]:
+        """
+        For watch mode: yields once when watching starts, then whenever the schema may have
+        changed. By default the catalog fingerprint is polled every `interval` seconds.
+        """
+        conn = await self.connect_watcher()
+        try:
+            fingerprint = await self.catalog_fingerprint(conn)
+            yield
+            while True:
+                await asyncio.sleep(interval)
+                current = await self.catalog_fingerprint(conn)
+                if current != fingerprint:
+                    fingerprint = current
+                    yield
+        finally:
+            await self.close(conn)
+
+
+# URL scheme to the module and class implementing it. Backends are imported on first use, so a
+# run only pays for the driver it needs (psycopg's binary extension, mysql.connector).
+DIALECTS = {
+    "postgresql": ("llm_sql_prompt.postgres", "PostgresDialect"),
+    "postgres": ("llm_sql_prompt.postgres", "PostgresDialect"),
+    "mysql": ("llm_sql_prompt.mysql", "MySQLDialect"),
+    "sqlite": ("llm_sql_prompt.sqlite", "SQLiteDialect"),
+    "dump": ("llm_sql_prompt.dump", "DumpDialect"),
+}
+
+# schema dump files are described offline, see dump.py
+DUMP_SUFFIXES = (".sql", ".ddl", ".schema")
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def is_schema_dump(path: Path) -> bool:
+    "A SQL text file (possibly gzipped), rather than a SQLite database"
+    suffixes = path.suffixes[-2:] if path.suffix == ".gz" else path.suffixes[-1:]
+    if not suffixes or suffixes[0] not in DUMP_SUFFIXES or not path.is_file():
+        return False
+
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_HEADER)) != SQLITE_HEADER
+
+
+def dialect_scheme(db_url: str) -> str | None:
+    """
+    The registry key for a database URL. Driver suffixes (`postgresql+psycopg://`) are ignored,
+    paths to SQL files are schema dumps and paths to other existing files are SQLite databases.
+    """
+    scheme = urlparse(db_url).scheme.split("+")[0].lower()
+    if scheme in DIALECTS and scheme != "dump":
+        return scheme
+
+    if is_schema_dump(Path(db_url)):
+        return "dump"
+
+    if "sqlite" in db_url or Path(db_url).exists():
+        return "sqlite"
+
+    return None
+
+
+def get_dialect(
+    db_url: str,
+    immutable: bool = False,
+    schema: str | None = None,
+    safe_timeout: float | None = None,
+) -> Dialect | None:
+    """
+    Pick the backend for a database URL, or a path to a SQLite file. `immutable` only applies to
+    SQLite, `schema` to PostgreSQL, MySQL and dumps, `safe_timeout` enables safe mode. Returns None
+    if the database type is unknown.
+    """
+    scheme = dialect_scheme(db_url)
+    if scheme is None:
+        return None
+
+    module_name, class_name = DIALECTS[scheme]
+    dialect_class = getattr(import_module(module_name), class_name)
+
+    if scheme == "sqlite":
+        if schema:
+            raise ValueError("SQLite databases have no schemas to pick from")
+
+        return dialect_class(db_url, immutable, safe_timeout)
+
+    return dialect_class(db_url, schema, safe_timeout)
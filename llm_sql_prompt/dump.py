@@ -0,0 +1,764 @@
+"""
+Prompts from schema dump files (`pg_dump --schema-only`, `mysqldump --no-data`, the SQLite CLI's
+`.schema` or `.dump`), for databases that can't be reached, or shouldn't be loaded, from where the
+prompt is generated. No database connection is ever opened.
+
+The dump is read one statement at a time, so memory is bounded by the largest statement rather than
+the file. Data (INSERT, COPY) is skipped line by line without being buffered. Statements are parsed
+with regular expressions into the same Table model the live backends produce: tables, views,
+columns, comments, constraints, foreign keys and indexes. Anything else (functions, types,
+sequences, grants) is ignored.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from llm_sql_prompt.dialect import Dialect
+from llm_sql_prompt.schema import Column, Table, table_to_dict
+
+# statements only carrying data, skipped without being buffered
+DATA_STATEMENTS = {"INSERT", "REPLACE", "COPY", "LOCK", "UNLOCK"}
+
+# start of a string, quoted identifier, comment or dollar-quoted body, while splitting statements
+SPECIAL = re.compile(r"['\"`$]|/\*|--")
+# SQLite triggers have statements of their own, up to END
+TRIGGER_BODY = re.compile(r"CREATE\s+(?:TEMP\w*\s+)?TRIGGER\b.*\bBEGIN\b", re.I | re.S)
+
+IDENT = r'(?:"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]|[^\s"`\[\](),.;]+)'
+QUALIFIED = rf"{IDENT}(?:\s*\.\s*{IDENT})*"
+IDENT_PATTERN = re.compile(IDENT)
+
+# column and table constraints, matched on definitions whose strings are blanked out
+PRIMARY_KEY = re.compile(r"\bPRIMARY\s+KEY\b", re.I)
+UNIQUE = re.compile(r"\bUNIQUE\b", re.I)
+CHECK = re.compile(r"\bCHECK\s*\(", re.I)
+COMMENT = re.compile(r"\bCOMMENT\s+'", re.I)
+REFERENCES = re.compile(rf"\bREFERENCES\s+({QUALIFIED})\s*(?:\(([^)]*)\))?", re.I)
+CONSTRAINT_NAME = re.compile(rf"^CONSTRAINT\s+{IDENT}\s+", re.I)
+FOREIGN_KEY_TARGET = re.compile(
+    rf"\s*REFERENCES\s+({QUALIFIED})\s*(?:\(([^)]*)\))?\s*(.*)", re.I | re.S
+)
+# mysqldump wraps version specific statements in /*!50001 ... */
+VERSIONED_COMMENT = re.compile(r"/\*!\d*\s?(.*?)\*/", re.S)
+LEADING_COMMENTS = re.compile(r"^(?:/\*.*?\*/\s*)+", re.S)
+# constraints added by ALTER TABLE, pg_dump adds them all that way
+ADD_CONSTRAINT = re.compile(r"\s*ADD\s+(?!COLUMN\b)", re.I)
+# pg_dump creates partitions as tables of their own, and attaches them afterwards
+ATTACH_PARTITION = re.compile(rf"\s*ATTACH\s+PARTITION\s+({QUALIFIED})", re.I)
+
+# words ending the type of a column definition
+TYPE_END_WORDS = {
+    "NOT", "NULL", "DEFAULT", "CONSTRAINT", "PRIMARY", "UNIQUE", "REFERENCES", "CHECK",
+    "COLLATE", "GENERATED", "AUTO_INCREMENT", "AUTOINCREMENT", "COMMENT", "CHARSET", "ON",
+    "AS", "STORED", "VIRTUAL", "INVISIBLE", "VISIBLE", "COLUMN_FORMAT", "STORAGE", "COMPRESSION",
+    "SRID",
+}
+TABLE_CONSTRAINT_WORDS = {
+    "CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK", "EXCLUDE", "KEY", "INDEX",
+    "FULLTEXT", "SPATIAL", "LIKE", "PERIOD",
+}
+# same order as the live backends: primary key, unique, exclusion, check, foreign keys
+CONSTRAINT_ORDER = ("PRIMARY", "UNIQUE", "EXCLUDE", "CHECK", "FOREIGN")
+
+FLAVOR_NAMES = {
+    "postgresql": "PostgreSQL",
+    "mysql": "MySQL",
+    "sqlite": "SQLite 3",
+    "sql": "SQL",
+}
+
+
+def open_dump(path: Path) -> TextIO:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", errors="replace")
+
+    return open(path, errors="replace")
+
+
+def statement_scanner(delimiter: str) -> re.Pattern:
+    "Finds the next quote, comment or dollar quote opening, or the delimiter"
+    return re.compile(rf"['\"`]|--|/\*|\$(?:[A-Za-z_]\w*)?\$|{re.escape(delimiter)}")
+
+
+def is_incomplete(statement: str) -> bool:
+    "A trigger whose body was split at one of its own statements"
+    return bool(TRIGGER_BODY.match(statement)) and not re.search(r"\bEND$", statement, re.I)
+
+
+def read_statements(lines: Iterable[str], backslash_escapes: bool = False) -> Iterator[str]:
+    """
+    Split SQL text into statements, understanding strings, quoted identifiers, comments, dollar
+    quoting and mysqldump's DELIMITER. Lines without any of those, which is most of a schema dump,
+    are only checked for the delimiter.
+    """
+    # closes a string, unless the quote is escaped by a backslash
+    string_end = re.compile(r"(?:[^'\\]|\\.)*'" if backslash_escapes else r"[^']*'")
+
+    delimiter = ";"
+    scanner = statement_scanner(delimiter)
+    buffer: list[str] = []
+    # what closes the string, identifier, comment or dollar-quoted body the line is in
+    quote = None
+    skipping = False
+    copying = False
+
+    def end_statement(text: str) -> str | None:
+        "The statement ending with `text`, None if it goes on"
+        nonlocal buffer
+        buffer.append(text)
+        statement = "".join(buffer).strip()
+        if is_incomplete(statement):
+            buffer = [statement, delimiter]
+            return None
+
+        buffer = []
+        return statement
+
+    for line in lines:
+        if copying:
+            copying = line.rstrip("\r\n") != "\\."
+            continue
+
+        if not buffer and not skipping and quote is None:
+            stripped = line.strip()
+            if not stripped or stripped.startswith("--"):
+                continue
+
+            first_word = stripped.split(None, 1)[0].upper()
+            if first_word == "DELIMITER":
+                delimiter = stripped.split()[1]
+                scanner = statement_scanner(delimiter)
+                continue
+            if first_word in DATA_STATEMENTS:
+                skipping = True
+
+        if skipping:
+            # data statements are a single line, or end with the delimiter at the end of a line
+            if line.rstrip().endswith(delimiter):
+                skipping = False
+                copying = line.rstrip().upper().endswith("FROM STDIN;")
+            continue
+
+        if quote is None and not SPECIAL.search(line) and line.count(delimiter) <= 1:
+            stripped = line.rstrip()
+            if delimiter not in line:
+                buffer.append(line)
+                continue
+            if stripped.endswith(delimiter):
+                if statement := end_statement(stripped[: -len(delimiter)]):
+                    yield statement
+                continue
+            # the delimiter is in the middle of the line, which is scanned below
+
+        start = 0
+        index = 0
+        end_of_code = len(line)
+        while True:
+            if quote is None:
+                match = scanner.search(line, index)
+                if not match:
+                    break
+
+                token = match[0]
+                index = match.end()
+                if token == delimiter:
+                    if statement := end_statement(line[start : match.start()]):
+                        yield statement
+                    start = index
+                elif token == "--":
+                    # the rest of the line is a comment, which would otherwise start the next
+                    # statement
+                    end_of_code = match.start()
+                    break
+                else:
+                    quote = "*/" if token == "/*" else token
+            else:
+                if quote == "'":
+                    match = string_end.match(line, index)
+                    end = match.end() if match else -1
+                else:
+                    end = line.find(quote, index)
+                    end = end + len(quote) if end >= 0 else -1
+
+                if end < 0:
+                    break
+                quote = None
+                index = end
+
+        rest = line[start:end_of_code]
+        if end_of_code < len(line):
+            rest += "\n"
+        if buffer or rest.strip():
+            buffer.append(rest)
+
+    statement = "".join(buffer).strip()
+    if statement and quote is None:
+        yield statement
+
+
+def unquote(name: str) -> str:
+    if name[:1] == '"' and name[-1:] == '"':
+        return name[1:-1].replace('""', '"')
+    if name[:1] == "`" and name[-1:] == "`":
+        return name[1:-1].replace("``", "`")
+    if name[:1] == "[" and name[-1:] == "]":
+        return name[1:-1]
+    return name
+
+
+def name_parts(qualified: str) -> list[str]:
+    return [unquote(part) for part in IDENT_PATTERN.findall(qualified)]
+
+
+def unquote_identifiers(text: str) -> str:
+    "Drop quotes around identifiers which don't need them, e.g. in column lists"
+    return re.sub(
+        r'`([A-Za-z_][\w$]*)`|"([a-z_][a-z0-9_$]*)"',
+        lambda match: match[1] or match[2],
+        text,
+    )
+
+
+@dataclass
+class SchemaDump:
+    # postgresql, mysql, sqlite or sql if the dump doesn't tell
+    flavor: str = "sql"
+    server_version: str | None = None
+    # keyed by schema (None if unqualified) and name, in dump order
+    tables: dict[tuple[str | None, str], Table] = field(default_factory=dict)
+    # partitions and inheriting tables, which are described as part of their parent
+    children: set[tuple[str | None, str]] = field(default_factory=set)
+
+    def resolve_schema(self, schema: str | None) -> str | None:
+        "`schema`, by default `public` if it was dumped, the schema of the first table otherwise"
+        schemas = [table_schema for table_schema, _ in self.tables]
+        if schema is None and schemas:
+            schema = "public" if "public" in schemas else schemas[0]
+        return schema
+
+    def schema_tables(self, schema: str | None) -> dict[str, Table]:
+        "The tables of `schema`, partitions included"
+        schema = self.resolve_schema(schema)
+        return {
+            name: table
+            for (table_schema, name), table in self.tables.items()
+            if table_schema == schema
+        }
+
+    def table_names(self, schema: str | None) -> list[str]:
+        "The tables of `schema`, without partitions and inheriting tables"
+        schema = self.resolve_schema(schema)
+        return sorted(
+            name
+            for table_schema, name in self.tables
+            if table_schema == schema and (table_schema, name) not in self.children
+        )
+
+
+class DumpParser:
+    def __init__(self):
+        self.dump = SchemaDump()
+        # set by USE (mysqldump) and SET search_path (older pg_dump)
+        self.current_schema: str | None = None
+        # (table, column) of foreign keys which reference the primary key without naming it
+        self.unresolved: list[tuple[Table, Column, tuple[str | None, str]]] = []
+        # CREATE statements of SQLite tables, by table
+        self.statements: dict[tuple[str | None, str], list[str]] = {}
+
+        flags = re.I | re.S
+        self.create_table = re.compile(
+            rf"CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL|LOCAL)\s+)?"
+            rf"(?:TEMP(?:ORARY)?\s+|UNLOGGED\s+|VIRTUAL\s+)?(FOREIGN\s+)?TABLE\s+"
+            rf"(?:IF\s+NOT\s+EXISTS\s+)?({QUALIFIED})\s*(.*)",
+            flags,
+        )
+        self.create_view = re.compile(
+            rf"CREATE\s+(?:OR\s+REPLACE\s+)?(?:ALGORITHM\s*=\s*\w+\s+)?(?:DEFINER\s*=\s*\S+\s+)?"
+            rf"(?:SQL\s+SECURITY\s+\w+\s+)?(?:TEMP(?:ORARY)?\s+)?(?:RECURSIVE\s+)?"
+            rf"(MATERIALIZED\s+)?VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?({QUALIFIED})\s*"
+            rf"(?:\([^)]*\)\s*)?(?:WITH\s*\([^)]*\)\s*)?AS\s+(.*)",
+            flags,
+        )
+        self.create_index = re.compile(
+            rf"CREATE\s+(UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?"
+            rf"({IDENT})\s+ON\s+(?:ONLY\s+)?({QUALIFIED})\s*(.*)",
+            flags,
+        )
+        self.alter_table = re.compile(
+            rf"ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?({QUALIFIED})\s+(.*)", flags
+        )
+        self.comment_on = re.compile(
+            rf"COMMENT\s+ON\s+(TABLE|VIEW|MATERIALIZED\s+VIEW|FOREIGN\s+TABLE|COLUMN)\s+"
+            rf"({QUALIFIED})\s+IS\s+(.*)",
+            flags,
+        )
+
+    def set_flavor(self, flavor: str):
+        self.dump.flavor = flavor
+        backslash = flavor == "mysql"
+        self.string = re.compile(
+            r"'(?:[^'\\]|\\.|'')*'" if backslash else r"'(?:[^']|'')*'", re.S
+        )
+        # strings, quoted identifiers and parentheses, for walking statements by nesting level,
+        # skipping over everything else in one go
+        self.tokens = re.compile(
+            rf"[^(),'\"`]*({self.string.pattern}|\"(?:[^\"]|\"\")*\"|`(?:[^`]|``)*`|[(),])", re.S
+        )
+        # the type of a column definition: words and parenthesized modifiers, up to the first
+        # column constraint or attribute
+        end_words = "|".join(sorted(TYPE_END_WORDS))
+        word = (
+            rf"(?!(?:{end_words}|CHARACTER\s+SET)\b)"
+            rf"(?:[^\s(),']|\((?:{self.string.pattern}|[^'()]|\([^()]*\))*\))+"
+        )
+        self.column_type = re.compile(rf"\s*((?:{word}(?:\s+{word})*)?)", re.I | re.S)
+
+    def read(self, f: TextIO) -> SchemaDump:
+        # the flavor is told by the header comments of pg_dump and mysqldump
+        header = []
+        for line in f:
+            header.append(line)
+            if line.strip() and not line.startswith(("--", "/*", "PRAGMA", "SET")):
+                break
+            if len(header) > 50:
+                break
+
+        text = "".join(header)
+        if "PostgreSQL database dump" in text:
+            self.set_flavor("postgresql")
+            version = re.search(r"Dumped from database version (\S+)", text)
+        elif re.search(r"(MySQL|MariaDB) dump", text):
+            self.set_flavor("mysql")
+            version = re.search(r"Server version\s+(\S+)", text)
+        else:
+            self.set_flavor("sqlite" if re.search(r"PRAGMA|BEGIN TRANSACTION", text) else "sql")
+            version = None
+        self.dump.server_version = version[1] if version else None
+
+        lines = iter(header)
+        for statement in read_statements(
+            self.chain(lines, f), backslash_escapes=self.dump.flavor == "mysql"
+        ):
+            self.parse(statement)
+
+        self.finish()
+        return self.dump
+
+    @staticmethod
+    def chain(*iterables):
+        for iterable in iterables:
+            yield from iterable
+
+    def key(self, qualified: str) -> tuple[str | None, str]:
+        parts = name_parts(qualified)
+        schema = parts[-2] if len(parts) > 1 else self.current_schema
+        return schema, parts[-1]
+
+    def display_name(self, key: tuple[str | None, str], from_schema: str | None) -> str:
+        "Tables in another schema are qualified with it, like the live backends do"
+        schema, name = key
+        return name if schema is None or schema == from_schema else f"{schema}.{name}"
+
+    def parse(self, statement: str):
+        if "/*!" in statement:
+            statement = VERSIONED_COMMENT.sub(r"\1", statement).strip()
+        if statement.startswith("/*"):
+            statement = LEADING_COMMENTS.sub("", statement)
+
+        first_words = statement[:200].upper().split()
+        if not first_words:
+            return
+
+        if first_words[0] == "USE":
+            self.current_schema = unquote(statement.split()[1])
+        elif first_words[0] == "SET" and "SEARCH_PATH" in statement[:40].upper():
+            schema = re.search(r"search_path\s*(?:=|TO)\s*([^,\s;]+)", statement, re.I)
+            if schema and schema[1] != "''":
+                self.current_schema = unquote(schema[1])
+        elif first_words[0] == "CREATE" and "INDEX" in first_words[:4]:
+            if match := self.create_index.match(statement):
+                self.parse_index(statement, match)
+        elif first_words[0] == "CREATE" and "VIEW" in first_words[:8]:
+            if match := self.create_view.match(statement):
+                self.parse_view(statement, match)
+        elif first_words[0] == "CREATE" and "TABLE" in first_words[:6]:
+            if match := self.create_table.match(statement):
+                self.parse_table(statement, match)
+        elif first_words[0] == "CREATE" and "TRIGGER" in first_words[:4]:
+            self.parse_trigger(statement)
+        elif first_words[:2] == ["ALTER", "TABLE"]:
+            if match := self.alter_table.match(statement):
+                self.parse_alter_table(match)
+        elif first_words[:2] == ["COMMENT", "ON"]:
+            if match := self.comment_on.match(statement):
+                self.parse_comment(match)
+
+    def closing_paren(self, text: str, start: int) -> int:
+        "Index of the parenthesis closing the one at `start`"
+        return self.split_parenthesized(text, start)[1]
+
+    def split_parenthesized(self, text: str, start: int) -> tuple[list[str], int]:
+        """
+        What is inside the parenthesis at `start`, split on commas outside of nested parentheses
+        and quotes, and the index of the parenthesis closing it
+        """
+        parts, depth, part_start = [], 0, start + 1
+        for match in self.tokens.finditer(text, start):
+            token = match[1]
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+                if depth == 0:
+                    parts.append(text[part_start : match.start(1)].strip())
+                    return [part for part in parts if part], match.start(1)
+            elif token == "," and depth == 1:
+                parts.append(text[part_start : match.start(1)].strip())
+                part_start = match.end()
+
+        parts.append(text[part_start:].strip())
+        return [part for part in parts if part], len(text)
+
+    def split_top_level(self, text: str) -> list[str]:
+        "Split on commas outside of parentheses and quotes"
+        return self.split_parenthesized(f"({text})", 0)[0]
+
+    def column_list(self, text: str) -> list[str]:
+        return [unquote_identifiers(part) for part in self.split_top_level(text)]
+
+    def string_value(self, literal: str) -> str:
+        value = literal[1:-1].replace("''", "'")
+        if self.dump.flavor == "mysql":
+            value = re.sub(
+                r"\\(.)", lambda match: {"n": "\n", "t": "\t"}.get(match[1], match[1]), value
+            )
+        return value
+
+    def parse_table(self, statement: str, match: re.Match):
+        key = self.key(match[2])
+        if key[1].startswith("sqlite_"):
+            return
+
+        rest = match[3]
+        table = Table(key[1], kind="foreign table" if match[1] else "table")
+
+        partition = re.match(rf"PARTITION\s+OF\s+({QUALIFIED})", rest, re.I)
+        if partition:
+            parent = self.dump.tables.get(self.key(partition[1]))
+            if parent:
+                table.columns = [Column(**vars(column)) for column in parent.columns]
+            self.add_child(key, self.key(partition[1]))
+        elif rest.startswith("("):
+            elements, end = self.split_parenthesized(rest, 0)
+            for element in elements:
+                self.parse_table_element(table, key, element)
+
+            tail = rest[end + 1 :]
+            if self.dump.flavor == "postgresql":
+                self.parse_inheritance(table, key, tail)
+            comment = re.search(rf"\bCOMMENT\s*=?\s*({self.string.pattern})", tail, re.I | re.S)
+            if comment:
+                table.comment = self.string_value(comment[1])
+
+        self.dump.tables[key] = table
+        if self.dump.flavor in ("sqlite", "sql"):
+            self.statements[key] = [statement]
+
+    def parse_inheritance(self, table: Table, key: tuple[str | None, str], tail: str):
+        "PARTITION BY and INHERITS, after the columns of a PostgreSQL table"
+        if partition_by := re.search(r"\bPARTITION\s+BY\s+(\w+\s*\()", tail, re.I):
+            end = self.closing_paren(tail, partition_by.end() - 1)
+            table.kind = "partitioned table"
+            table.partition_key = " ".join(tail[partition_by.start(1) : end + 1].split())
+
+        if inherits := re.search(r"\bINHERITS\s*\(", tail, re.I):
+            parents, _ = self.split_parenthesized(tail, inherits.end() - 1)
+            for parent_name in parents:
+                parent_key = self.key(parent_name)
+                # pg_dump only lists the columns the table adds to its parents'
+                if parent := self.dump.tables.get(parent_key):
+                    inherited = [Column(**vars(column)) for column in parent.columns]
+                    table.columns = inherited + table.columns
+                self.add_child(key, parent_key)
+
+    def add_child(self, key: tuple[str | None, str], parent_key: tuple[str | None, str]):
+        "Collapse a partition or inheriting table into its parent"
+        if key in self.dump.children:
+            return
+        self.dump.children.add(key)
+        if parent := self.dump.tables.get(parent_key):
+            parent.partition_count += 1
+
+    def parse_table_element(self, table: Table, key: tuple[str | None, str], element: str):
+        first_word = element.split(None, 1)[0].upper()
+        if first_word in TABLE_CONSTRAINT_WORDS:
+            self.parse_constraint(table, key, element)
+        else:
+            self.parse_column(table, key, element)
+
+    def parse_column(self, table: Table, key: tuple[str | None, str], element: str):
+        name_match = IDENT_PATTERN.match(element)
+        if not name_match:
+            return
+        column = Column(unquote(name_match[0]), "")
+        definition = element[name_match.end() :]
+
+        column_type = self.column_type.match(definition)
+        column.data_type = " ".join(column_type[1].split())
+        attributes = definition[column_type.end() :].strip()
+
+        # keywords inside default values and comments don't count
+        if not attributes:
+            table.columns.append(column)
+            return
+
+        masked = attributes
+        if "'" in attributes:
+            masked = self.string.sub(
+                lambda string: "'" + " " * (len(string[0]) - 2) + "'", attributes
+            )
+        if PRIMARY_KEY.search(masked):
+            table.constraints.append(f"PRIMARY KEY ({column.name})")
+        elif UNIQUE.search(masked):
+            table.constraints.append(f"UNIQUE ({column.name})")
+        if check := CHECK.search(masked):
+            end = self.closing_paren(attributes, check.end() - 1)
+            table.constraints.append(f"CHECK {attributes[check.end() - 1 : end + 1]}")
+        if comment := COMMENT.search(masked):
+            literal = self.string.match(attributes, comment.end() - 1)
+            if literal:
+                column.comment = self.string_value(literal[0])
+        if references := REFERENCES.search(masked):
+            self.add_foreign_key(table, key, column, references[1], references[2])
+
+        table.columns.append(column)
+
+    def add_foreign_key(
+        self,
+        table: Table,
+        key: tuple[str | None, str],
+        column: Column,
+        foreign_table: str,
+        foreign_column: str | None,
+    ):
+        foreign_key = self.key(foreign_table)
+        display = self.display_name(foreign_key, key[0])
+        if foreign_column:
+            column.foreign_key = (display, unquote(foreign_column.strip()))
+        else:
+            # references the primary key, which may be defined further down the dump
+            column.foreign_key = (display, "")
+            self.unresolved.append((table, column, foreign_key))
+
+    def parse_constraint(self, table: Table, key: tuple[str | None, str], element: str):
+        body = CONSTRAINT_NAME.sub("", element)
+        upper = body.upper()
+        paren = body.find("(")
+        if paren < 0:
+            return
+        parts, end = self.split_parenthesized(body, paren)
+        columns = list(map(unquote_identifiers, parts))
+
+        if upper.startswith("PRIMARY"):
+            table.constraints.append(f"PRIMARY KEY ({', '.join(columns)})")
+        elif upper.startswith("UNIQUE"):
+            table.constraints.append(f"UNIQUE ({', '.join(columns)})")
+        elif upper.startswith(("CHECK", "EXCLUDE")):
+            table.constraints.append(" ".join(body.split()))
+        elif upper.startswith("FOREIGN"):
+            references = FOREIGN_KEY_TARGET.match(body[end + 1 :])
+            if not references:
+                return
+            if len(columns) == 1:
+                for column in table.columns:
+                    if column.name == unquote(columns[0]):
+                        self.add_foreign_key(table, key, column, references[1], references[2])
+                return
+
+            foreign_table = self.display_name(self.key(references[1]), key[0])
+            foreign_columns = self.column_list(references[2] or "")
+            actions = " ".join(references[3].split())
+            table.constraints.append(
+                f"FOREIGN KEY ({', '.join(columns)}) REFERENCES {foreign_table}"
+                f"({', '.join(foreign_columns)}){f' {actions}' if actions else ''}"
+            )
+        elif upper.startswith(("KEY", "INDEX", "FULLTEXT", "SPATIAL")):
+            # MySQL indexes, defined with the table
+            name = re.match(
+                rf"(?:(FULLTEXT|SPATIAL)\s+)?(?:KEY|INDEX)?\s*({IDENT})?\s*\(", body, re.I
+            )
+            kind = f"{name[1].upper()} " if name and name[1] else ""
+            index_name = f"{unquote(name[2])} " if name and name[2] else ""
+            table.indexes.append(
+                f"CREATE {kind}INDEX {index_name}ON {table.name} ({', '.join(columns)})"
+            )
+
+    def parse_view(self, statement: str, match: re.Match):
+        key = self.key(match[2])
+        definition = match[3].strip()
+        if match[1]:
+            definition = re.sub(r"\s+WITH\s+(NO\s+)?DATA\s*$", "", definition, flags=re.I)
+
+        # mysqldump first creates a table with the view's columns, which is kept for its columns
+        table = self.dump.tables.get(key) or Table(key[1])
+        table.kind = "materialized view" if match[1] else "view"
+        table.view_definition = definition
+        self.dump.tables[key] = table
+        if self.dump.flavor in ("sqlite", "sql"):
+            self.statements[key] = [statement]
+
+    def parse_index(self, statement: str, match: re.Match):
+        key = self.key(match[3])
+        table = self.dump.tables.get(key)
+        if not table:
+            return
+
+        if self.dump.flavor in ("sqlite", "sql"):
+            self.statements[key].append(statement)
+        else:
+            unique = "UNIQUE " if match[1] else ""
+            # btree is the default, and the most common by far
+            rest = re.sub(r"^USING\s+btree\s+", "", match[4].strip(), flags=re.I)
+            table.indexes.append(
+                f"CREATE {unique}INDEX {unquote(match[2])} ON {match[3]} {' '.join(rest.split())}"
+            )
+
+    def parse_trigger(self, statement: str):
+        on = re.search(rf"\bON\s+({QUALIFIED})", statement, re.I)
+        if on and self.dump.flavor in ("sqlite", "sql"):
+            key = self.key(on[1])
+            if key in self.statements:
+                self.statements[key].append(statement)
+
+    def parse_alter_table(self, match: re.Match):
+        key = self.key(match[1])
+        table = self.dump.tables.get(key)
+        if not table:
+            return
+
+        actions = self.split_top_level(match[2]) if "," in match[2] else [match[2]]
+        for action in actions:
+            if add := ADD_CONSTRAINT.match(action):
+                self.parse_constraint(table, key, action[add.end() :])
+            elif attach := ATTACH_PARTITION.match(action):
+                self.add_child(self.key(attach[1]), key)
+
+    def parse_comment(self, match: re.Match):
+        literal = self.string.match(match[3].strip())
+        comment = self.string_value(literal[0]) if literal else ""
+        parts = name_parts(match[2])
+
+        if match[1].upper() == "COLUMN":
+            table = self.dump.tables.get(self.key(".".join(f'"{part}"' for part in parts[:-1])))
+            for column in table.columns if table else []:
+                if column.name == parts[-1]:
+                    column.comment = comment
+        elif table := self.dump.tables.get(self.key(match[2])):
+            table.comment = comment
+
+    def finish(self):
+        for table, column, foreign_key in self.unresolved:
+            foreign_table = self.dump.tables.get(foreign_key)
+            primary_key = next(
+                (
+                    constraint[len("PRIMARY KEY (") : -1]
+                    for constraint in (foreign_table.constraints if foreign_table else [])
+                    if constraint.startswith("PRIMARY KEY (")
+                ),
+                None,
+            )
+            if primary_key and "," not in primary_key:
+                column.foreign_key = (column.foreign_key[0], primary_key)
+            else:
+                column.foreign_key = None
+
+        for table in self.dump.tables.values():
+            table.constraints.sort(
+                key=lambda constraint: next(
+                    (
+                        index
+                        for index, prefix in enumerate(CONSTRAINT_ORDER)
+                        if constraint.upper().startswith(prefix)
+                    ),
+                    len(CONSTRAINT_ORDER),
+                )
+            )
+
+        # SQLite tables are described by their CREATE statements, like the live backend does
+        for key, statements in self.statements.items():
+            table = self.dump.tables[key]
+            table.ddl = "\n".join(f"{statement};" for statement in statements)
+
+
+def parse_dump(path: str | Path) -> SchemaDump:
+    with open_dump(Path(path)) as f:
+        return DumpParser().read(f)
+
+
+class DumpDialect(Dialect):
+    """
+    Describes the tables of a schema dump. The parsed dump stands in for a connection, it is parsed
+    when the first connection is opened, and again when a connection is opened after the file
+    changed (watch mode).
+    """
+
+    name = "SQL"
+
+    def __init__(self, db_url: str, schema: str | None = None, safe_timeout: float | None = None):
+        super().__init__(db_url, schema, safe_timeout)
+        self.path = Path(db_url)
+        self.dump: SchemaDump | None = None
+        # catalog fingerprint of the file `dump` was parsed from
+        self.parsed: str | None = None
+        self.lock = asyncio.Lock()
+
+    async def connect(self) -> SchemaDump:
+        async with self.lock:
+            fingerprint = await self.catalog_fingerprint(self.dump)
+            if fingerprint != self.parsed:
+                self.dump = await asyncio.to_thread(parse_dump, self.path)
+                self.name = FLAVOR_NAMES[self.dump.flavor]
+                self.parsed = fingerprint
+        return self.dump
+
+    async def close(self, conn):
+        pass
+
+    async def catalog_fingerprint(self, conn: SchemaDump) -> str:
+        stat = self.path.stat()
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    async def list_tables(self, conn: SchemaDump) -> list[str]:
+        return conn.table_names(self.schema)
+
+    async def table_fingerprints(self, conn: SchemaDump, table_names: list[str]) -> dict[str, str]:
+        tables = conn.schema_tables(self.schema)
+        return {
+            table_name: hashlib.md5(
+                json.dumps(table_to_dict(tables[table_name])).encode()
+            ).hexdigest()
+            for table_name in table_names
+            if table_name in tables
+        }
+
+    async def describe_database(self, conn: SchemaDump) -> str:
+        version = f" (server version: {conn.server_version})" if conn.server_version else ""
+        return (
+            f"- You are working with a {self.name} database{version}\n"
+            "- The tables are described from a schema dump, no sample rows are available"
+        )
+
+    async def load_schema(self, conn: SchemaDump, table_names: list[str]) -> dict[str, Table]:
+        tables = conn.schema_tables(self.schema)
+        return {
+            table_name: tables[table_name] for table_name in table_names if table_name in tables
+        }
+
+    async def sample_rows(self, conn, table: Table, strategy: str) -> tuple[list[str], list[tuple]]:
+        return [], []
@@ -1,6 +1,21 @@
+import asyncio
+import base64
+import json
 from urllib.parse import urlparse
 
-from llm_sql_prompt.util import system_prompt
+from llm_sql_prompt import profiling
+from llm_sql_prompt.dialect import Dialect
+from llm_sql_prompt.safe_mode import SAFE_LOCK_TIMEOUT
+from llm_sql_prompt.sampling import (
+    DEFAULT_SAMPLE_STRATEGY,
+    MAX_VALUE_LENGTH,
+    SAMPLE_SIZE,
+    bound_row,
+    random_probes,
+    use_full_scan,
+)
+from llm_sql_prompt.schema import Column, Table
+from llm_sql_prompt.stats import ColumnStats, TableStats
 
 # Try to import MySQL connector, but handle when it's missing
 MYSQL_AVAILABLE = False
@@ -11,6 +26,9 @@ except ImportError:
     # MySQL connector not installed
     pass
 
+# ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME) and ER_LOCK_WAIT_TIMEOUT
+TIMEOUT_ERRORS = (3024, 1205)
+
 def check_mysql_available():
     """Check if MySQL connector is available and raise a helpful error if not."""
     if not MYSQL_AVAILABLE:
@@ -37,57 +55,50 @@ def parse_mysql_url(db_url):
         'database': database
     }
 
-def connect_to_mysql(db_url):
-    """Connect to MySQL database using URL."""
+def connect_to_mysql(db_url, database=None):
+    """Connect to MySQL database using URL, optionally to another database than the URL's."""
     check_mysql_available()
     conn_params = parse_mysql_url(db_url)
+    if database:
+        conn_params['database'] = database
     return mysql.connector.connect(**conn_params)
 
-def describe_table_schema(conn, table_name):
-    """Outputs the table schema using SQL, including column comments and FK info if available."""
-    database = conn.database
-
-    query = f"""
-    SELECT
-        COLUMN_NAME,
-        DATA_TYPE,
-        CHARACTER_MAXIMUM_LENGTH,
-        COLUMN_COMMENT
-    FROM
-        INFORMATION_SCHEMA.COLUMNS
-    WHERE
-        TABLE_SCHEMA = %s AND TABLE_NAME = %s;
+def set_safe_mode(conn, timeout):
+    """
+    Make the session read-only and have the server cancel SELECTs running longer than `timeout`
+    seconds, and lock waits longer than SAFE_LOCK_TIMEOUT.
     """
-
     with conn.cursor() as cursor:
-        cursor.execute(query, (database, table_name))
-        schema = cursor.fetchall()
-
-    # Retrieve foreign key mapping
-    foreign_keys = get_foreign_keys(conn, table_name)
-
-    for column in schema:
-        col_name, data_type, max_length, col_comment = column
-
-        if max_length:
-            line = f"{col_name} {data_type}({max_length})"
-        else:
-            line = f"{col_name} {data_type}"
-
-        # Append FK info if exists
-        if col_name in foreign_keys:
-            fk_table, fk_column = foreign_keys[col_name]
-            line += f" REFERENCES {fk_table}({fk_column})"
-
-        # Add column comment if it exists
-        if col_comment:
-            line += f" -- {col_comment}"
+        cursor.execute(
+            "SET SESSION MAX_EXECUTION_TIME = %s, SESSION lock_wait_timeout = %s",
+            (round(timeout * 1000), max(1, round(SAFE_LOCK_TIMEOUT)))
+        )
+        cursor.execute("SET SESSION TRANSACTION READ ONLY")
 
-        print(line)
+def kill_query(db_url, conn):
+    """Cancel the statement `conn` is running, from a connection of its own."""
+    killer = connect_to_mysql(db_url)
+    try:
+        with killer.cursor() as cursor:
+            cursor.execute(f"KILL QUERY {int(conn.connection_id)}")
+    finally:
+        killer.close()
 
-def get_table_names(db_url) -> list[str]:
-    """Get the table names from the database."""
-    conn = connect_to_mysql(db_url)
+def prepare_watcher(conn):
+    """
+    A connection polling the catalog has to see every change: each query runs in a transaction of
+    its own, and MySQL 8 doesn't serve the creation and update times of INFORMATION_SCHEMA.TABLES
+    from its statistics cache, where they are kept for a day by default.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SET SESSION autocommit = 1")
+        try:
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except mysql.connector.Error:
+            # MySQL 5.7 and MariaDB don't cache them
+            pass
+
+def list_tables(conn) -> list[str]:
     database = conn.database
 
     with conn.cursor() as cursor:
@@ -95,135 +106,506 @@ def get_table_names(db_url) -> list[str]:
             """
             SELECT TABLE_NAME
             FROM information_schema.tables
-            WHERE table_schema = %s AND table_type = 'BASE TABLE'
+            WHERE table_schema = %s AND table_type IN ('BASE TABLE', 'VIEW')
             ORDER BY TABLE_NAME;
             """,
             (database,)
         )
         table_list = cursor.fetchall()
-        table_list = [table[0] for table in table_list]
 
-    conn.close()
-    return table_list
+    return [table[0] for table in table_list]
+
+def get_catalog_fingerprint(conn) -> str:
+    """
+    Cheap checksum of the tables in the database, their creation/update times and comments.
+
+    Only INFORMATION_SCHEMA.TABLES is read, which doesn't open every table definition the way
+    INFORMATION_SCHEMA.COLUMNS does on MySQL 5.7.
+    """
+    database = conn.database
+
+    query = """
+    SELECT
+        COUNT(*),
+        BIT_XOR(CRC32(CONCAT_WS(':', TABLE_NAME, CREATE_TIME, UPDATE_TIME, TABLE_COMMENT)))
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = %s;
+    """
 
-def print_table_name_options(db_url):
-    """Print available table names when none are provided."""
-    table_list = get_table_names(db_url)
-    formatted_table_list = "\n- ".join(table_list)
+    with conn.cursor() as cursor:
+        cursor.execute(query, (database,))
+        table_count, checksum = cursor.fetchall()[0]
 
-    print(
-        f"""
-No table name provided. Please provide a table name from the list below, or use --all:
+    return f"{table_count}:{checksum}"
 
-- {formatted_table_list}
+def get_table_fingerprints(conn, table_names) -> dict[str, str]:
+    """
+    Per-table checksum of the columns, foreign keys, indexes, view definition and comment of every
+    requested table, in five queries for the whole database.
+    """
+    database = conn.database
+    requested = set(table_names)
+    parts = {table_name: [] for table_name in table_names}
+
+    queries = [
+        """
+        SELECT TABLE_NAME, BIT_XOR(CRC32(CONCAT_WS(':',
+            ORDINAL_POSITION, COLUMN_NAME, COLUMN_TYPE, COLUMN_COMMENT
+        )))
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = %s
+        GROUP BY TABLE_NAME;
+        """,
+        """
+        SELECT TABLE_NAME, BIT_XOR(CRC32(CONCAT_WS(':',
+            CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+        )))
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL
+        GROUP BY TABLE_NAME;
+        """,
         """
+        SELECT TABLE_NAME, BIT_XOR(CRC32(CONCAT_WS(':',
+            INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE, SUB_PART, INDEX_TYPE
+        )))
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s
+        GROUP BY TABLE_NAME;
+        """,
+        """
+        SELECT TABLE_NAME, CRC32(VIEW_DEFINITION)
+        FROM INFORMATION_SCHEMA.VIEWS
+        WHERE TABLE_SCHEMA = %s;
+        """,
+        """
+        SELECT TABLE_NAME, CRC32(TABLE_COMMENT)
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s;
+        """,
+    ]
+
+    with conn.cursor() as cursor:
+        for index, query in enumerate(queries):
+            cursor.execute(query, (database,))
+            for table_name, checksum in cursor.fetchall():
+                if table_name in requested:
+                    parts[table_name].append(f"{index}={checksum}")
+
+    return {
+        table_name: ",".join(table_parts)
+        for table_name, table_parts in parts.items()
+        if table_parts
+    }
+
+# sampled as their size
+BINARY_TYPES = {
+    "binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob",
+    "geometry", "point", "linestring", "polygon",
+    "multipoint", "multilinestring", "multipolygon", "geometrycollection",
+}
+# sampled cut to MAX_VALUE_LENGTH characters
+TEXT_TYPES = {
+    "char", "varchar", "tinytext", "text", "mediumtext", "longtext", "json", "enum", "set",
+}
+
+def quote_identifier(name: str) -> str:
+    return "`{}`".format(name.replace("`", "``"))
+
+def sample_select_list(columns) -> tuple[str, set[int]]:
+    """
+    Expressions selecting each column of a sampled row, truncating text and replacing binary
+    values by their size in the query, and the positions of the binary columns.
+    """
+    expressions = []
+    binary_columns = set()
+    for index, column in enumerate(columns):
+        name = quote_identifier(column.name)
+        data_type = column.data_type.lower()
+        if data_type in BINARY_TYPES:
+            expressions.append(f"OCTET_LENGTH({name}) AS {name}")
+            binary_columns.add(index)
+        elif data_type in TEXT_TYPES:
+            expressions.append(f"LEFT({name}, {MAX_VALUE_LENGTH + 1}) AS {name}")
+        else:
+            expressions.append(name)
+
+    return ", ".join(expressions), binary_columns
+
+INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "bigint"}
+
+def integer_primary_key(table: Table):
+    """The primary key column if the introspected table has a single-column integer primary key."""
+    primary_key = next(
+        (constraint for constraint in table.constraints if constraint.startswith("PRIMARY KEY (")),
+        None
     )
+    if not primary_key:
+        return None
 
-def get_table_comment(conn, table_name):
-    """Get table comment if available."""
-    database = conn.database
+    col_name = primary_key[len("PRIMARY KEY ("):-1]
+    for column in table.columns:
+        if column.name == col_name and column.data_type.lower() in INTEGER_TYPES:
+            return col_name
 
-    query = """
-    SELECT TABLE_COMMENT
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s;
+    return None
+
+def get_sample_rows(conn, table: Table, strategy=DEFAULT_SAMPLE_STRATEGY):
+    """
+    Retrieve the column names and a few random rows. Large tables are sampled by seeking to random
+    primary key values rather than sorting the entire table with ORDER BY RAND().
+
+    Large values are truncated in the query, see `sample_select_list`. The column names come from
+    the sample query itself, the primary key and row estimate from the introspected table.
     """
+    table_name = quote_identifier(table.name)
+    estimated_rows = table.estimated_rows
+
+    select_list, binary_columns = (
+        sample_select_list(table.columns) if table.columns else ("*", set())
+    )
 
     with conn.cursor() as cursor:
-        cursor.execute(query, (database, table_name))
-        result = cursor.fetchone()
+        if use_full_scan(strategy, estimated_rows):
+            # the expressions only run on the rows that were picked
+            cursor.execute(
+                f"SELECT {select_list} FROM"
+                f" (SELECT * FROM {table_name} ORDER BY RAND() LIMIT {SAMPLE_SIZE}) AS sample"
+            )
+            return list(cursor.column_names), [bound_row(row, binary_columns) for row in cursor.fetchall()]
+
+        primary_key = integer_primary_key(table)
 
-        if result and result[0]:
-            return result[0]
+        if not primary_key:
+            # nothing to seek on, the first rows are the only cheap option
+            cursor.execute(f"SELECT {select_list} FROM {table_name} LIMIT {SAMPLE_SIZE}")
+            return list(cursor.column_names), [bound_row(row, binary_columns) for row in cursor.fetchall()]
 
-        return ""
+        primary_key = quote_identifier(primary_key)
+        cursor.execute(f"SELECT MIN({primary_key}), MAX({primary_key}) FROM {table_name}")
+        low, high = cursor.fetchall()[0]
+
+        if low is None:
+            return [], []
+
+        sample_rows = []
+        for probe in random_probes(low, high):
+            cursor.execute(
+                f"SELECT {select_list} FROM {table_name} WHERE {primary_key} >= %s ORDER BY {primary_key} LIMIT 1",
+                (probe,)
+            )
+            for row in cursor.fetchall():
+                row = bound_row(row, binary_columns)
+                if row not in sample_rows:
+                    sample_rows.append(row)
 
-def get_foreign_keys(conn, table_name):
+        return list(cursor.column_names), sample_rows
+
+def decode_histogram_value(value):
+    """Histograms store strings as `base64:type254:<base64>`."""
+    if isinstance(value, str) and value.startswith("base64:"):
+        return base64.b64decode(value.split(":", 2)[2]).decode(errors="replace")
+    return value
+
+def get_histograms(conn, table_name) -> dict[str, dict]:
+    """Histograms built by ANALYZE TABLE ... UPDATE HISTOGRAM, MySQL 8.0 and later."""
+    database = conn.database
+
+    query = """
+    SELECT COLUMN_NAME, HISTOGRAM
+    FROM INFORMATION_SCHEMA.COLUMN_STATISTICS
+    WHERE SCHEMA_NAME = %s AND TABLE_NAME = %s;
+    """
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (database, table_name))
+            results = cursor.fetchall()
+    except mysql.connector.ProgrammingError:
+        # MySQL 5.7 and MariaDB don't have COLUMN_STATISTICS
+        return {}
+
+    return {col_name: json.loads(histogram) for col_name, histogram in results}
+
+def get_table_stats(conn, table_name, column_names, estimated_rows=None) -> TableStats | None:
     """
-    Returns a dictionary mapping column names to a tuple (foreign_table, foreign_column)
-    for foreign key constraints of the given table.
+    InnoDB's row estimate (read along with the schema), the cardinality of indexed columns and
+    column histograms, all kept by ANALYZE TABLE, so the table itself is never read.
     """
     database = conn.database
 
+    # the cardinality of an index's first column is that column's number of distinct values
     query = """
-    SELECT
-        COLUMN_NAME,
-        REFERENCED_TABLE_NAME,
-        REFERENCED_COLUMN_NAME
-    FROM
-        INFORMATION_SCHEMA.KEY_COLUMN_USAGE
-    WHERE
-        REFERENCED_TABLE_SCHEMA = %s
-        AND TABLE_NAME = %s
-        AND REFERENCED_TABLE_NAME IS NOT NULL;
+    SELECT s.COLUMN_NAME, MAX(s.CARDINALITY), MAX(s.NON_UNIQUE = 0 AND i.COLUMN_COUNT = 1)
+    FROM INFORMATION_SCHEMA.STATISTICS s
+    JOIN (
+        SELECT INDEX_NAME, COUNT(*) AS COLUMN_COUNT
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+        GROUP BY INDEX_NAME
+    ) i ON i.INDEX_NAME = s.INDEX_NAME
+    WHERE s.TABLE_SCHEMA = %s AND s.TABLE_NAME = %s AND s.SEQ_IN_INDEX = 1
+    GROUP BY s.COLUMN_NAME;
     """
 
     with conn.cursor() as cursor:
-        cursor.execute(query, (database, table_name))
-        results = cursor.fetchall()
+        cursor.execute(query, (database, table_name, database, table_name))
+        indexed = {col_name: (cardinality, unique) for col_name, cardinality, unique in cursor.fetchall()}
+
+    histograms = get_histograms(conn, table_name)
+
+    if not indexed and not histograms and estimated_rows is None:
+        return None
+
+    stats = TableStats(estimated_rows)
+    for col_name in column_names:
+        column = ColumnStats(col_name)
+        if col_name in indexed:
+            cardinality, unique = indexed[col_name]
+            column.distinct = cardinality
+            column.unique = bool(unique)
+
+        histogram = histograms.get(col_name)
+        if histogram and histogram.get("buckets"):
+            buckets = histogram["buckets"]
+            column.null_fraction = histogram.get("null-values")
+            if histogram.get("histogram-type") == "singleton":
+                # [value, cumulative frequency]
+                frequencies = []
+                previous = 0.0
+                for value, cumulative in buckets:
+                    frequencies.append((decode_histogram_value(value), cumulative - previous))
+                    previous = cumulative
+                column.common_values = sorted(frequencies, key=lambda item: -item[1])
+                column.distinct = column.distinct or len(buckets)
+                column.value_range = (frequencies[0][0], frequencies[-1][0])
+            else:
+                # equi-height: [lower bound, upper bound, cumulative frequency, distinct values]
+                column.distinct = column.distinct or sum(bucket[3] for bucket in buckets)
+                column.value_range = (
+                    decode_histogram_value(buckets[0][0]),
+                    decode_histogram_value(buckets[-1][1]),
+                )
+
+        stats.columns.append(column)
+
+    return stats
+
+def load_table_details(conn, tables: dict[str, Table]):
+    """
+    Add view definitions, primary key, unique and check constraints and indexes to `tables`, with
+    one query per catalog table for all of them rather than per table.
+    """
+    if not tables:
+        return
 
-    return {row[0]: (row[1], row[2]) for row in results}
+    database = conn.database
+    placeholders = ", ".join(["%s"] * len(tables))
+    params = (database, *tables)
 
-def describe_database_and_table(db_url: str, table_names: list[str], all_tables: bool, include_data: bool = True):
-    """Main function to describe database tables."""
+    primary_keys, unique_keys, checks = {}, {}, {}
 
-    if not table_names and not all_tables:
-        print_table_name_options(db_url)
-        exit(1)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT TABLE_NAME, VIEW_DEFINITION
+            FROM INFORMATION_SCHEMA.VIEWS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders});
+            """,
+            params
+        )
+        for table_name, view_definition in cursor.fetchall():
+            tables[table_name].kind = "view"
+            tables[table_name].view_definition = view_definition or ""
 
-    print(
-        f"""
-{system_prompt()}
-- You are working with a MySQL database
-        """
-    )
+        cursor.execute(
+            f"""
+            SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, INDEX_TYPE, COLUMN_NAME, SUB_PART
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders})
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX;
+            """,
+            params
+        )
+        indexes = {}
+        for table_name, index_name, non_unique, index_type, col_name, sub_part in cursor.fetchall():
+            # functional indexes (8.0.13+) have no column
+            part = col_name or "(expression)"
+            if sub_part:
+                part += f"({sub_part})"
+            key = (table_name, index_name)
+            indexes.setdefault(key, (non_unique, index_type, []))[2].append(part)
+
+        for (table_name, index_name), (non_unique, index_type, parts) in indexes.items():
+            columns = ", ".join(parts)
+            if index_name == "PRIMARY":
+                primary_keys[table_name] = [f"PRIMARY KEY ({columns})"]
+            elif not int(non_unique):
+                unique_keys.setdefault(table_name, []).append(f"UNIQUE ({columns})")
+            else:
+                kind = f"{index_type} " if index_type in ("FULLTEXT", "SPATIAL") else ""
+                tables[table_name].indexes.append(
+                    f"CREATE {kind}INDEX {index_name} ON {table_name} ({columns})"
+                )
+
+        try:
+            cursor.execute(
+                f"""
+                SELECT tc.TABLE_NAME, cc.CHECK_CLAUSE
+                FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+                JOIN INFORMATION_SCHEMA.CHECK_CONSTRAINTS cc
+                    ON cc.CONSTRAINT_SCHEMA = tc.CONSTRAINT_SCHEMA
+                    AND cc.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+                WHERE tc.CONSTRAINT_TYPE = 'CHECK'
+                    AND tc.TABLE_SCHEMA = %s AND tc.TABLE_NAME IN ({placeholders})
+                ORDER BY tc.TABLE_NAME, tc.CONSTRAINT_NAME;
+                """,
+                params
+            )
+            for table_name, check_clause in cursor.fetchall():
+                checks.setdefault(table_name, []).append(f"CHECK ({check_clause})")
+        except mysql.connector.ProgrammingError:
+            # CHECK_CONSTRAINTS is MySQL 8.0.16 and later
+            pass
 
-    if all_tables:
-        table_names = get_table_names(db_url)
+    for table_name, table in tables.items():
+        for constraints_of_kind in (primary_keys, unique_keys, checks):
+            table.constraints.extend(constraints_of_kind.get(table_name, []))
 
-    conn = connect_to_mysql(db_url)
-    try:
+def load_schema(conn, table_names) -> dict[str, Table]:
+    """
+    Introspect the requested tables with one query each to INFORMATION_SCHEMA.TABLES (which also
+    gives the row estimates sampling and statistics use), COLUMNS and KEY_COLUMN_USAGE for all of
+    them, then `load_table_details`. On MySQL 5.7 information_schema queries open the definitions
+    of the tables they read from disk, so the number of queries, not their size, is what is slow.
+    """
+    if not table_names:
+        return {}
+
+    database = conn.database
+    placeholders = ", ".join(["%s"] * len(table_names))
+    params = (database, *table_names)
+
+    tables = {}
+    foreign_keys = {}
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT TABLE_NAME, TABLE_COMMENT, TABLE_ROWS
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders});
+            """,
+            params
+        )
+        found = {row[0]: row for row in cursor.fetchall()}
+        # in the requested order, tables that don't exist are left out
         for table_name in table_names:
-            # Get table comment
-            table_comment = get_table_comment(conn, table_name)
-            print(
-                f"""
-# Table Schema for `{table_name}`
-{table_comment}
-```sql"""
+            if table_name in found:
+                _, comment, estimated_rows = found[table_name]
+                # InnoDB's estimate, NULL for views
+                tables[table_name] = Table(table_name, comment or "", estimated_rows=estimated_rows)
+
+        cursor.execute(
+            f"""
+            SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, COLUMN_COMMENT
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders})
+            ORDER BY TABLE_NAME, ORDINAL_POSITION;
+            """,
+            params
+        )
+        for table_name, col_name, data_type, max_length, col_comment in cursor.fetchall():
+            if table_name in tables:
+                tables[table_name].columns.append(
+                    Column(col_name, data_type, max_length=max_length, comment=col_comment or "")
+                )
+
+        cursor.execute(
+            f"""
+            SELECT
+                TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME,
+                REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({placeholders})
+                AND REFERENCED_TABLE_NAME IS NOT NULL
+            ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION;
+            """,
+            params
+        )
+        for (
+            table_name, constraint_name, col_name,
+            foreign_schema, foreign_table, foreign_column,
+        ) in cursor.fetchall():
+            # tables in other databases are qualified with it
+            if foreign_schema != database:
+                foreign_table = f"{foreign_schema}.{foreign_table}"
+            columns, foreign_columns = foreign_keys.setdefault(
+                (table_name, constraint_name, foreign_table), ([], [])
+            )
+            columns.append(col_name)
+            foreign_columns.append(foreign_column)
+
+    load_table_details(conn, tables)
+
+    # foreign keys over a single column are part of the column, the others are constraints
+    for (table_name, _, foreign_table), (columns, foreign_columns) in foreign_keys.items():
+        table = tables.get(table_name)
+        if not table:
+            continue
+        if len(columns) == 1:
+            for column in table.columns:
+                if column.name == columns[0]:
+                    column.foreign_key = (foreign_table, foreign_columns[0])
+        else:
+            table.constraints.append(
+                f"FOREIGN KEY ({', '.join(columns)}) REFERENCES {foreign_table}({', '.join(foreign_columns)})"
             )
 
-            describe_table_schema(conn, table_name)
-            print("```")  # Close table schema SQL block
-
-            if include_data:
-                with conn.cursor() as cursor:
-                    # Sample 3 rows
-                    cursor.execute(f"SELECT * FROM {table_name} ORDER BY RAND() LIMIT 3")
-                    sample_rows = cursor.fetchall()
-
-                    # Get column names
-                    cursor.execute(
-                        f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = %s AND TABLE_SCHEMA = %s;",
-                        (table_name, conn.database)
-                    )
-                    col_names = [col[0] for col in cursor.fetchall()]
-
-                    if sample_rows:
-                        print(
-                            f"""
-```
-
-3 sample rows from the `{table_name}` table:
-
-```sql
-                            """
-                        )
-                        for row in sample_rows:
-                            values = ", ".join(map(repr, row))
-                            print(
-                                f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({values});"
-                            )
-                        print("```")
-    finally:
-        conn.close()
+    return tables
+
+class MySQLDialect(Dialect):
+    """
+    mysql-connector is blocking, so every call runs in a worker thread. A connection is only used by
+    one task at a time, which keeps it on one thread at a time.
+    """
+    name = "MySQL"
+
+    async def connect(self):
+        conn = await asyncio.to_thread(connect_to_mysql, self.db_url, self.schema)
+        if self.safe_timeout:
+            await asyncio.to_thread(set_safe_mode, conn, self.safe_timeout)
+        return profiling.wrap_connection(conn)
+
+    async def close(self, conn):
+        await asyncio.to_thread(conn.close)
+
+    def is_timeout(self, error):
+        return isinstance(error, mysql.connector.Error) and error.errno in TIMEOUT_ERRORS
+
+    async def connect_watcher(self):
+        conn = await self.connect()
+        await asyncio.to_thread(prepare_watcher, conn)
+        return conn
+
+    async def catalog_fingerprint(self, conn):
+        return await asyncio.to_thread(get_catalog_fingerprint, conn)
+
+    async def list_tables(self, conn):
+        return await asyncio.to_thread(list_tables, conn)
+
+    async def table_fingerprints(self, conn, table_names):
+        return await asyncio.to_thread(get_table_fingerprints, conn, table_names)
+
+    async def load_schema(self, conn, table_names):
+        return await asyncio.to_thread(load_schema, conn, table_names)
+
+    def interrupt(self, conn):
+        kill_query(self.db_url, conn)
+
+    async def table_stats(self, conn, table):
+        column_names = [column.name for column in table.columns]
+        return await self.run_in_thread(
+            get_table_stats, conn, table.name, column_names, table.estimated_rows
+        )
+
+    async def sample_rows(self, conn, table, strategy=DEFAULT_SAMPLE_STRATEGY):
+        return await self.run_in_thread(get_sample_rows, conn, table, strategy)
@@ -0,0 +1,60 @@
+import math
+import sys
+from contextlib import aclosing
+from typing import AsyncIterator, TextIO
+
+# rough average for English and SQL with common tokenizers, close enough to budget a prompt
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class PromptWriter:
+    """
+    Streams the prompt to `stream` as it is generated, keeping a running token estimate.
+
+    With `max_tokens`, table sections that would push the prompt over the budget are not written
+    and the caller is told to stop introspecting further tables.
+    """
+
+    def __init__(self, stream: TextIO | None = None, max_tokens: int | None = None):
+        self.stream = stream or sys.stdout
+        self.max_tokens = max_tokens
+        self.tokens = 0
+
+    def write(self, text: str):
+        "Write text unconditionally, with a trailing newline like `print`"
+        self.tokens += estimate_tokens(text)
+        print(text, file=self.stream, flush=True)
+
+    def write_section(self, text: str) -> bool:
+        "Write a table section if it fits in the budget, returns False once the budget is exhausted"
+        if self.max_tokens and self.tokens + estimate_tokens(text) > self.max_tokens:
+            return False
+
+        self.write(text)
+        return True
+
+    def write_omitted(self, table_names: list[str]):
+        "Tell the reader which tables were left out of the prompt to stay within the budget"
+        if not table_names:
+            return
+
+        formatted_table_list = ", ".join(f"`{table_name}`" for table_name in table_names)
+        self.write(f"\nTables left out to keep this prompt short: {formatted_table_list}")
+
+    async def write_tables(self, table_names: list[str], sections: AsyncIterator[str]):
+        """
+        Write one section per table as they are generated. Once the budget is exhausted `sections`
+        is closed, so no more tables are introspected, and the remaining tables are listed instead.
+        """
+        index = 0
+        async with aclosing(sections):
+            async for section in sections:
+                if not self.write_section(section):
+                    self.write_omitted(table_names[index:])
+                    return
+
+                index += 1
@@ -1,91 +1,405 @@
 import logging
-import os
+import re
 
 import psycopg
 from psycopg import sql
 
-from llm_sql_prompt.util import system_prompt
-
-logging.basicConfig(
-    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+from llm_sql_prompt import profiling
+from llm_sql_prompt.dialect import Dialect
+from llm_sql_prompt.safe_mode import SAFE_LOCK_TIMEOUT
+from llm_sql_prompt.sampling import (
+    DEFAULT_SAMPLE_STRATEGY,
+    MAX_VALUE_LENGTH,
+    SAMPLE_SIZE,
+    bound_row,
+    use_full_scan,
 )
+from llm_sql_prompt.schema import Column, Table
+from llm_sql_prompt.stats import ColumnStats, TableStats
 
 logger = logging.getLogger(__name__)
 
+# TABLESAMPLE SYSTEM reads roughly this many random pages of a large table
+SYSTEM_SAMPLE_PAGES = 10
+# TABLESAMPLE BERNOULLI keeps roughly this many rows of a mid-sized table
+BERNOULLI_SAMPLE_ROWS = 100
+# above this many rows even BERNOULLI, which reads every page, is too expensive
+LARGE_TABLE_ROWS = 1_000_000
+# tables sampled together in one pipeline
+SAMPLE_BATCH_SIZE = 25
+# watch mode listens on this channel, which an event trigger of the same name notifies on every
+# DDL statement (see the README)
+DDL_CHANNEL = "llm_sql_prompt_ddl"
+# after a notification, further ones are collected for this many seconds, so a migration only
+# regenerates the prompt once
+DDL_SETTLE_TIME = 0.5
+
+# sampled as they are, every other type is sent as text cut to MAX_VALUE_LENGTH (bytea as its size)
+FIXED_SIZE_TYPES = (
+    "smallint",
+    "integer",
+    "bigint",
+    "numeric",
+    "real",
+    "double precision",
+    "boolean",
+    "date",
+    "time",
+    "timestamp",
+    "interval",
+    "uuid",
+    "money",
+    "oid",
+    "inet",
+    "cidr",
+    "macaddr",
+)
+
+
+# Tables, views and foreign tables of `%(schemas)s`, or visible on the search_path when it is NULL,
+# and named in `%(table_names)s` unless it is NULL. Both are text[]. Partitions and tables
+# inheriting from another table are part of their parent, they are only included when named.
+RELATION_FILTER = """
+  c.relkind IN ('r', 'p', 'v', 'm', 'f')
+  AND CASE
+    WHEN %(schemas)s::text[] IS NULL THEN pg_table_is_visible(c.oid)
+    ELSE n.nspname = ANY(%(schemas)s)
+  END
+  AND CASE
+    WHEN %(table_names)s::text[] IS NULL
+      THEN NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+    ELSE c.relname = ANY(%(table_names)s)
+  END
+"""
+
+
+RELATION_KINDS = {
+    "r": "table",
+    "p": "partitioned table",
+    "v": "view",
+    "m": "materialized view",
+    "f": "foreign table",
+}
+
 
 def should_skip_table(table_name: str) -> bool:
     """Check if a table should be skipped due to being a PostgreSQL system table."""
     return table_name.startswith("pg_stat_") or table_name.startswith("pg_")
 
 
-def describe_table_schema(conn, table_name):
-    """Outputs the table schema using SQL, including column comments and FK info if available."""
-    query = """
-    SELECT column_name, data_type, character_maximum_length
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE table_name = %s;
+async def load_schemas(
+    conn, schemas: list[str] | None, table_names: list[str] | None = None
+) -> dict[str, dict[str, Table]]:
     """
-    with conn.cursor() as cursor:
-        cursor.execute(query, (table_name,))
-        schema = cursor.fetchall()
+    Introspect tables in a fixed number of catalog queries, rather than a handful of round trips
+    per table and column, keyed by schema and table name.
 
-    # Retrieve foreign key mapping: { column_name: (foreign_table, foreign_column) }
-    foreign_keys = get_foreign_keys(conn, table_name)
+    With `schemas`, every table in those schemas is read in the same pass. Without, tables are
+    resolved the same way an unqualified name in a query would be, via the search_path. Without
+    `table_names`, all tables are read.
+    """
+    schema_tables: dict[str, dict[str, Table]] = {}
+    params = {
+        "schemas": schemas,
+        "table_names": list(table_names) if table_names is not None else None,
+    }
+
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            f"""
+            SELECT
+              n.nspname,
+              c.relname,
+              COALESCE(obj_description(c.oid, 'pg_class'), ''),
+              c.relkind,
+              CASE WHEN c.relkind IN ('v', 'm') THEN pg_get_viewdef(c.oid) END
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+            ORDER BY n.nspname, c.relname
+            """,
+            params,
+        )
+        for (
+            schema,
+            table_name,
+            table_comment,
+            relkind,
+            view_definition,
+        ) in await cursor.fetchall():
+            if table_names is None and should_skip_table(table_name):
+                continue
 
-    for column in schema:
-        col_name, data_type, max_length = column
+            schema_tables.setdefault(schema, {})[table_name] = Table(
+                table_name,
+                table_comment,
+                kind=RELATION_KINDS[relkind],
+                view_definition=(view_definition or "").strip(),
+            )
 
-        if max_length:
-            line = f"{col_name} {data_type}({max_length})"
-        else:
-            line = f"{col_name} {data_type}"
+        await cursor.execute(
+            f"""
+            SELECT
+              n.nspname,
+              c.relname,
+              a.attname,
+              format_type(a.atttypid, a.atttypmod),
+              COALESCE(col_description(c.oid, a.attnum), '')
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+              AND a.attnum > 0
+              AND NOT a.attisdropped
+            ORDER BY n.nspname, c.relname, a.attnum
+            """,
+            params,
+        )
+        for schema, table_name, col_name, data_type, col_comment in await cursor.fetchall():
+            table = schema_tables.get(schema, {}).get(table_name)
+            if table:
+                table.columns.append(Column(col_name, data_type, comment=col_comment))
 
-        # Append FK info if exists
-        if col_name in foreign_keys:
-            fk_table, fk_column = foreign_keys[col_name]
-            line += f" REFERENCES {fk_table}({fk_column})"
+        # single column foreign keys are attached to their column, the others are constraints
+        await cursor.execute(
+            f"""
+            SELECT n.nspname, c.relname, pg_get_constraintdef(co.oid)
+            FROM pg_constraint co
+            JOIN pg_class c ON c.oid = co.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+              AND co.contype IN ('p', 'u', 'x', 'c', 'f')
+              AND NOT (co.contype = 'f' AND cardinality(co.conkey) = 1)
+            ORDER BY n.nspname, c.relname, position(co.contype IN 'puxcf'), co.conname
+            """,
+            params,
+        )
+        for schema, table_name, definition in await cursor.fetchall():
+            table = schema_tables.get(schema, {}).get(table_name)
+            if table:
+                table.constraints.append(definition)
+
+        # referenced tables in another schema are qualified with it
+        foreign_keys: dict[tuple[str, str], dict[str, tuple[str, str]]] = {}
+        await cursor.execute(
+            f"""
+            SELECT
+              n.nspname,
+              c.relname,
+              a.attname,
+              CASE
+                WHEN fn.oid = n.oid THEN fc.relname
+                ELSE fn.nspname || '.' || fc.relname
+              END,
+              fa.attname
+            FROM pg_constraint co
+            JOIN pg_class c ON c.oid = co.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            CROSS JOIN LATERAL unnest(co.conkey, co.confkey) AS k(attnum, fattnum)
+            JOIN pg_attribute a ON a.attrelid = co.conrelid AND a.attnum = k.attnum
+            JOIN pg_class fc ON fc.oid = co.confrelid
+            JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+            JOIN pg_attribute fa ON fa.attrelid = co.confrelid AND fa.attnum = k.fattnum
+            WHERE {RELATION_FILTER}
+              AND co.contype = 'f'
+              AND cardinality(co.conkey) = 1
+            ORDER BY n.nspname, c.relname, co.conname
+            """,
+            params,
+        )
+        for (
+            schema,
+            table_name,
+            column_name,
+            foreign_table,
+            foreign_column,
+        ) in await cursor.fetchall():
+            foreign_keys.setdefault((schema, table_name), {})[column_name] = (
+                foreign_table,
+                foreign_column,
+            )
 
-        # Get column comment if it exists
-        col_comment = get_column_comments(conn, table_name, col_name)
-        if col_comment:
-            line += f" -- {col_comment}"
+        # indexes backing a primary key, unique or exclusion constraint are listed as constraints
+        await cursor.execute(
+            f"""
+            SELECT n.nspname, c.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+              AND NOT EXISTS (
+                SELECT 1
+                FROM pg_constraint co
+                WHERE co.conindid = i.indexrelid
+                  AND co.conrelid = i.indrelid
+                  AND co.contype IN ('p', 'u', 'x')
+              )
+            ORDER BY n.nspname, c.relname, i.indexrelid::regclass::text
+            """,
+            params,
+        )
+        for schema, table_name, definition in await cursor.fetchall():
+            table = schema_tables.get(schema, {}).get(table_name)
+            if table:
+                # btree is the default, and the most common by far
+                table.indexes.append(definition.replace(" USING btree ", " "))
+
+        # partitions and inheriting tables are summarized on their parent
+        await cursor.execute(
+            f"""
+            SELECT
+              n.nspname,
+              c.relname,
+              CASE WHEN c.relkind = 'p' THEN pg_get_partkeydef(c.oid) END,
+              count(*)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhparent
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+            GROUP BY n.nspname, c.relname, c.oid
+            """,
+            params,
+        )
+        for schema, table_name, partition_key, partition_count in await cursor.fetchall():
+            table = schema_tables.get(schema, {}).get(table_name)
+            if table:
+                table.partition_key = partition_key or ""
+                table.partition_count = partition_count
 
-        print(line)
+    for schema, tables in schema_tables.items():
+        for table in tables.values():
+            table_foreign_keys = foreign_keys.get((schema, table.name), {})
+            for column in table.columns:
+                column.foreign_key = table_foreign_keys.get(column.name)
 
+    return schema_tables
 
-def get_table_names(db_url) -> list[str]:
-    """Get the table names from the database."""
-    with psycopg.connect(db_url) as conn:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-                ORDER BY table_name
-                """
-            )
-            all_tables = [row[0] for row in cursor.fetchall()]
-            # Filter out PostgreSQL system tables
-            table_list = [table for table in all_tables if not should_skip_table(table)]
-    return table_list
 
+async def load_schema(
+    conn, table_names: list[str], schema: str | None = None
+) -> dict[str, Table]:
+    """Introspect the requested tables of `schema`, or those visible on the search_path."""
+    schema_tables = await load_schemas(conn, [schema] if schema else None, table_names)
+    return {
+        table_name: table
+        for tables in schema_tables.values()
+        for table_name, table in tables.items()
+    }
 
-def print_table_name_options(db_url):
-    table_list = get_table_names(db_url)
-    formatted_table_list = "\n- ".join(table_list)
 
-    # Print the table names
-    print(
-        f"""
-No table name provided. Please provide a table name from the list below, or use --all:
+def qualified_name(table_name: str, schema: str | None = None) -> sql.Identifier:
+    return sql.Identifier(schema, table_name) if schema else sql.Identifier(table_name)
 
-- {formatted_table_list}
-        """
-    )
+
+async def list_tables(conn, schema: str | None = None) -> list[str]:
+    """Tables of `schema`, without the partitions and inheriting tables their parent describes."""
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT t.table_name
+            FROM information_schema.tables t
+            JOIN pg_namespace n ON n.nspname = t.table_schema
+            JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = t.table_name
+            WHERE t.table_schema = %s
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+            ORDER BY t.table_name
+            """,
+            (schema or "public",),
+        )
+        all_tables = [row[0] for row in await cursor.fetchall()]
+    # Filter out PostgreSQL system tables
+    return [table for table in all_tables if not should_skip_table(table)]
+
+
+async def get_catalog_fingerprint(conn) -> str:
+    """
+    Cheap hash of the catalog rows describing tables, columns, constraints, view definitions,
+    comments and extensions. Indexes are rows of pg_class too.
+    Any DDL touching them creates new row versions, which changes their xmin.
+    """
+    query = """
+    SELECT md5(concat_ws('|',
+      current_schemas(false)::text,
+      (
+        SELECT string_agg(c.oid::text || ':' || c.xmin::text, ',' ORDER BY c.oid)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+          AND n.nspname NOT LIKE 'pg_toast%'
+      ),
+      (
+        SELECT string_agg(a.attrelid::text || '.' || a.attnum::text || ':' || a.xmin::text, ',' ORDER BY a.attrelid, a.attnum)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+          AND n.nspname NOT LIKE 'pg_toast%'
+          AND a.attnum > 0
+      ),
+      (SELECT string_agg(co.oid::text || ':' || co.xmin::text, ',' ORDER BY co.oid) FROM pg_constraint co),
+      (SELECT string_agg(r.oid::text || ':' || r.xmin::text, ',' ORDER BY r.oid) FROM pg_rewrite r),
+      (
+        SELECT string_agg(d.objoid::text || '.' || d.objsubid::text || ':' || d.xmin::text, ',' ORDER BY d.objoid, d.objsubid)
+        FROM pg_description d
+        WHERE d.classoid = 'pg_class'::regclass
+      ),
+      (SELECT string_agg(e.oid::text || ':' || e.xmin::text, ',' ORDER BY e.oid) FROM pg_extension e)
+    ))
+    """
+    async with conn.cursor() as cursor:
+        await cursor.execute(query)
+        return (await cursor.fetchone())[0]
 
 
-def get_installed_extensions(conn):
+async def get_table_fingerprints(
+    conn, table_names: list[str], schema: str | None = None
+) -> dict[str, str]:
+    """
+    Cheap per-table checksum of the catalog rows describing a table, its columns, constraints,
+    indexes, view definition and comments. Like get_catalog_fingerprint, any DDL touching them
+    changes their xmin.
+    """
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            f"""
+            SELECT c.relname, md5(concat_ws('|',
+              c.oid::text || ':' || c.xmin::text,
+              (
+                SELECT string_agg(a.attnum::text || ':' || a.xmin::text, ',' ORDER BY a.attnum)
+                FROM pg_attribute a
+                WHERE a.attrelid = c.oid AND a.attnum > 0
+              ),
+              (
+                SELECT string_agg(co.oid::text || ':' || co.xmin::text, ',' ORDER BY co.oid)
+                FROM pg_constraint co
+                WHERE co.conrelid = c.oid
+              ),
+              (
+                SELECT string_agg(i.indexrelid::text || ':' || i.xmin::text, ',' ORDER BY i.indexrelid)
+                FROM pg_index i
+                WHERE i.indrelid = c.oid
+              ),
+              (
+                SELECT string_agg(r.oid::text || ':' || r.xmin::text, ',' ORDER BY r.oid)
+                FROM pg_rewrite r
+                WHERE r.ev_class = c.oid
+              ),
+              (
+                SELECT string_agg(d.objsubid::text || ':' || d.xmin::text, ',' ORDER BY d.objsubid)
+                FROM pg_description d
+                WHERE d.objoid = c.oid AND d.classoid = 'pg_class'::regclass
+              )
+            ))
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE {RELATION_FILTER}
+            """,
+            {"schemas": [schema] if schema else None, "table_names": list(table_names)},
+        )
+        return dict(await cursor.fetchall())
+
+
+async def get_installed_extensions(conn):
     """Return a list of installed extensions with version and comment (if available)."""
     query = """
     SELECT e.extname, e.extversion, COALESCE(x.comment, '') AS comment
@@ -93,47 +407,462 @@ def get_installed_extensions(conn):
     LEFT JOIN pg_available_extensions x ON e.extname = x.name
     ORDER BY e.extname;
     """
-    with conn.cursor() as cursor:
-        cursor.execute(query)
-        return cursor.fetchall()  # list of (name, version, comment)
+    async with conn.cursor() as cursor:
+        await cursor.execute(query)
+        return await cursor.fetchall()  # list of (name, version, comment)
+
+
+async def get_table_sizes(
+    conn, table_names: list[str], schema: str | None = None
+) -> list[tuple[float | None, int]]:
+    """
+    Returns the planner's row estimate (None if the table was never analyzed) and the current
+    number of pages of every table, in one query and without reading the tables themselves.
+    """
+    query = """
+    SELECT t.i, c.reltuples, pg_relation_size(c.oid) / current_setting('block_size')::int
+    FROM unnest(%s::text[]) WITH ORDINALITY AS t(name, i)
+    JOIN pg_class c ON c.oid = to_regclass(t.name)
+    """
+    names = [qualified_name(table_name, schema).as_string(conn) for table_name in table_names]
+    sizes = [(None, 0)] * len(table_names)
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, (names,))
+        for index, reltuples, pages in await cursor.fetchall():
+            # reltuples is -1 until the table is first vacuumed or analyzed
+            sizes[index - 1] = (reltuples if reltuples >= 0 else None), pages
+
+    return sizes
+
+
+async def get_table_size(
+    conn, table_name, schema: str | None = None
+) -> tuple[float | None, int]:
+    return (await get_table_sizes(conn, [table_name], schema))[0]
+
+
+async def get_sample_sources(
+    conn, table_names: list[str], schema: str | None = None
+) -> list[tuple[str | None, str, float | None, int]]:
+    """
+    The schema and name of the relation to sample for every table, with its row estimate and
+    number of pages, in one query. That is the table itself, except for partitioned tables and
+    tables other tables inherit from: the newest of their partitions (or inheriting tables) that
+    isn't empty is sampled, instead of planning and scanning a query over every partition.
+    """
+    query = """
+    WITH RECURSIVE tree AS (
+      SELECT t.i, c.oid AS relid
+      FROM unnest(%s::text[]) WITH ORDINALITY AS t(name, i)
+      JOIN pg_class c ON c.oid = to_regclass(t.name)
+      UNION ALL
+      SELECT tree.i, inh.inhrelid
+      FROM tree
+      JOIN pg_inherits inh ON inh.inhparent = tree.relid
+    )
+    SELECT DISTINCT ON (tree.i)
+      tree.i,
+      n.nspname,
+      c.relname,
+      c.reltuples,
+      pg_relation_size(c.oid) / current_setting('block_size')::int
+    FROM tree
+    JOIN pg_class c ON c.oid = tree.relid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    -- partitioned tables have no rows of their own
+    WHERE c.relkind <> 'p'
+    ORDER BY tree.i, pg_relation_size(c.oid) > 0 DESC, c.oid DESC
+    """
+    names = [qualified_name(table_name, schema).as_string(conn) for table_name in table_names]
+    # partitioned tables without partitions are sampled as they are, there is nothing to read
+    sources = [(schema, table_name, None, 0) for table_name in table_names]
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, (names,))
+        for index, source_schema, source_name, reltuples, pages in await cursor.fetchall():
+            # reltuples is -1 until the table is first vacuumed or analyzed
+            estimated_rows = reltuples if reltuples >= 0 else None
+            sources[index - 1] = (source_schema, source_name, estimated_rows, pages)
+
+    return sources
+
+
+def sample_select_list(columns: list[Column]) -> tuple[sql.Composable, set[int]]:
+    """
+    Expressions selecting each column of a sampled row, truncating text and replacing bytea by its
+    size in the query, and the positions of the bytea columns.
+    """
+    expressions = []
+    binary_columns = set()
+    for index, column in enumerate(columns):
+        name = sql.Identifier(column.name)
+        if column.data_type == "bytea":
+            expression = sql.SQL("octet_length({})").format(name)
+            binary_columns.add(index)
+        elif column.data_type.startswith(FIXED_SIZE_TYPES) and "[" not in column.data_type:
+            expression = name
+        else:
+            expression = sql.SQL("left({}::text, {})").format(
+                name, sql.Literal(MAX_VALUE_LENGTH + 1)
+            )
+        expressions.append(sql.SQL("{} AS {}").format(expression, name))
+
+    return sql.SQL(", ").join(expressions), binary_columns
+
+
+def sample_queries(
+    table_name,
+    strategy: str,
+    estimated_rows: float | None,
+    pages: int,
+    schema: str | None = None,
+    columns: list[Column] | None = None,
+) -> tuple[sql.Composable, sql.Composable | None, set[int]]:
+    """
+    The query sampling a table of the given size, the query reading its first rows if the sample
+    may come back short (None otherwise), and the positions of the bytea columns.
 
+    With `columns`, large values are truncated in the query (see `sample_select_list`), which only
+    runs on the rows picked by the sampling subquery.
+    """
+    table = qualified_name(table_name, schema)
+    limit = sql.Literal(SAMPLE_SIZE)
+
+    tablesample = None
+    if strategy == "random" or (pages and use_full_scan(strategy, estimated_rows)):
+        sample_query = sql.SQL("SELECT * FROM {} ORDER BY RANDOM() LIMIT {}").format(
+            table, limit
+        )
+    elif not pages:
+        # views can't be sampled, and empty or partitioned tables have no pages of their own
+        sample_query = sql.SQL("SELECT * FROM {} LIMIT {}").format(table, limit)
+    elif (
+        strategy == "auto"
+        and estimated_rows is not None
+        and estimated_rows < LARGE_TABLE_ROWS
+    ):
+        # row-level sampling gives a better spread, but still reads every page
+        percent = 100.0 * BERNOULLI_SAMPLE_ROWS / max(estimated_rows, 1)
+        tablesample = sql.SQL("BERNOULLI ({})").format(sql.Literal(min(100.0, percent)))
+    else:
+        # block-level sampling only reads the sampled pages
+        percent = 100.0 * SYSTEM_SAMPLE_PAGES / pages
+        tablesample = sql.SQL("SYSTEM ({})").format(sql.Literal(min(100.0, percent)))
+
+    fallback_query = None
+    if tablesample:
+        sample_query = sql.SQL(
+            "SELECT * FROM {} TABLESAMPLE {} ORDER BY RANDOM() LIMIT {}"
+        ).format(table, tablesample, limit)
+        # sampled pages can be empty (stale statistics, dead tuples), the first rows are the fallback
+        fallback_query = sql.SQL("SELECT * FROM {} LIMIT {}").format(table, limit)
+
+    binary_columns = set()
+    if columns:
+        select_list, binary_columns = sample_select_list(columns)
+        sample_query = sql.SQL("SELECT {} FROM ({}) AS sample").format(
+            select_list, sample_query
+        )
+        if fallback_query:
+            fallback_query = sql.SQL("SELECT {} FROM ({}) AS sample").format(
+                select_list, fallback_query
+            )
 
-def describe_database_and_table(
-    db_url: str, table_names: list[str], all_tables: bool, include_data: bool = True
+    return sample_query, fallback_query, binary_columns
+
+
+async def get_sample_rows(
+    conn,
+    table_name,
+    strategy: str = DEFAULT_SAMPLE_STRATEGY,
+    schema: str | None = None,
+    columns: list[Column] | None = None,
 ):
-    """Main function to describe database tables, including installed extensions."""
+    """
+    Retrieve the column names and a few random rows, using TABLESAMPLE instead of sorting the
+    entire table when the table is large enough for that to matter. Partitioned tables are
+    sampled from one of their partitions (see `get_sample_sources`).
+    """
+    [(source_schema, source_name, estimated_rows, pages)] = await get_sample_sources(
+        conn, [table_name], schema
+    )
+
+    sample_query, fallback_query, binary_columns = sample_queries(
+        source_name, strategy, estimated_rows, pages, source_schema, columns
+    )
+
+    async with conn.cursor() as cursor:
+        await cursor.execute(sample_query)
+        sample_rows = await cursor.fetchall()
+
+        if fallback_query and len(sample_rows) < SAMPLE_SIZE:
+            await cursor.execute(fallback_query)
+            sample_rows = await cursor.fetchall()
 
-    if not table_names and not all_tables:
-        print_table_name_options(db_url)
-        exit(1)
+        column_names = [column.name for column in cursor.description]
 
-    if all_tables:
-        table_names = get_table_names(db_url)
+    return column_names, [bound_row(row, binary_columns) for row in sample_rows]
 
-    with psycopg.connect(db_url) as conn:
-        # Fetch installed extensions once per run
-        extensions = get_installed_extensions(conn)
-        # Fetch server version
-        with conn.cursor() as cursor:
-            server_version = "unknown"
+
+async def fetch_pipelined(
+    conn, queries: list[sql.Composable]
+) -> list[tuple[list[str], list[tuple]]]:
+    """
+    The column names and rows of every query. All queries are sent in one pipeline before the first
+    result is read, so they share a single round trip.
+    """
+    results = []
+    async with conn.pipeline():
+        cursors = []
+        for query in queries:
+            cursor = conn.cursor()
+            await cursor.execute(query)
+            cursors.append(cursor)
+
+        for cursor in cursors:
+            rows = await cursor.fetchall()
+            results.append(([column.name for column in cursor.description], rows))
+            await cursor.close()
+
+    return results
+
+
+async def get_sample_rows_pipelined(
+    conn,
+    tables: list[Table],
+    strategy: str = DEFAULT_SAMPLE_STRATEGY,
+    schema: str | None = None,
+) -> list[tuple[list[str], list[tuple]]]:
+    """
+    `get_sample_rows` for many tables in at most three round trips: the relation to sample and size
+    of every table, every sample query in one pipeline, and the fallbacks of samples that came back
+    short in another.
+    """
+    sources = await get_sample_sources(conn, [table.name for table in tables], schema)
+
+    queries = [
+        sample_queries(
+            source_name, strategy, estimated_rows, pages, source_schema, table.columns
+        )
+        for table, (source_schema, source_name, estimated_rows, pages) in zip(
+            tables, sources
+        )
+    ]
+    results = await fetch_pipelined(conn, [sample_query for sample_query, _, _ in queries])
+
+    short = [
+        index
+        for index, (_, fallback_query, _) in enumerate(queries)
+        if fallback_query and len(results[index][1]) < SAMPLE_SIZE
+    ]
+    if short:
+        fallbacks = await fetch_pipelined(conn, [queries[index][1] for index in short])
+        for index, result in zip(short, fallbacks):
+            results[index] = result
+
+    return [
+        (column_names, [bound_row(row, binary_columns) for row in sample_rows])
+        for (column_names, sample_rows), (_, _, binary_columns) in zip(results, queries)
+    ]
+
+
+async def get_table_stats(
+    conn, table_name, schema: str | None = None
+) -> TableStats | None:
+    """
+    The planner's row estimate and per-column statistics from pg_stats, which ANALYZE (or
+    autovacuum) keeps up to date. Nothing is read from the table itself.
+    """
+    estimated_rows, _ = await get_table_size(conn, table_name, schema)
+
+    # partitioned tables only have statistics over their partitions (inherited)
+    query = """
+    SELECT DISTINCT ON (a.attnum)
+        s.attname,
+        s.null_frac,
+        s.n_distinct,
+        array_to_json(s.most_common_vals),
+        s.most_common_freqs,
+        array_to_json(s.histogram_bounds) -> 0,
+        array_to_json(s.histogram_bounds) -> -1
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_stats s ON s.schemaname = n.nspname AND s.tablename = c.relname
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+    WHERE c.oid = to_regclass(%s)
+    ORDER BY a.attnum, s.inherited
+    """
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, (qualified_name(table_name, schema).as_string(conn),))
+        rows = await cursor.fetchall()
+
+    if not rows and estimated_rows is None:
+        return None
+
+    stats = TableStats(estimated_rows)
+    for name, null_frac, n_distinct, common_values, frequencies, low, high in rows:
+        column = ColumnStats(name, null_fraction=null_frac, unique=n_distinct == -1)
+        # negative values are a fraction of the rows, so the estimate grows with the table
+        if n_distinct > 0:
+            column.distinct = n_distinct
+        elif n_distinct < 0 and estimated_rows is not None:
+            column.distinct = -n_distinct * estimated_rows
+        if common_values:
+            column.common_values = list(zip(common_values, frequencies))
+        if low is not None:
+            column.value_range = (low, high)
+        stats.columns.append(column)
+
+    return stats
+
+
+async def has_ddl_trigger(conn) -> bool:
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT EXISTS (
+              SELECT 1 FROM pg_event_trigger WHERE evtname = %s AND evtenabled <> 'D'
+            )
+            """,
+            (DDL_CHANNEL,),
+        )
+        return (await cursor.fetchone())[0]
+
+
+async def get_server_version(conn) -> str:
+    async with conn.cursor() as cursor:
+        server_version = "unknown"
+        try:
+            await cursor.execute("SHOW server_version;")
+            row = await cursor.fetchone()
+            if row and row[0]:
+                server_version = str(row[0])
+        except Exception:
             try:
-                cursor.execute("SHOW server_version;")
-                row = cursor.fetchone()
+                await cursor.execute("SELECT version();")
+                row = await cursor.fetchone()
                 if row and row[0]:
-                    server_version = str(row[0])
+                    # typical format: 'PostgreSQL 16.2 (Homebrew) on ...'
+                    parts = str(row[0]).split()
+                    if len(parts) >= 2:
+                        server_version = parts[1]
+                    else:
+                        server_version = str(row[0])
             except Exception:
-                try:
-                    cursor.execute("SELECT version();")
-                    row = cursor.fetchone()
-                    if row and row[0]:
-                        # typical format: 'PostgreSQL 16.2 (Homebrew) on ...'
-                        parts = str(row[0]).split()
-                        if len(parts) >= 2:
-                            server_version = parts[1]
-                        else:
-                            server_version = str(row[0])
-                except Exception:
-                    pass
+                pass
+    return server_version
+
+
+class ProfiledAsyncCursor(psycopg.AsyncCursor):
+    "Records every query and the rows it returned while profiling"
+
+    record: profiling.QueryRecord | None = None
+
+    async def execute(self, *args, **kwargs):
+        profiler = profiling.current_profiler.get()
+        self.record = profiler and profiler.start_query(
+            profiling.caller_label(), self.connection
+        )
+        with profiling.timed(self.record):
+            return await super().execute(*args, **kwargs)
+
+    async def fetchall(self):
+        with profiling.timed(self.record):
+            rows = await super().fetchall()
+
+        if self.record:
+            self.record.rows += len(rows)
+            self.record.bytes += profiling.rows_size(rows)
+        return rows
+
+    async def fetchone(self):
+        with profiling.timed(self.record):
+            row = await super().fetchone()
+
+        if self.record and row is not None:
+            self.record.rows += 1
+            self.record.bytes += profiling.rows_size([row])
+        return row
+
+
+class PostgresDialect(Dialect):
+    name = "PostgreSQL"
+
+    async def connect(self):
+        # SQLAlchemy style URLs name the driver (postgresql+psycopg://), which libpq rejects
+        conninfo = re.sub(r"^(\w+)\+\w+://", r"\1://", self.db_url)
+        # every query is a read, autocommit avoids holding a snapshot open for the whole run
+        conn = await psycopg.AsyncConnection.connect(
+            conninfo,
+            autocommit=True,
+            cursor_factory=(
+                ProfiledAsyncCursor if profiling.active() else psycopg.AsyncCursor
+            ),
+        )
+        if self.safe_timeout:
+            # set_config rather than connection options, which poolers like PgBouncer reject
+            await conn.execute(
+                """
+                SELECT
+                  set_config('statement_timeout', %s, false),
+                  set_config('lock_timeout', %s, false),
+                  set_config('default_transaction_read_only', 'on', false)
+                """,
+                (
+                    f"{self.safe_timeout * 1000:.0f}",
+                    f"{SAFE_LOCK_TIMEOUT * 1000:.0f}",
+                ),
+            )
+
+        return conn
+
+    async def close(self, conn):
+        await conn.close()
+
+    def is_timeout(self, error: Exception) -> bool:
+        return isinstance(
+            error, (psycopg.errors.QueryCanceled, psycopg.errors.LockNotAvailable)
+        )
+
+    async def catalog_fingerprint(self, conn) -> str:
+        return await get_catalog_fingerprint(conn)
+
+    async def schema_changes(self, interval: float):
+        """
+        Waits for the notifications of the `llm_sql_prompt_ddl` event trigger, so the catalog is
+        never polled. Without the trigger, the catalog fingerprint is polled instead.
+        """
+        conn = await self.connect()
+        try:
+            if await has_ddl_trigger(conn):
+                await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(DDL_CHANNEL)))
+                yield
+                while True:
+                    async for _ in conn.notifies(stop_after=1):
+                        pass
+                    async for _ in conn.notifies(timeout=DDL_SETTLE_TIME):
+                        pass
+                    yield
+        finally:
+            await self.close(conn)
+
+        logger.warning(
+            f"There is no `{DDL_CHANNEL}` event trigger to be notified of schema changes by,"
+            f" the catalog is checked every {interval:g}s instead"
+        )
+        async for _ in super().schema_changes(interval):
+            yield
+
+    async def list_tables(self, conn) -> list[str]:
+        return await list_tables(conn, self.schema)
+
+    async def table_fingerprints(self, conn, table_names: list[str]) -> dict[str, str]:
+        return await get_table_fingerprints(conn, table_names, self.schema)
+
+    async def describe_database(self, conn) -> str:
+        """Server version and installed extensions."""
+        server_version = await get_server_version(conn)
+        extensions = await get_installed_extensions(conn)
+
         if extensions:
             extensions_formatted = "\n".join(
                 f"  - {name} ({version}){f': {comment}' if comment else ''}"
@@ -143,125 +872,37 @@ def describe_database_and_table(
         else:
             extensions_block = "- No PostgreSQL extensions installed in this database"
 
-        print(
-            f"""
-{system_prompt()}
-- You are working with a PostgreSQL database (server version: {server_version})
-{extensions_block}
-            """
-        )
+        return f"""- You are working with a PostgreSQL database (server version: {server_version})
+{extensions_block}"""
 
-        for table_name in table_names:
-            # Skip PostgreSQL system tables that might cause access issues
-            if should_skip_table(table_name):
-                logger.info(f"Skipping table `{table_name}` (PostgreSQL system table)")
-                continue
+    async def load_schema(self, conn, table_names: list[str]) -> dict[str, Table]:
+        return await load_schema(conn, table_names, self.schema)
 
-            table_comment = get_table_comment(conn, table_name)
-            print(
-                f"""
-# Table Schema for `{table_name}`
-{table_comment}
-```sql"""
-            )
+    async def load_schemas(
+        self, conn, schemas: list[str]
+    ) -> dict[str, dict[str, Table]] | None:
+        return await load_schemas(conn, schemas)
 
-            describe_table_schema(conn, table_name)
-            print("```")  # Close table schema SQL block
-
-            if include_data:
-                with conn.cursor() as cursor:
-                    # Retrieve sample rows (identifier safely inserted)
-                    sample_query = sql.SQL(
-                        "SELECT * FROM {} ORDER BY RANDOM() LIMIT 3"
-                    ).format(sql.Identifier(table_name))
-                    cursor.execute(sample_query)
-                    sample_rows = cursor.fetchall()
-
-                    cursor.execute(
-                        "SELECT column_name FROM INFORMATION_SCHEMA.COLUMNS WHERE table_name = %s;",
-                        (table_name,),
-                    )
-                    col_names = [col[0] for col in cursor.fetchall()]
-
-                    if sample_rows:
-                        print(
-                            f"""
-```
-
-3 sample rows from the `{table_name}` table:
-
-```sql
-                            """
-                        )
-                        for row in sample_rows:
-                            values = ", ".join(map(repr, row))
-                            print(
-                                f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({values});"
-                            )
-                        print("```")
-
-
-def get_table_comment(conn, table_name):
-    query = """
-    SELECT pd.description
-    FROM pg_description pd
-    JOIN pg_class pc ON pd.objoid = pc.oid
-    WHERE pc.relname = %s AND pd.objsubid = 0
-    """
-    with conn.cursor() as cursor:
-        cursor.execute(query, (table_name,))
-        result = cursor.fetchone()
+    async def sample_rows(
+        self, conn, table: Table, strategy: str = DEFAULT_SAMPLE_STRATEGY
+    ) -> tuple[list[str], list[tuple]]:
+        return await get_sample_rows(
+            conn, table.name, strategy, self.schema, table.columns
+        )
 
-        if result:
-            return result[0]
+    @property
+    def sample_batch_size(self) -> int:
+        # pipeline mode needs libpq 14 or later
+        return SAMPLE_BATCH_SIZE if psycopg.AsyncPipeline.is_supported() else 0
 
-        return ""
+    async def sample_rows_batch(
+        self, conn, tables: list[Table], strategy: str = DEFAULT_SAMPLE_STRATEGY
+    ) -> list[tuple[list[str], list[tuple]]]:
+        return await get_sample_rows_pipelined(conn, tables, strategy, self.schema)
 
+    async def table_stats(self, conn, table: Table) -> TableStats | None:
+        return await get_table_stats(conn, table.name, self.schema)
 
-def get_column_comments(conn, table_name, column_name: str | None = None):
-    """
-    When column_name is provided, returns the comment for that column.
-    Otherwise, returns a dictionary mapping column names to comments.
-    """
-    query = """
-    SELECT a.attname as column_name, pd.description
-    FROM pg_description pd
-    JOIN pg_class pc ON pd.objoid = pc.oid
-    JOIN pg_attribute a ON pd.objsubid = a.attnum AND a.attrelid = pc.oid
-    WHERE pc.relname = %s AND pd.objsubid > 0
-    """
-    params = [table_name]
-    if column_name:
-        query += " AND a.attname = %s"
-        params.append(column_name)
-    with conn.cursor() as cursor:
-        cursor.execute(query, tuple(params))
-        if column_name:
-            result = cursor.fetchone()
-            return result[1] if result and result[1] else ""
-        else:
-            return {row[0]: row[1] for row in cursor.fetchall()}
-
-
-def get_foreign_keys(conn, table_name):
-    """
-    Returns a dictionary mapping column names to a tuple (foreign_table, foreign_column)
-    for foreign key constraints of the given table.
-    """
-    query = """
-    SELECT
-      kcu.column_name,
-      ccu.table_name AS foreign_table_name,
-      ccu.column_name AS foreign_column_name
-    FROM information_schema.table_constraints AS tc
-    JOIN information_schema.key_column_usage AS kcu
-      ON tc.constraint_name = kcu.constraint_name
-    JOIN information_schema.constraint_column_usage AS ccu
-      ON ccu.constraint_name = tc.constraint_name
-    WHERE tc.constraint_type = 'FOREIGN KEY'
-      AND tc.table_name = %s;
-    """
-    with conn.cursor() as cursor:
-        cursor.execute(query, (table_name,))
-        results = cursor.fetchall()
-    return {row[0]: (row[1], row[2]) for row in results}
+    def skip_table(self, table_name: str) -> bool:
+        # Skip PostgreSQL system tables that might cause access issues
+        return should_skip_table(table_name)
@@ -0,0 +1,285 @@
+"""
+Records every query sent to the database while profiling is enabled: which backend function sent
+it, the phase of the run and table it was for, how long it took and how much data came back.
+
+Connections opened while a Profiler is active have their cursors wrapped, nothing is wrapped
+otherwise. The phase and table are context variables, so they follow asyncio tasks and the worker
+threads of `asyncio.to_thread`.
+"""
+
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import TextIO
+
+# the function sending a query is looked up in these modules, it becomes the query's label
+BACKEND_MODULES = {
+    "llm_sql_prompt.postgres",
+    "llm_sql_prompt.mysql",
+    "llm_sql_prompt.sqlite",
+}
+
+current_profiler: ContextVar["Profiler | None"] = ContextVar(
+    "current_profiler", default=None
+)
+current_phase: ContextVar[str] = ContextVar("current_phase", default="")
+current_table: ContextVar[str | None] = ContextVar("current_table", default=None)
+
+
+@dataclass
+class QueryRecord:
+    label: str
+    phase: str
+    table: str | None
+    # identifies the connection, so concurrent queries can be told apart
+    connection: int
+    # seconds since the profiler started
+    start: float
+    duration: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+
+
+class Profiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.records: list[QueryRecord] = []
+        self.connections: dict[int, int] = {}
+
+    def __enter__(self):
+        self.token = current_profiler.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished = time.perf_counter()
+        current_profiler.reset(self.token)
+
+    def start_query(self, label: str, connection: object) -> QueryRecord:
+        record = QueryRecord(
+            label,
+            current_phase.get(),
+            current_table.get(),
+            self.connections.setdefault(id(connection), len(self.connections) + 1),
+            time.perf_counter() - self.started,
+        )
+        self.records.append(record)
+        return record
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def print_summary(self, stream: TextIO | None = None):
+        "Per phase, per query and per table breakdown, slowest first"
+        stream = stream or sys.stderr
+        total = sum(record.duration for record in self.records)
+
+        print(
+            f"\nProfile: {len(self.records)} queries, {total:.3f}s in queries, {self.wall_time:.3f}s wall",
+            file=stream,
+        )
+
+        for title, key, limit in [
+            ("phase", lambda record: record.phase or "-", None),
+            ("query", lambda record: record.label, None),
+            ("table", lambda record: record.table, 15),
+        ]:
+            groups = defaultdict(list)
+            for record in self.records:
+                if key(record):
+                    groups[key(record)].append(record)
+
+            if not groups:
+                continue
+
+            rows = sorted(
+                groups.items(),
+                key=lambda item: -sum(record.duration for record in item[1]),
+            )[:limit]
+
+            print(
+                f"\n{title:<32} {'queries':>8} {'seconds':>9} {'rows':>9} {'bytes':>11}",
+                file=stream,
+            )
+            for name, records in rows:
+                print(
+                    f"{name[:32]:<32} {len(records):>8}"
+                    f" {sum(record.duration for record in records):>9.3f}"
+                    f" {sum(record.rows for record in records):>9}"
+                    f" {sum(record.bytes for record in records):>11}",
+                    file=stream,
+                )
+
+    def write_json(self, stream: TextIO):
+        json.dump(
+            {
+                "wall_time": self.wall_time,
+                "queries": [asdict(record) for record in self.records],
+            },
+            stream,
+            indent=2,
+        )
+
+    def write_chrome_trace(self, stream: TextIO):
+        "Trace Event Format, for chrome://tracing or Perfetto. One lane per connection."
+        events = [
+            {
+                "name": record.label,
+                "cat": record.phase,
+                "ph": "X",
+                "ts": round(record.start * 1_000_000),
+                "dur": round(record.duration * 1_000_000),
+                "pid": 1,
+                "tid": record.connection,
+                "args": {
+                    "table": record.table,
+                    "rows": record.rows,
+                    "bytes": record.bytes,
+                },
+            }
+            for record in self.records
+        ]
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, stream)
+
+
+def active() -> bool:
+    return current_profiler.get() is not None
+
+
+@contextmanager
+def phase(name: str):
+    token = current_phase.set(name)
+    try:
+        yield
+    finally:
+        current_phase.reset(token)
+
+
+@contextmanager
+def table(name: str):
+    token = current_table.set(name)
+    try:
+        yield
+    finally:
+        current_table.reset(token)
+
+
+def caller_label() -> str:
+    "Name of the backend function sending the query"
+    frame = sys._getframe(2)
+    while frame:
+        if frame.f_globals.get("__name__") in BACKEND_MODULES:
+            return frame.f_code.co_name
+        frame = frame.f_back
+
+    return "query"
+
+
+def value_size(value) -> int:
+    "Approximate size of a value as returned by the driver"
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return len(str(value))
+
+
+def rows_size(rows) -> int:
+    return sum(value_size(value) for row in rows for value in row)
+
+
+@contextmanager
+def timed(record: QueryRecord | None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record:
+            record.duration += time.perf_counter() - start
+
+
+def record_connect(connection: object, started: float):
+    "Record opening a connection, which includes the TLS handshake and authentication"
+    profiler = current_profiler.get()
+    if profiler:
+        record = profiler.start_query("connect", connection)
+        record.duration = time.perf_counter() - started
+        record.start -= record.duration
+
+
+class ProfiledCursor:
+    """
+    Wraps a blocking DB-API cursor (sqlite3, mysql-connector), recording the time spent executing
+    each query and fetching its rows.
+    """
+
+    def __init__(self, cursor, connection: object):
+        self.cursor = cursor
+        self.connection = connection
+        self.record: QueryRecord | None = None
+
+    def execute(self, *args, **kwargs):
+        profiler = current_profiler.get()
+        self.record = profiler and profiler.start_query(caller_label(), self.connection)
+        with timed(self.record):
+            result = self.cursor.execute(*args, **kwargs)
+
+        # sqlite3's execute returns the cursor, keep returning the wrapper
+        return self if result is self.cursor else result
+
+    def fetchall(self):
+        with timed(self.record):
+            rows = self.cursor.fetchall()
+
+        if self.record:
+            self.record.rows += len(rows)
+            self.record.bytes += rows_size(rows)
+        return rows
+
+    def fetchone(self):
+        with timed(self.record):
+            row = self.cursor.fetchone()
+
+        if self.record and row is not None:
+            self.record.rows += 1
+            self.record.bytes += rows_size([row])
+        return row
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class ProfiledConnection:
+    "Wraps a blocking DB-API connection, so every cursor it hands out is profiled"
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self.connection.cursor(*args, **kwargs), self)
+
+    def execute(self, *args, **kwargs):
+        # sqlite3 shortcut, which the profiled cursor has to see
+        return self.cursor().execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def wrap_connection(connection):
+    "Profile a blocking connection's queries, if a profiler is active"
+    return ProfiledConnection(connection) if active() else connection
@@ -0,0 +1,352 @@
+"""
+Generates the prompt for any Dialect: introspects the requested tables, samples rows and streams the
+rendered sections to a PromptWriter, overlapping queries with rendering.
+"""
+
+import asyncio
+import io
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+
+from llm_sql_prompt import profiling
+from llm_sql_prompt.cache import SchemaCache, cached, cached_tables
+from llm_sql_prompt.compact import (
+    COMPACT_FORMAT_NOTE,
+    DEFAULT_FORMAT,
+    format_compact_table_section,
+)
+from llm_sql_prompt.concurrency import ConnectionPool, flatten, map_ordered
+from llm_sql_prompt.dialect import Dialect, get_dialect
+from llm_sql_prompt.output import PromptWriter
+from llm_sql_prompt.ranking import DEFAULT_TOP_K, rank_tables
+from llm_sql_prompt.sampling import DEFAULT_SAMPLE_STRATEGY
+from llm_sql_prompt.schema import Table, format_table_schema
+from llm_sql_prompt.snapshot import Snapshot
+from llm_sql_prompt.stats import TableStats, format_table_stats
+from llm_sql_prompt.util import system_prompt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PromptOptions:
+    table_names: list[str] = field(default_factory=list)
+    # describe every table in the database
+    all_tables: bool = False
+    include_data: bool = True
+    # add the planner's column statistics to every table
+    stats: bool = False
+    sample_strategy: str = DEFAULT_SAMPLE_STRATEGY
+    # number of connections used to describe and sample tables concurrently
+    jobs: int = 1
+    # cache introspected schemas on disk for this many seconds, until the catalog changes
+    cache_ttl: int | None = None
+    # only describe the `top_k` tables most relevant to this question
+    query: str | None = None
+    top_k: int = DEFAULT_TOP_K
+    # snapshot file of the previous run, only tables changed since are introspected and sampled
+    since: str | None = None
+    # "sql" or "compact", see compact.py
+    format: str = DEFAULT_FORMAT
+    # only show this many columns of each table, compact format only
+    max_columns: int | None = None
+
+
+def format_table_section(
+    table: Table,
+    column_names: list[str],
+    sample_rows: list[tuple],
+    stats: TableStats | None = None,
+) -> str:
+    """Render the schema, statistics and sample rows for a single table."""
+    output = [
+        f"""
+# Table Schema for `{table.name}`
+{table.comment}
+```sql""",
+        format_table_schema(table),
+        "```",  # Close table schema SQL block
+    ]
+
+    if stats_section := format_table_stats(table.name, stats):
+        output.append(stats_section)
+
+    if sample_rows:
+        output.append(
+            f"""
+{len(sample_rows)} sample rows from the `{table.name}` table:
+
+```sql"""
+        )
+        for row in sample_rows:
+            values = ", ".join(map(repr, row))
+            output.append(
+                f"INSERT INTO {table.name} ({', '.join(column_names)}) VALUES ({values});"
+            )
+        output.append("```")
+
+    return "\n".join(output)
+
+
+async def get_table_names(dialect: Dialect) -> list[str]:
+    conn = await dialect.connect()
+    try:
+        return await dialect.list_tables(conn)
+    finally:
+        await dialect.close(conn)
+
+
+async def generate_prompt(
+    dialect: Dialect, options: PromptOptions, writer: PromptWriter | None = None
+):
+    """
+    Write a prompt describing the requested tables to `writer`.
+
+    Schemas are introspected in bulk on one connection, then tables are sampled over a pool of
+    `options.jobs` connections while already finished tables are rendered and written in order.
+    """
+    async with ConnectionPool(dialect.connect, dialect.close, options.jobs) as pool:
+        await write_prompt(dialect, pool, options, writer or PromptWriter())
+
+
+async def load_tables(
+    dialect: Dialect, conn, options: PromptOptions, snapshot: Snapshot | None = None
+) -> tuple[str, list[str], dict[str, Table], dict[str, str]]:
+    """
+    Returns the database description, the names of the tables to describe, the introspected tables
+    and, with a snapshot, the fingerprint of every table. Tables are taken from the snapshot when
+    they didn't change, from the cache when enabled, and are introspected otherwise.
+    """
+    fingerprint = None
+    if options.cache_ttl:
+        with profiling.phase("fingerprint"):
+            fingerprint = await dialect.catalog_fingerprint(conn)
+
+    with (
+        SchemaCache(dialect.cache_key, fingerprint, options.cache_ttl)
+        if options.cache_ttl
+        else nullcontext()
+    ) as cache:
+        table_names = options.table_names
+        if options.all_tables or (options.query and not table_names):
+            with profiling.phase("list tables"):
+                table_names = await cached(cache, "tables", partial(dialect.list_tables, conn))
+
+        with profiling.phase("describe database"):
+            header = await cached(cache, "header", partial(dialect.describe_database, conn))
+
+        table_names = [
+            table_name for table_name in table_names if not dialect.skip_table(table_name)
+        ]
+        fingerprints = {}
+        schema = {}
+        if snapshot:
+            with profiling.phase("fingerprint"):
+                fingerprints = await dialect.table_fingerprints(conn, table_names)
+
+            schema = {
+                table_name: snapshot.table(table_name)
+                for table_name in table_names
+                if snapshot.is_current(table_name, fingerprints.get(table_name))
+            }
+            logger.info(
+                f"{len(table_names) - len(schema)} of {len(table_names)} tables changed since the snapshot"
+            )
+
+        with profiling.phase("load schema"):
+            schema.update(
+                await cached_tables(
+                    cache,
+                    [table_name for table_name in table_names if table_name not in schema],
+                    partial(dialect.load_schema, conn),
+                )
+            )
+
+    return header, table_names, schema, fingerprints
+
+
+def open_snapshot(dialect: Dialect, options: PromptOptions) -> Snapshot:
+    "The snapshot in `options.since`, kept in memory only without"
+    return Snapshot(
+        options.since,
+        dialect.cache_key,
+        {
+            "include_data": options.include_data,
+            "sample_strategy": options.sample_strategy,
+            "stats": options.stats,
+            "format": options.format,
+            "max_columns": options.max_columns,
+        },
+    )
+
+
+async def write_prompt(
+    dialect: Dialect,
+    pool: ConnectionPool,
+    options: PromptOptions,
+    writer: PromptWriter,
+    schema: dict[str, Table] | None = None,
+    snapshot: Snapshot | None = None,
+):
+    """
+    Write a prompt using connections from `pool`. A `schema` introspected up front (batch mode) is
+    used instead of querying the catalog for this prompt. A `snapshot` kept between prompts (watch
+    mode) is used instead of the one in `options.since`.
+    """
+    for table_name in options.table_names:
+        if dialect.skip_table(table_name):
+            logger.info(f"Skipping table `{table_name}` ({dialect.name} system table)")
+
+    fingerprints = {}
+    if snapshot is None and options.since:
+        snapshot = open_snapshot(dialect, options)
+
+    # the phases below replace "connect" for their queries, only opening the connection is left
+    with profiling.phase("connect"):
+        async with pool.connection() as conn:
+            if schema is None:
+                header, table_names, schema, fingerprints = await load_tables(
+                    dialect, conn, options, snapshot
+                )
+            else:
+                with profiling.phase("describe database"):
+                    header = await dialect.describe_database(conn)
+                table_names = [
+                    table_name
+                    for table_name in (
+                        options.table_names
+                        if options.table_names and not options.all_tables
+                        else schema
+                    )
+                    if not dialect.skip_table(table_name)
+                ]
+
+    if dialect.schema:
+        header += f"\n- All tables are in the `{dialect.schema}` schema"
+    if options.format == "compact":
+        header += f"\n{COMPACT_FORMAT_NOTE}"
+
+    writer.write(
+        f"""
+{system_prompt()}
+{header}
+"""
+    )
+
+    if options.query:
+        table_names = rank_tables(options.query, schema, options.top_k)
+
+    tables = [schema.get(table_name, Table(table_name)) for table_name in table_names]
+
+    def is_current(table: Table) -> bool:
+        return bool(snapshot) and snapshot.is_current(table.name, fingerprints.get(table.name))
+
+    async def describe(table: Table, sample: tuple | None = None) -> str:
+        "`sample` is the table's column names and sample rows, if they were already read"
+        fingerprint = fingerprints.get(table.name)
+        if is_current(table):
+            return snapshot.section(table.name)
+
+        column_names, sample_rows = [], []
+        stats = None
+        timed_out = False
+
+        # a table whose statistics or sample time out is still described, without data, so one
+        # slow table doesn't fail the whole run
+        try:
+            if options.include_data and sample is not None:
+                column_names, sample_rows = sample
+
+            if options.stats or (options.include_data and sample is None):
+                with profiling.table(table.name):
+                    async with pool.connection() as conn:
+                        # safe mode's budget covers all of the table's queries, not each of them,
+                        # and starts once the table has a connection
+                        async with asyncio.timeout(dialect.safe_timeout):
+                            if options.stats:
+                                with profiling.phase("stats"):
+                                    stats = await dialect.table_stats(conn, table)
+
+                            if options.include_data and sample is None:
+                                with profiling.phase("sample"):
+                                    column_names, sample_rows = await dialect.sample_rows(
+                                        conn, table, options.sample_strategy
+                                    )
+        except Exception as e:
+            if not isinstance(e, TimeoutError) and not dialect.is_timeout(e):
+                raise
+
+            logger.warning(f"Reading `{table.name}` timed out, it is described without data")
+            timed_out = True
+
+        if options.format == "compact":
+            section = format_compact_table_section(
+                table, column_names, sample_rows, options.max_columns, stats
+            )
+        else:
+            section = format_table_section(table, column_names, sample_rows, stats)
+
+        if timed_out:
+            section += f"\n\n(Reading data from `{table.name}` timed out, no sample rows are shown)"
+        elif snapshot:
+            # a table that timed out is read again on the next run
+            snapshot.update(table, fingerprint, section)
+
+        return section
+
+    async def describe_batch(batch: list[Table]) -> list[str]:
+        "Sample a batch of tables in a few round trips, then describe them"
+        to_sample = [table for table in batch if not is_current(table)]
+        samples = {}
+        if to_sample:
+            try:
+                with profiling.phase("sample"):
+                    async with pool.connection() as conn:
+                        batch_samples = await dialect.sample_rows_batch(
+                            conn, to_sample, options.sample_strategy
+                        )
+                samples = {
+                    table.name: sample for table, sample in zip(to_sample, batch_samples)
+                }
+            except Exception as e:
+                if not dialect.is_timeout(e):
+                    raise
+
+                # a timeout fails the whole batch, its tables are sampled one by one instead
+                logger.info("Sampling a batch of tables timed out, sampling them one by one")
+
+        return await asyncio.gather(
+            *(describe(table, samples.get(table.name)) for table in batch)
+        )
+
+    batch_size = dialect.sample_batch_size if options.include_data else 0
+    if batch_size:
+        batches = [
+            tables[start : start + batch_size]
+            for start in range(0, len(tables), batch_size)
+        ]
+        sections = flatten(map_ordered(describe_batch, batches, options.jobs))
+    else:
+        # keep one table ahead per connection, so connections stay busy while sections are written
+        sections = map_ordered(describe, tables, options.jobs * 2)
+
+    await writer.write_tables(table_names, sections)
+
+    if snapshot:
+        snapshot.save()
+
+
+async def render_prompt(db_url: str, **options) -> str:
+    """
+    Generate a prompt as a string, for embedding in an async application. `options` are the fields
+    of PromptOptions.
+    """
+    dialect = get_dialect(db_url)
+    if dialect is None:
+        raise ValueError(f"Unknown database type: {db_url}")
+
+    buffer = io.StringIO()
+    await generate_prompt(dialect, PromptOptions(**options), PromptWriter(buffer))
+    return buffer.getvalue()
@@ -0,0 +1,121 @@
+"""
+Pick the tables relevant to a natural language question, so only those need to be described and
+sampled. Tables are ranked locally with BM25 over their names, column names and comments.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+
+from llm_sql_prompt.schema import Table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 10
+
+# BM25 parameters, the usual defaults
+K1 = 1.2
+B = 0.75
+
+# the table name says more about what a table holds than any single column does
+TABLE_NAME_WEIGHT = 3
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "me", "of", "on", "or", "show", "that", "the", "their", "there", "this", "to", "was",
+    "were", "what", "when", "where", "which", "who", "with",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    "Lowercase words, split on snake_case and camelCase boundaries, with plurals folded"
+    # split camelCase before lowercasing
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    tokens = []
+
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+
+        tokens.append(word)
+
+    return tokens
+
+
+def table_document(table: Table) -> list[str]:
+    tokens = tokenize(table.name) * TABLE_NAME_WEIGHT
+    tokens += tokenize(table.comment)
+
+    for column in table.columns:
+        tokens += tokenize(column.name)
+        tokens += tokenize(column.comment)
+
+    return tokens
+
+
+def bm25_scores(query: str, tables: dict[str, Table]) -> dict[str, float]:
+    documents = {
+        table_name: Counter(table_document(table)) for table_name, table in tables.items()
+    }
+    if not documents:
+        return {}
+
+    average_length = sum(sum(terms.values()) for terms in documents.values()) / len(documents)
+    document_frequency = Counter(term for terms in documents.values() for term in terms)
+
+    scores = {}
+    for table_name, terms in documents.items():
+        length = sum(terms.values())
+        score = 0.0
+
+        for term in set(tokenize(query)):
+            frequency = terms.get(term, 0)
+            if not frequency:
+                continue
+
+            df = document_frequency[term]
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            score += idf * (
+                frequency
+                * (K1 + 1)
+                / (frequency + K1 * (1 - B + B * length / max(average_length, 1)))
+            )
+
+        scores[table_name] = score
+
+    return scores
+
+
+def rank_tables(
+    query: str, tables: dict[str, Table], top_k: int = DEFAULT_TOP_K
+) -> list[str]:
+    """
+    Returns the `top_k` tables most relevant to `query`, most relevant first, followed by the tables
+    they reference through foreign keys, which are usually needed to write the joins.
+    """
+    scores = bm25_scores(query, tables)
+    ranked = sorted(
+        (table_name for table_name, score in scores.items() if score > 0),
+        key=lambda table_name: -scores[table_name],
+    )[:top_k]
+
+    if not ranked:
+        logger.warning(f"No tables matched the question: {query}")
+
+    selected = list(ranked)
+    for table_name in ranked:
+        for column in tables[table_name].columns:
+            if not column.foreign_key:
+                continue
+
+            foreign_table = column.foreign_key[0]
+            if foreign_table in tables and foreign_table not in selected:
+                selected.append(foreign_table)
+
+    return selected
@@ -0,0 +1,12 @@
+"""
+`--safe`, for production databases and replicas: connections are read-only, the database cancels
+long statements and lock waits, and a table that takes longer than its time budget to read is
+described without data (see `prompt.write_prompt`).
+
+Kept free of imports, so the CLI can show its defaults without importing asyncio.
+"""
+
+# safe mode's time budget per table, in seconds
+DEFAULT_SAFE_TIMEOUT = 10
+# in safe mode, catalog and table locks are waited for this many seconds at most
+SAFE_LOCK_TIMEOUT = 1
@@ -0,0 +1,76 @@
+"""
+Shared knobs for picking sample rows without scanning and sorting an entire table.
+
+Each Dialect implements `sample_rows(conn, table, strategy)`, returning the column names and a few
+rows, with its own cheap sampling primitive (TABLESAMPLE on Postgres, primary key / rowid probes on
+MySQL and SQLite). Backends which can send many queries in one round trip also implement
+`sample_rows_batch(conn, tables, strategy)` and set `sample_batch_size`: PostgreSQL pipelines the
+sample queries of a batch of tables.
+
+Large values are cut down in the sampling query itself, so a table of multi-megabyte documents or
+blobs never sends more than a few hundred bytes per value: text-like values are truncated to
+MAX_VALUE_LENGTH characters (plus one, to tell whether anything was cut) and binary values are
+replaced by their size. `bound_row` turns what the query returned into the values rendered.
+"""
+
+import random
+
+SAMPLE_SIZE = 3
+
+# - auto: full `ORDER BY RANDOM()` for small tables, a cheap sampling method for anything larger
+# - fast: always use the cheap sampling method, regardless of table size
+# - random: always use `ORDER BY RANDOM()`, which scans and sorts the entire table
+SAMPLE_STRATEGIES = ["auto", "fast", "random"]
+DEFAULT_SAMPLE_STRATEGY = "auto"
+
+# below this many (estimated) rows a full scan + sort is cheap and gives the best spread of rows
+SMALL_TABLE_ROWS = 10_000
+
+# sampled text is cut to this many characters before it leaves the database
+MAX_VALUE_LENGTH = 200
+
+
+def use_full_scan(strategy: str, estimated_rows: float | None) -> bool:
+    "Should the table be sampled with a full `ORDER BY RANDOM()` scan?"
+    if strategy == "random":
+        return True
+
+    if strategy == "fast":
+        return False
+
+    return estimated_rows is not None and estimated_rows < SMALL_TABLE_ROWS
+
+
+def random_probes(low: int, high: int, count: int = SAMPLE_SIZE) -> list[int]:
+    "Sorted random key values in [low, high] to seek to with `WHERE key >= probe ORDER BY key LIMIT 1`"
+    return sorted(random.randint(low, high) for _ in range(count))
+
+
+class BinarySize(int):
+    "Size of a binary value, which the sampling query returns instead of its bytes"
+
+    def __repr__(self):
+        return f"<{int(self)} bytes>"
+
+    __str__ = __repr__
+
+
+def bound_value(value, binary: bool = False):
+    if value is None:
+        return None
+    if binary and isinstance(value, int):
+        return BinarySize(value)
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "..."
+
+    return value
+
+
+def bound_row(row: tuple, binary_columns: set[int]) -> tuple:
+    """
+    Mark the values of a row fetched with truncating expressions: sizes of binary columns (by
+    position) become BinarySize, and strings cut by the query end with "...".
+    """
+    return tuple(
+        bound_value(value, index in binary_columns) for index, value in enumerate(row)
+    )
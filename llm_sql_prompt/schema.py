@@ -0,0 +1,101 @@
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class Column:
+    name: str
+    data_type: str
+    max_length: int | None = None
+    comment: str = ""
+    # (foreign_table, foreign_column)
+    foreign_key: tuple[str, str] | None = None
+
+
+@dataclass
+class Table:
+    """In-memory description of a table, built by a backend and rendered into the prompt."""
+
+    name: str
+    comment: str = ""
+    columns: list[Column] = field(default_factory=list)
+    # verbatim CREATE statements, rendered instead of the column list when the backend has them
+    ddl: str = ""
+    # table, view, materialized view, foreign table or partitioned table
+    kind: str = "table"
+    # the SELECT of a view or materialized view
+    view_definition: str = ""
+    # primary key, unique, check and exclusion constraints, and foreign keys over several columns
+    # (single column foreign keys are part of the column), as SQL
+    constraints: list[str] = field(default_factory=list)
+    # CREATE INDEX statements of the indexes which don't back a constraint
+    indexes: list[str] = field(default_factory=list)
+    # partition key of a partitioned table, e.g. RANGE (created_at)
+    partition_key: str = ""
+    # partitions, or tables inheriting from it, which are described as part of this table
+    partition_count: int = 0
+    # the backend's row estimate when the table was introspected, if it reads one with the schema
+    estimated_rows: int | None = None
+
+
+def table_to_dict(table: Table) -> dict:
+    "JSON-compatible representation of a table, used to persist introspected schemas"
+    return asdict(table)
+
+
+def table_from_dict(data: dict) -> Table:
+    columns = []
+    for column in data["columns"]:
+        foreign_key = column["foreign_key"]
+        columns.append(
+            Column(**{**column, "foreign_key": tuple(foreign_key) if foreign_key else None})
+        )
+
+    return Table(**{**data, "columns": columns})
+
+
+def format_partitions(table: Table) -> str | None:
+    "How a table is partitioned, or which tables inherit from it"
+    count = table.partition_count
+    if table.partition_key:
+        return f"PARTITION BY {table.partition_key} -- {count} partition{'s' * (count != 1)}"
+    if count:
+        return f"-- inherited by {count} table{'s' * (count != 1)}"
+    return None
+
+
+def format_column(column: Column) -> str:
+    if column.max_length:
+        line = f"{column.name} {column.data_type}({column.max_length})"
+    else:
+        line = f"{column.name} {column.data_type}"
+
+    # Append FK info if exists
+    if column.foreign_key:
+        fk_table, fk_column = column.foreign_key
+        line += f" REFERENCES {fk_table}({fk_column})"
+
+    # Add column comment if it exists
+    if column.comment:
+        line += f" -- {column.comment}"
+
+    return line
+
+
+def format_table_schema(table: Table) -> str:
+    """
+    One line per column, including FK info and column comments, then constraints, indexes and the
+    definition of views.
+    """
+    if table.ddl:
+        return table.ddl
+
+    lines = list(map(format_column, table.columns))
+    lines.extend(table.constraints)
+    lines.extend(f"{index};" for index in table.indexes)
+    if partitions := format_partitions(table):
+        lines.append(partitions)
+    if table.view_definition:
+        lines.append(f"CREATE {table.kind.upper()} {table.name} AS")
+        lines.append(table.view_definition)
+
+    return "\n".join(lines)
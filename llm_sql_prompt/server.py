@@ -0,0 +1,361 @@
+"""
+`llm-sql-prompt serve`: a long-running process answering prompt requests over HTTP, on a localhost
+port or a Unix socket, so editor plugins and bots don't pay for interpreter startup, driver
+imports, connecting and introspection on every request.
+
+Each database URL (and schema) keeps a pool of open connections and an in-memory model of the
+tables introspected so far. Every request first checks, in a single cheap query, whether the tables
+it asks for changed (the whole catalog's fingerprint for requests for all tables), and only changed
+or new tables are introspected again. Sample rows are always read live.
+
+    POST /prompt  {"url": "postgresql://...", "tables": ["users"], "format": "compact"}
+    GET  /health
+
+The response is the prompt, as text/markdown.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import signal
+import time
+from dataclasses import replace
+
+from llm_sql_prompt.compact import DEFAULT_FORMAT, FORMATS
+from llm_sql_prompt.concurrency import ConnectionPool
+from llm_sql_prompt.dialect import Dialect, get_dialect
+from llm_sql_prompt.output import PromptWriter
+from llm_sql_prompt.prompt import PromptOptions, write_prompt
+from llm_sql_prompt.sampling import DEFAULT_SAMPLE_STRATEGY, SAMPLE_STRATEGIES
+from llm_sql_prompt.schema import Table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# names a client on this machine reaches a localhost port by
+LOOPBACK_HOSTS = ["localhost", "127.0.0.1", "[::1]"]
+
+# requests are a few fields, anything larger is refused before it is read
+MAX_BODY_SIZE = 64 * 1024
+# seconds a client may take to send its whole request
+READ_TIMEOUT = 10
+
+# fields of PromptOptions a request may set, the rest (jobs, caching, snapshots) is the server's
+REQUEST_OPTIONS = {
+    "include_data",
+    "stats",
+    "sample_strategy",
+    "query",
+    "top_k",
+    "format",
+    "max_columns",
+}
+
+# the JSON type of every request field, null is the same as leaving a field out
+REQUEST_FIELDS = {
+    "url": str,
+    "schema": str,
+    "tables": list,
+    "all": bool,
+    "max_tokens": int,
+    "include_data": bool,
+    "stats": bool,
+    "sample_strategy": str,
+    "query": str,
+    "top_k": int,
+    "format": str,
+    "max_columns": int,
+}
+
+JSON_TYPE_NAMES = {str: "a string", list: "a list", bool: "true or false", int: "an integer"}
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Content Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+}
+
+
+def validate_request(request: dict) -> dict:
+    "The fields of a decoded request body which are set, raises ValueError for invalid ones"
+    unknown = set(request) - set(REQUEST_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    request = {name: value for name, value in request.items() if value is not None}
+    if "url" not in request:
+        raise ValueError("`url` is required")
+
+    for name, value in request.items():
+        expected = REQUEST_FIELDS[name]
+        # JSON booleans are ints to Python
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ValueError(f"`{name}` must be {JSON_TYPE_NAMES[expected]}")
+        if expected is int and value < 1:
+            raise ValueError(f"`{name}` must be at least 1")
+
+    if not all(isinstance(table_name, str) for table_name in request.get("tables", [])):
+        raise ValueError("`tables` must be a list of strings")
+
+    return request
+
+
+class RequestError(Exception):
+    "A request refused before it was read completely"
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict, bytes]:
+    "The method, path, lower-cased headers and body of an HTTP request"
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    request_method, path, _ = request_line.split(" ", 2)
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    content_length = int(headers.get("content-length", 0))
+    if content_length > MAX_BODY_SIZE:
+        raise RequestError(413, f"The request body is larger than {MAX_BODY_SIZE} bytes\n")
+
+    body = await reader.readexactly(content_length)
+    return request_method, path.split("?")[0], headers, body
+
+
+class WarmDatabase:
+    "Open connections and the tables introspected so far, for one database and schema"
+
+    def __init__(self, dialect: Dialect, jobs: int):
+        self.dialect = dialect
+        self.pool = ConnectionPool(dialect.connect, dialect.close, jobs)
+        self.tables: dict[str, Table] = {}
+        # definition checksum of every table in `tables`, when it was introspected
+        self.fingerprints: dict[str, str | None] = {}
+        # every table of the database, listed on the first request that needs it
+        self.catalog_fingerprint: str | None = None
+        self.table_names: list[str] = []
+        # requests for the same database don't introspect the same tables twice
+        self.lock = asyncio.Lock()
+
+    async def load(self, options: PromptOptions) -> dict[str, Table]:
+        """
+        The tables a prompt for `options` describes, introspecting only those not known yet or
+        changed since. Requests for all tables check the whole catalog in one query, requests for a
+        few tables only check those.
+        """
+        async with self.lock, self.pool.connection() as conn:
+            if options.all_tables or (options.query and not options.table_names):
+                fingerprint = await self.dialect.catalog_fingerprint(conn)
+                if fingerprint != self.catalog_fingerprint:
+                    if self.catalog_fingerprint is not None:
+                        logger.info(f"The {self.dialect.name} schema changed, reloading")
+                    self.catalog_fingerprint = fingerprint
+                    self.table_names = await self.dialect.list_tables(conn)
+                    self.tables = {}
+                    self.fingerprints = {}
+                table_names = self.table_names
+            else:
+                table_names = options.table_names
+                fingerprints = await self.dialect.table_fingerprints(conn, table_names)
+                for table_name in table_names:
+                    if self.fingerprints.get(table_name) != fingerprints.get(table_name):
+                        self.tables.pop(table_name, None)
+                        self.fingerprints[table_name] = fingerprints.get(table_name)
+
+            table_names = [
+                table_name
+                for table_name in table_names
+                if not self.dialect.skip_table(table_name)
+            ]
+            missing = [table_name for table_name in table_names if table_name not in self.tables]
+            if missing:
+                self.tables.update(await self.dialect.load_schema(conn, missing))
+
+        return {
+            table_name: self.tables[table_name]
+            for table_name in table_names
+            if table_name in self.tables
+        }
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+
+class PromptServer:
+    def __init__(
+        self,
+        jobs: int = 1,
+        immutable: bool = False,
+        safe_timeout: float | None = None,
+        allowed_hosts: set[str] | None = None,
+    ):
+        self.jobs = jobs
+        self.immutable = immutable
+        self.safe_timeout = safe_timeout
+        # Host headers requests must carry, any if None
+        self.allowed_hosts = allowed_hosts
+        self.databases: dict[tuple[str, str | None], WarmDatabase] = {}
+
+    def database(self, db_url: str, schema: str | None) -> WarmDatabase:
+        key = (db_url, schema)
+        if key not in self.databases:
+            dialect = get_dialect(db_url, self.immutable, schema, self.safe_timeout)
+            if dialect is None:
+                raise ValueError(f"Unknown database type: {db_url}")
+            self.databases[key] = WarmDatabase(dialect, self.jobs)
+
+        return self.databases[key]
+
+    async def render(self, request: dict) -> str:
+        "Generate the prompt for a decoded request body"
+        request = validate_request(request)
+
+        table_names = request.get("tables", [])
+        all_tables = request.get("all", False)
+        if not table_names and not all_tables and not request.get("query"):
+            raise ValueError("One of `tables`, `all` or `query` is required")
+
+        if request.get("format", DEFAULT_FORMAT) not in FORMATS:
+            raise ValueError(f"`format` must be one of {', '.join(FORMATS)}")
+        if request.get("sample_strategy", DEFAULT_SAMPLE_STRATEGY) not in SAMPLE_STRATEGIES:
+            raise ValueError(f"`sample_strategy` must be one of {', '.join(SAMPLE_STRATEGIES)}")
+
+        database = self.database(request["url"], request.get("schema"))
+        options = replace(
+            PromptOptions(**{name: request[name] for name in REQUEST_OPTIONS & set(request)}),
+            table_names=table_names,
+            all_tables=all_tables,
+            jobs=self.jobs,
+        )
+
+        schema = await database.load(options)
+        buffer = io.StringIO()
+        await write_prompt(
+            database.dialect,
+            database.pool,
+            options,
+            PromptWriter(buffer, request.get("max_tokens")),
+            schema,
+        )
+        return buffer.getvalue()
+
+    async def handle(self, request_method: str, path: str, headers: dict, body: bytes):
+        "Returns the status and response body of an HTTP request"
+        # a web page whose domain was rebound to 127.0.0.1 still sends its own domain as the host,
+        # checking it keeps pages from reading prompts
+        if self.allowed_hosts is not None and headers.get("host") not in self.allowed_hosts:
+            return 403, "Unknown host\n"
+        if path == "/health":
+            return 200, "ok\n"
+        if path != "/prompt":
+            return 404, "Not found\n"
+        if request_method != "POST":
+            return 405, "Use POST\n"
+        # browsers can't send JSON cross-origin without a preflight this server never answers
+        if headers.get("content-type", "").split(";")[0].strip() != "application/json":
+            return 415, "Content-Type must be application/json\n"
+
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("The request body must be a JSON object")
+            return 200, await self.render(request)
+        except (ValueError, TypeError) as e:
+            return 400, f"{e}\n"
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        "One HTTP/1.1 request per connection"
+        started = time.perf_counter()
+        status, response, request_line = 400, "Bad request\n", ""
+        try:
+            # a client sending its request slowly, or not at all, would hold the connection forever
+            async with asyncio.timeout(READ_TIMEOUT):
+                request_method, path, headers, body = await read_request(reader)
+
+            request_line = f"{request_method} {path}"
+            status, response = await self.handle(request_method, path, headers, body)
+        except RequestError as e:
+            status, response = e.status, e.message
+        except TimeoutError:
+            status, response = 408, "The request was not sent in time\n"
+        except (ValueError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception(f"Failed to answer `{request_line}`")
+            status, response = 500, "Failed to generate the prompt, see the server log\n"
+
+        content = response.encode()
+        content_type = "text/markdown" if status == 200 else "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            "Connection: close\r\n\r\n".encode()
+            + content
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+        logger.info(f"{request_line} {status} {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    async def aclose(self):
+        for database in self.databases.values():
+            await database.aclose()
+
+
+async def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: str | None = None,
+    jobs: int = 1,
+    immutable: bool = False,
+    safe_timeout: float | None = None,
+):
+    "Answer prompt requests until cancelled (Ctrl-C)"
+    prompt_server = PromptServer(jobs, immutable, safe_timeout)
+
+    # browsers can't connect to Unix sockets, only requests to the port are checked for their host
+    if socket_path:
+        # only the user running the server may connect, the socket is created with mode 0600 rather
+        # than restricted after other users could already have connected
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(prompt_server.handle_connection, socket_path)
+        finally:
+            os.umask(umask)
+        logger.info(f"Serving prompts on {socket_path}")
+    else:
+        server = await asyncio.start_server(prompt_server.handle_connection, host, port)
+        port = server.sockets[0].getsockname()[1]
+        bound_host = f"[{host}]" if ":" in host else host
+        prompt_server.allowed_hosts = {
+            f"{name}:{port}" for name in [*LOOPBACK_HOSTS, bound_host]
+        }
+        logger.info(f"Serving prompts on http://{host}:{port}")
+
+    # Ctrl-C cancels this task, so does SIGTERM, the socket is removed either way
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await prompt_server.aclose()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,77 @@
+"""
+Snapshots of generated prompts, for `--since`.
+
+A snapshot stores every table's rendered section with a fingerprint of its definition (columns,
+types, foreign keys, comments). On the next run only tables whose fingerprint changed, and new
+tables, are introspected and sampled again, every other section is copied from the snapshot.
+
+Watch mode keeps a snapshot in memory between the prompts it generates, unless given a file.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from llm_sql_prompt.schema import Table, table_from_dict, table_to_dict
+
+# bump whenever the shape of snapshots or the rendering of sections changes
+SNAPSHOT_VERSION = 4
+
+
+class Snapshot:
+    def __init__(self, path: str | Path | None, db_key: str, settings: dict):
+        """
+        `settings` are the options that change how sections are rendered (sampling, strategy). A
+        snapshot taken of another database or with other settings is ignored. Without a `path`,
+        the snapshot is only kept in memory.
+        """
+        self.path = Path(path) if path else None
+        # the URL usually contains credentials, so only a hash of it is stored
+        self.database_key = hashlib.sha256(db_key.encode()).hexdigest()
+        self.settings = settings
+        self.tables: dict[str, dict] = {}
+
+        if self.path and self.path.exists():
+            data = json.loads(self.path.read_text())
+            if (
+                data.get("version") == SNAPSHOT_VERSION
+                and data.get("database_key") == self.database_key
+                and data.get("settings") == settings
+            ):
+                self.tables = data["tables"]
+
+    def is_current(self, table_name: str, fingerprint: str | None) -> bool:
+        entry = self.tables.get(table_name)
+        return bool(fingerprint) and entry is not None and entry["fingerprint"] == fingerprint
+
+    def table(self, table_name: str) -> Table:
+        return table_from_dict(self.tables[table_name]["table"])
+
+    def section(self, table_name: str) -> str:
+        return self.tables[table_name]["section"]
+
+    def update(self, table: Table, fingerprint: str | None, section: str):
+        if fingerprint:
+            self.tables[table.name] = {
+                "fingerprint": fingerprint,
+                "table": table_to_dict(table),
+                "section": section,
+            }
+
+    def save(self):
+        if not self.path:
+            return
+
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "database_key": self.database_key,
+            "settings": self.settings,
+            "tables": self.tables,
+        }
+
+        # write to a temporary file first, so an interrupted run never leaves half a snapshot
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + ".partial")
+        partial.write_text(json.dumps(data))
+        os.replace(partial, self.path)
@@ -1,106 +1,418 @@
+import asyncio
+import hashlib
 import sqlite3
-import subprocess
+import time
+from pathlib import Path
 
-from llm_sql_prompt.util import system_prompt
+from llm_sql_prompt import profiling
+from llm_sql_prompt.dialect import Dialect
+from llm_sql_prompt.sampling import (
+    DEFAULT_SAMPLE_STRATEGY,
+    MAX_VALUE_LENGTH,
+    SAMPLE_SIZE,
+    BinarySize,
+    bound_row,
+    random_probes,
+    use_full_scan,
+)
+from llm_sql_prompt.schema import Column, Table
+from llm_sql_prompt.stats import ColumnStats, TableStats
 
 
-def describe_table_schema(db_filename, table_name):
-    """Outputs the table schema using the sqlite3 CLI tool."""
+def database_path(db_url: str) -> str:
+    """
+    The file of a `sqlite:///` URL, with SQLAlchemy's convention of three slashes before a relative
+    path and four before an absolute one. Plain paths are returned as they are.
+    """
+    scheme, separator, rest = db_url.partition("://")
+    if separator and scheme.split("+")[0].lower() == "sqlite":
+        return rest.removeprefix("/")
 
-    # TODO should use which to detect if this exists
+    return db_url
 
-    # Execute the sqlite3 CLI command
-    result = subprocess.run(
-        ["sqlite3", db_filename, f".schema {table_name}"],
-        capture_output=True,
-        text=True,
-    )
 
-    # Print the output
-    print(result.stdout)
+def connect_read_only(db_filename, immutable: bool = False):
+    """
+    Open the database in-process and read-only. An immutable database skips all locking and change
+    detection, which is only safe when nothing else is writing to the file.
+
+    The connection may be used from the worker threads of SQLiteDialect, one at a time.
+    """
+    uri = Path(db_filename).resolve().as_uri() + "?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def set_statement_timeout(conn, timeout: float):
+    """
+    Interrupt statements running for longer than `timeout` seconds, which SQLite has no setting for.
+    The clock starts when a statement starts running, and is checked every few thousand virtual
+    machine instructions.
+    """
+    started = time.monotonic()
+
+    def start(_statement):
+        nonlocal started
+        started = time.monotonic()
 
+    conn.set_trace_callback(start)
+    conn.set_progress_handler(lambda: time.monotonic() - started > timeout, 10_000)
 
-def list_sqllite_tables(db_filename):
-    """Outputs the table schema using the sqlite3 CLI tool."""
 
-    result = subprocess.run(
-        ["sqlite3", db_filename, ".tables"],
-        capture_output=True,
-        text=True,
+def list_tables(conn) -> list[str]:
+    cursor = conn.execute(
+        """
+        SELECT name
+        FROM sqlite_master
+        WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+        """
     )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_catalog_fingerprint(conn) -> str:
+    """SQLite bumps the schema version on every schema change."""
+    return str(conn.execute("PRAGMA schema_version").fetchone()[0])
+
+
+def file_state(paths: list[Path]) -> list[tuple[int, int] | None]:
+    "Modification time and size of each file, None for missing ones"
+    state = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            state.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            state.append(None)
+    return state
+
+
+def get_table_fingerprints(conn, table_names: list[str]) -> dict[str, str]:
+    """A hash of each table's CREATE statements, including its indexes and triggers."""
+    requested = set(table_names)
+    statements: dict[str, list[str]] = {}
+
+    rows = conn.execute(
+        "SELECT tbl_name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY rowid"
+    ).fetchall()
+    for table_name, object_sql in rows:
+        if table_name in requested:
+            statements.setdefault(table_name, []).append(object_sql)
+
+    return {
+        table_name: hashlib.md5("\n".join(table_statements).encode()).hexdigest()
+        for table_name, table_statements in statements.items()
+    }
+
 
-    # Split the output on whitespace and join with newlines
-    formatted_output = "\n".join(result.stdout.split())
+def load_schema(conn, table_names: list[str]) -> dict[str, Table]:
+    """
+    Read the CREATE statements (including indexes and triggers, like the CLI's `.schema`), columns
+    and foreign keys of every requested table straight from the schema table.
+    """
+    requested = set(table_names)
+    tables: dict[str, Table] = {}
+    views: set[str] = set()
+    statements: dict[str, list[str]] = {}
+
+    rows = conn.execute(
+        """
+        SELECT tbl_name, type, name, sql
+        FROM sqlite_master
+        WHERE sql IS NOT NULL
+        ORDER BY CASE type WHEN 'index' THEN 1 WHEN 'trigger' THEN 2 ELSE 0 END, rowid
+        """
+    ).fetchall()
+    for table_name, object_type, name, object_sql in rows:
+        if table_name not in requested:
+            continue
+
+        if object_type in ("table", "view"):
+            tables[name] = Table(name)
 
-    return formatted_output
+        if object_type == "view":
+            views.add(name)
 
+        statements.setdefault(table_name, []).append(object_sql)
+
+    # hidden columns of virtual tables are not returned by `SELECT *`
+    rows = conn.execute(
+        """
+        SELECT m.name, c.name, c.type
+        FROM sqlite_master m
+        JOIN pragma_table_xinfo(m.name) c
+        WHERE m.type IN ('table', 'view') AND c.hidden != 1
+        ORDER BY m.name, c.cid
+        """
+    ).fetchall()
+    for table_name, col_name, data_type in rows:
+        if table_name in tables:
+            tables[table_name].columns.append(Column(col_name, data_type))
+
+    rows = conn.execute(
+        """
+        SELECT m.name, fk."from", fk."table", fk."to"
+        FROM sqlite_master m
+        JOIN pragma_foreign_key_list(m.name) fk
+        WHERE m.type = 'table'
+        """
+    ).fetchall()
+    foreign_keys = {
+        (table_name, col_name): (foreign_table, foreign_column or "")
+        for table_name, col_name, foreign_table, foreign_column in rows
+    }
 
-def describe_database_and_table(db_url: str, table_names: list[str], all_tables: bool, include_data: bool = True):
-    """Main function to describe database tables."""
-    
-    if not table_names and not all_tables:
-        print(
-            f"""No table name provided. Please provide a table name from the list below:
+    for table in tables.values():
+        for column in table.columns:
+            column.foreign_key = foreign_keys.get((table.name, column.name))
 
-{list_sqllite_tables(db_url)}
+        ddl = [f"{statement};" for statement in statements[table.name]]
+        if table.name in views:
+            # views don't spell out their columns, the CLI adds the same hint
+            col_names = ",".join(column.name for column in table.columns)
+            ddl[0] = f"{ddl[0][:-1]}\n/* {table.name}({col_names}) */;"
+        table.ddl = "\n".join(ddl)
+
+    return tables
+
+
+def get_table_stats(conn, table_name, column_names) -> TableStats | None:
+    """
+    Row counts and the number of distinct values of indexed columns, from the sqlite_stat1 table
+    written by ANALYZE. None if the database was never analyzed.
+    """
+    try:
+        rows = conn.execute(
             """
+            SELECT s.stat, i.name
+            FROM sqlite_stat1 s
+            LEFT JOIN pragma_index_info(s.idx) i ON i.seqno = 0
+            WHERE s.tbl = ?
+            """,
+            (table_name,),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # sqlite_stat1 only exists after the first ANALYZE
+        return None
+
+    if not rows:
+        return None
+
+    stats = TableStats()
+    distinct: dict[str, float] = {}
+    for stat, col_name in rows:
+        # "rows rows-per-value-of-the-first-column ...", then optional keywords like "unordered"
+        numbers = [int(value) for value in stat.split() if value.isdigit()]
+        if not numbers:
+            continue
+
+        stats.estimated_rows = max(stats.estimated_rows or 0, numbers[0])
+        if col_name is not None and len(numbers) > 1:
+            distinct[col_name] = max(distinct.get(col_name, 0), numbers[0] / numbers[1])
+
+    for col_name in column_names:
+        if col_name in distinct:
+            stats.columns.append(
+                ColumnStats(
+                    col_name,
+                    distinct=distinct[col_name],
+                    unique=distinct[col_name] == stats.estimated_rows,
+                )
+            )
+
+    return stats
+
+
+def quote_identifier(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def column_names(cursor) -> list[str]:
+    return [column[0] for column in cursor.description]
+
+
+def sample_select_list(columns: list[Column]) -> str:
+    """
+    Expressions selecting each column of a sampled row, truncating text and replacing blobs by their
+    size. Any column can hold a blob, so the type is checked per value: sizes come back as blobs,
+    see `bound_sqlite_row`.
+    """
+    expressions = []
+    for column in columns:
+        name = quote_identifier(column.name)
+        expressions.append(
+            f"CASE typeof({name})"
+            f" WHEN 'blob' THEN CAST(length({name}) AS BLOB)"
+            f" WHEN 'text' THEN substr({name}, 1, {MAX_VALUE_LENGTH + 1})"
+            f" ELSE {name} END AS {name}"
         )
-        exit(1)
 
-    if all_tables:
-        table_names = list_sqllite_tables(db_url).split()
+    return ", ".join(expressions)
 
-    print(
-        f"""
-{system_prompt()}
-- You are working with a SQLite 3 database
-- SQLite does not support the CREATE OR REPLACE syntax
-- Quote reserved words like 'to'
 
-        """
+def bound_sqlite_row(row: tuple) -> tuple:
+    # the only blobs returned by `sample_select_list` are sizes
+    return bound_row(
+        tuple(BinarySize(value) if isinstance(value, bytes) else value for value in row),
+        set(),
     )
 
-    for table_name in table_names:
-        print(
-            """
-# Table Schema for `{table_name}`
-```sql
-"""
+
+def get_sample_rows(conn, table_name, strategy=DEFAULT_SAMPLE_STRATEGY, columns=None):
+    """
+    Retrieve the column names and a few random rows. Large tables are sampled by seeking to random
+    rowids, which is an index lookup, rather than sorting the entire table with ORDER BY RANDOM().
+
+    With `columns`, large values are truncated in the query, see `sample_select_list`.
+    """
+    if not columns:
+        return select_sample_rows(conn, table_name, strategy, "*")
+
+    column_names, sample_rows = select_sample_rows(
+        conn, table_name, strategy, sample_select_list(columns)
+    )
+    return column_names, list(map(bound_sqlite_row, sample_rows))
+
+
+def select_sample_rows(conn, table_name, strategy, select_list):
+    cursor = conn.cursor()
+    table_name = quote_identifier(table_name)
+
+    if strategy == "random":
+        # the expressions only run on the rows that were picked
+        cursor.execute(
+            f"SELECT {select_list} FROM"
+            f" (SELECT * FROM {table_name} ORDER BY RANDOM() LIMIT {SAMPLE_SIZE})"
         )
+        return column_names(cursor), cursor.fetchall()
 
-        describe_table_schema(db_url, table_name)
+    try:
+        # both are answered from the end of the rowid b-tree, without a scan
+        cursor.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table_name}")
+        low, high = cursor.fetchone()
+    except sqlite3.OperationalError as e:
+        # views and WITHOUT ROWID tables have no rowid
+        if "no such column: rowid" not in str(e):
+            raise
+        low, high = None, None
 
-        conn = sqlite3.connect(db_url)
-        cursor = conn.cursor()
+    if low is None:
+        cursor.execute(f"SELECT {select_list} FROM {table_name} LIMIT {SAMPLE_SIZE}")
+        return column_names(cursor), cursor.fetchall()
 
-        # Get table info
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
+    # rowids are usually dense, so the range is a good enough row estimate
+    if use_full_scan(strategy, high - low + 1):
+        cursor.execute(
+            f"SELECT {select_list} FROM"
+            f" (SELECT * FROM {table_name} ORDER BY RANDOM() LIMIT {SAMPLE_SIZE})"
+        )
+        return column_names(cursor), cursor.fetchall()
 
-        if include_data:
-            # Sample 3 rows
-            cursor.execute(f"SELECT * FROM {table_name} ORDER BY RANDOM() LIMIT 3")
-            sample_rows = cursor.fetchall()
+    sample_rows = []
+    for probe in random_probes(low, high):
+        cursor.execute(
+            f"SELECT {select_list} FROM {table_name} WHERE rowid >= ? ORDER BY rowid LIMIT 1",
+            (probe,),
+        )
+        for row in cursor.fetchall():
+            if row not in sample_rows:
+                sample_rows.append(row)
 
-            print(
-                f"""
-    ```
+    return column_names(cursor), sample_rows
 
-## Sample rows from `{table_name}`:
 
-```sql
+class SQLiteDialect(Dialect):
+    """
+    sqlite3 is blocking, so every call runs in a worker thread. With `immutable`, the file is opened
+    without any locking, see `connect_read_only`.
     """
-            )
 
-            col_names = [col[1] for col in columns]
-            for row in sample_rows:
-                values = ", ".join(
-                    map(repr, row)
-                )  # Using repr() to handle data types like strings
-                print(
-                    f"INSERT INTO {table_name} ({', '.join(col_names)}) VALUES ({values});"
-                )
+    name = "SQLite 3"
+
+    def __init__(self, db_url: str, immutable: bool = False, safe_timeout: float | None = None):
+        super().__init__(database_path(db_url), safe_timeout=safe_timeout)
+        self.immutable = immutable
+
+    @property
+    def cache_key(self) -> str:
+        """
+        The database file itself: paths are often relative, and schema versions of different files
+        often coincide, so neither tells two databases apart.
+        """
+        path = Path(self.db_url).resolve()
+        stat = path.stat()
+        return f"{path}:{stat.st_dev}:{stat.st_ino}"
+
+    async def connect(self):
+        conn = await asyncio.to_thread(connect_read_only, self.db_url, self.immutable)
+        if self.safe_timeout:
+            # the file is already opened read-only, this also refuses writes through ATTACH
+            await asyncio.to_thread(conn.execute, "PRAGMA query_only = ON")
+            set_statement_timeout(conn, self.safe_timeout)
+        return profiling.wrap_connection(conn)
+
+    async def close(self, conn):
+        await asyncio.to_thread(conn.close)
+
+    async def catalog_fingerprint(self, conn) -> str:
+        return await asyncio.to_thread(get_catalog_fingerprint, conn)
+
+    async def schema_changes(self, interval: float):
+        """
+        Polls the modification time of the database file and its write-ahead log, which costs no
+        I/O, and only reads the schema version once one of them changed.
+        """
+        # an immutable connection would never see the changes
+        conn = await asyncio.to_thread(connect_read_only, self.db_url)
+        try:
+            paths = [Path(self.db_url), Path(f"{self.db_url}-wal")]
+            state = file_state(paths)
+            version = await asyncio.to_thread(get_catalog_fingerprint, conn)
+            yield
+            while True:
+                await asyncio.sleep(interval)
+                current_state = file_state(paths)
+                if current_state == state:
+                    continue
+
+                state = current_state
+                current_version = await asyncio.to_thread(get_catalog_fingerprint, conn)
+                if current_version != version:
+                    version = current_version
+                    yield
+        finally:
+            await asyncio.to_thread(conn.close)
 
-            print("```")
+    async def list_tables(self, conn) -> list[str]:
+        return await asyncio.to_thread(list_tables, conn)
+
+    async def table_fingerprints(self, conn, table_names: list[str]) -> dict[str, str]:
+        return await asyncio.to_thread(get_table_fingerprints, conn, table_names)
+
+    async def describe_database(self, conn) -> str:
+        return """- You are working with a SQLite 3 database
+- SQLite does not support the CREATE OR REPLACE syntax
+- Quote reserved words like 'to'"""
 
-        conn.close()
+    async def load_schema(self, conn, table_names: list[str]) -> dict[str, Table]:
+        return await asyncio.to_thread(load_schema, conn, table_names)
+
+    def is_timeout(self, error: Exception) -> bool:
+        return isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted"
+
+    def interrupt(self, conn):
+        conn.interrupt()
+
+    async def table_stats(self, conn, table: Table) -> TableStats | None:
+        column_names = [column.name for column in table.columns]
+        return await self.run_in_thread(get_table_stats, conn, table.name, column_names)
+
+    async def sample_rows(
+        self, conn, table: Table, strategy: str = DEFAULT_SAMPLE_STRATEGY
+    ) -> tuple[list[str], list[tuple]]:
+        return await self.run_in_thread(
+            get_sample_rows, conn, table.name, strategy, table.columns
+        )
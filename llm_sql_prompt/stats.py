@@ -0,0 +1,88 @@
+"""
+Per-column statistics for `--stats`, read from the statistics the query planner already keeps
+(pg_stats, InnoDB statistics and histograms, sqlite_stat1), so no table is scanned.
+
+Each backend fills a TableStats, which is rendered as a few compact lines after the table schema.
+Statistics are estimates, and only exist for tables that were analyzed.
+"""
+
+import json
+from dataclasses import dataclass, field
+
+from llm_sql_prompt.sampling import MAX_VALUE_LENGTH
+
+# most common values listed per column
+COMMON_VALUES = 5
+
+
+@dataclass
+class ColumnStats:
+    name: str
+    # fraction of rows where the column is NULL
+    null_fraction: float | None = None
+    # estimated number of distinct values
+    distinct: float | None = None
+    unique: bool = False
+    # most common values with the fraction of rows having them, most common first
+    common_values: list[tuple[object, float]] = field(default_factory=list)
+    # lowest and highest value of the planner's histogram
+    value_range: tuple[object, object] | None = None
+
+
+@dataclass
+class TableStats:
+    estimated_rows: float | None = None
+    columns: list[ColumnStats] = field(default_factory=list)
+
+
+def format_stat_value(value) -> str:
+    if isinstance(value, str):
+        text = value if len(value) <= MAX_VALUE_LENGTH else value[:MAX_VALUE_LENGTH] + "..."
+        return repr(text)
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    return json.dumps(value, default=str)
+
+
+def format_column_stats(column: ColumnStats) -> str | None:
+    facts = []
+    if column.unique:
+        facts.append("unique")
+    elif column.distinct is not None:
+        facts.append(f"~{round(column.distinct):,} distinct")
+    if column.null_fraction:
+        facts.append(f"{column.null_fraction:.0%} null")
+    if column.common_values:
+        common = ", ".join(
+            f"{format_stat_value(value)} ({fraction:.0%})"
+            for value, fraction in column.common_values[:COMMON_VALUES]
+        )
+        facts.append(f"most common: {common}")
+    if column.value_range:
+        low, high = column.value_range
+        facts.append(f"from {format_stat_value(low)} to {format_stat_value(high)}")
+
+    if not facts:
+        return None
+
+    return f"- {column.name}: {'; '.join(facts)}"
+
+
+def format_table_stats(table_name: str, stats: TableStats | None) -> str:
+    "Empty if the planner has no statistics for the table"
+    if stats is None:
+        return ""
+
+    lines = list(filter(None, map(format_column_stats, stats.columns)))
+    if not lines and stats.estimated_rows is None:
+        return ""
+
+    rows = (
+        f", ~{round(stats.estimated_rows):,} rows"
+        if stats.estimated_rows is not None
+        else ""
+    )
+    return "\n".join(
+        [f"\nPlanner statistics for `{table_name}` (estimates{rows}):", *lines]
+    )
@@ -0,0 +1,78 @@
+"""
+`--watch`: keeps a prompt file up to date as the schema changes.
+
+How changes are noticed depends on the backend (see `Dialect.schema_changes`): PostgreSQL is
+notified by an event trigger, SQLite files and schema dumps are only read again once their
+modification time changed, MySQL polls INFORMATION_SCHEMA.TABLES. On every change, a snapshot kept
+in memory (or the `--since` file) tells which tables changed: only those are introspected and
+sampled again. The file is replaced atomically, and only when the prompt changed.
+"""
+
+import io
+import logging
+import os
+from contextlib import aclosing
+from pathlib import Path
+
+from llm_sql_prompt.concurrency import ConnectionPool
+from llm_sql_prompt.dialect import Dialect
+from llm_sql_prompt.output import PromptWriter
+from llm_sql_prompt.prompt import PromptOptions, open_snapshot, write_prompt
+
+logger = logging.getLogger(__name__)
+
+# seconds between two checks of the catalog, on backends which can't be notified of changes
+DEFAULT_WATCH_INTERVAL = 5
+
+
+def replace_file(path: Path, text: str) -> bool:
+    "Atomically replace the contents of `path`, returns False if they are the same already"
+    if path.exists() and path.read_text() == text:
+        return False
+
+    # readers of the file never see half a prompt
+    partial = path.with_name(path.name + ".partial")
+    partial.write_text(text)
+    os.replace(partial, path)
+    return True
+
+
+async def watch_prompt(
+    dialect: Dialect,
+    options: PromptOptions,
+    path: str | Path,
+    max_tokens: int | None = None,
+    interval: float = DEFAULT_WATCH_INTERVAL,
+):
+    """
+    Write the prompt to `path`, then rewrite it whenever the schema changes, until cancelled. A
+    prompt failing after the first one is logged, and generated again on the next change.
+    """
+    path = Path(path)
+    snapshot = open_snapshot(dialect, options)
+
+    generated = 0
+    async with aclosing(dialect.schema_changes(interval)) as changes:
+        async for _ in changes:
+            buffer = io.StringIO()
+            try:
+                # connections are only opened for the prompt, changes are rare
+                async with ConnectionPool(dialect.connect, dialect.close, options.jobs) as pool:
+                    await write_prompt(
+                        dialect,
+                        pool,
+                        options,
+                        PromptWriter(buffer, max_tokens),
+                        snapshot=snapshot,
+                    )
+            except Exception:
+                if not generated:
+                    raise
+                logger.exception(f"Failed to regenerate {path}, retrying on the next change")
+                continue
+
+            generated += 1
+            if replace_file(path, buffer.getvalue()):
+                logger.info(f"Wrote {path}")
+            else:
+                logger.info(f"{path} is up to date")
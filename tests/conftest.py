@@ -0,0 +1,27 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    "Schema caches are written to a temporary directory, never to the user's"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def create_database(tmp_path):
+    "Creates SQLite databases with the given schema and rows under the test's temporary directory"
+
+    def create(name, *statements) -> str:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(path)) as conn, conn:
+            for statement in statements:
+                conn.execute(statement)
+
+        return str(path)
+
+    return create
@@ -0,0 +1,63 @@
+import sqlite3
+from contextlib import closing
+
+from click.testing import CliRunner
+
+from llm_sql_prompt import main
+from llm_sql_prompt.cache import SchemaCache
+
+
+def render(db_url: str) -> str:
+    result = CliRunner().invoke(main, [db_url, "--all", "--cache", "--cache-ttl", "60"])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_cached_schema_is_reused(create_database):
+    db = create_database("app.db", "CREATE TABLE users (id INTEGER PRIMARY KEY)")
+
+    assert render(db) == render(db)
+
+
+def test_schema_change_invalidates_cache(create_database):
+    db = create_database("app.db", "CREATE TABLE users (id INTEGER PRIMARY KEY)")
+    assert "email" not in render(db)
+
+    with closing(sqlite3.connect(db)) as conn, conn:
+        conn.execute("ALTER TABLE users ADD COLUMN email TEXT")
+
+    assert "email" in render(db)
+
+
+def test_databases_with_the_same_relative_path_are_cached_apart(
+    create_database, tmp_path, monkeypatch
+):
+    # both files are at schema version 1
+    create_database("a/app.db", "CREATE TABLE alpha (id INTEGER)")
+    create_database("b/app.db", "CREATE TABLE beta (id INTEGER)")
+
+    monkeypatch.chdir(tmp_path / "a")
+    assert "alpha" in render("app.db")
+
+    monkeypatch.chdir(tmp_path / "b")
+    prompt = render("app.db")
+    assert "beta" in prompt
+    assert "alpha" not in prompt
+
+
+def test_access_times_are_written_on_close(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    with SchemaCache("app.db", "1", path=path) as cache:
+        cache.set("tables", ["users"])
+
+    with closing(sqlite3.connect(path)) as conn:
+        (created_at,) = conn.execute("SELECT accessed_at FROM cache_entries").fetchone()
+
+    with SchemaCache("app.db", "1", path=path) as cache:
+        assert cache.get("tables") == ["users"]
+        assert cache.accessed == {"tables"}
+
+    with closing(sqlite3.connect(path)) as conn:
+        (accessed_at,) = conn.execute("SELECT accessed_at FROM cache_entries").fetchone()
+
+    assert accessed_at > created_at
@@ -0,0 +1,51 @@
+import asyncio
+
+from llm_sql_prompt.compact import format_compact_table_section
+from llm_sql_prompt.prompt import render_prompt
+from llm_sql_prompt.schema import Column, Table
+
+
+def test_columns_are_grouped_by_type():
+    table = Table(
+        "orders",
+        columns=[
+            Column("id", "integer"),
+            Column("user_id", "integer", foreign_key=("users", "id")),
+            Column("created_at", "timestamp with time zone", comment="UTC"),
+        ],
+        constraints=["PRIMARY KEY (id)"],
+    )
+
+    section = format_compact_table_section(table, ["id", "user_id"], [(1, None)])
+
+    assert "int: id, user_id→users.id" in section
+    assert "timestamptz: created_at (UTC)" in section
+    assert "PRIMARY KEY (id)" in section
+    assert "| 1 | NULL |" in section
+
+
+def test_max_columns_caps_the_column_list():
+    table = Table("wide", columns=[Column(f"c{i}", "integer") for i in range(10)])
+
+    section = format_compact_table_section(table, [], [], max_columns=3)
+
+    assert "int: c0, c1, c2\n" in section
+    assert "(+7 more columns not shown)" in section
+
+
+def test_max_columns_caps_sqlite_sample_rows(create_database):
+    names = [f"c{i}" for i in range(50)]
+    db = create_database(
+        "app.db",
+        f"CREATE TABLE wide ({', '.join(names)})",
+        f"INSERT INTO wide VALUES ({', '.join(['1'] * len(names))})",
+    )
+
+    prompt = asyncio.run(
+        render_prompt(db, table_names=["wide"], format="compact", max_columns=5)
+    )
+
+    # the CREATE statement is kept whole
+    assert f"CREATE TABLE wide ({', '.join(names)})" in prompt
+    assert "| c0 | c1 | c2 | c3 | c4 |\n" in prompt
+    assert "(Sample rows only show the first 5 columns)" in prompt
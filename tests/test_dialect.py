@@ -0,0 +1,26 @@
+import pytest
+from click.testing import CliRunner
+
+from llm_sql_prompt import main
+
+
+@pytest.mark.parametrize("prefix", ["sqlite:///", "sqlite+pysqlite:///"])
+def test_sqlite_urls_name_the_file(create_database, tmp_path, monkeypatch, prefix):
+    db = create_database("app.db", "CREATE TABLE users (id INTEGER PRIMARY KEY)")
+
+    # three slashes before a relative path, four before an absolute one
+    monkeypatch.chdir(tmp_path)
+    for url in [f"{prefix}app.db", f"{prefix}{db}"]:
+        result = CliRunner().invoke(main, [url, "--all"])
+        assert result.exit_code == 0, result.output
+        assert "CREATE TABLE users" in result.output
+
+
+def test_schema_of_a_sqlite_database_is_an_error(create_database):
+    db = create_database("app.db", "CREATE TABLE users (id INTEGER PRIMARY KEY)")
+
+    result = CliRunner().invoke(main, [db, "--all", "--schema", "public"])
+
+    assert result.exit_code == 1
+    assert isinstance(result.exception, SystemExit)
+    assert "Error: SQLite databases have no schemas to pick from" in result.output
@@ -0,0 +1,219 @@
+import asyncio
+import gzip
+import sqlite3
+from contextlib import closing
+
+from llm_sql_prompt.dump import parse_dump, read_statements
+from llm_sql_prompt.prompt import render_prompt
+
+PG_DUMP = """--
+-- PostgreSQL database dump
+--
+
+-- Dumped from database version 16.2
+
+SET statement_timeout = 0;
+SELECT pg_catalog.set_config('search_path', '', false);
+
+CREATE FUNCTION public.touch() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$ BEGIN NEW.updated_at := now(); RETURN NEW; END; $$;
+
+CREATE TABLE public.users (
+    id bigint NOT NULL,
+    email character varying(255) DEFAULT 'a;b'::character varying,
+    CONSTRAINT users_email_check CHECK ((email <> ''::text))
+);
+
+COMMENT ON TABLE public.users IS 'People who can log in';
+COMMENT ON COLUMN public.users.email IS 'Lower-cased';
+
+CREATE TABLE public.orders (
+    id bigint NOT NULL,
+    user_id bigint,
+    placed_on date NOT NULL
+)
+PARTITION BY RANGE (placed_on);
+
+CREATE TABLE public.orders_2024 (
+    id bigint NOT NULL,
+    user_id bigint,
+    placed_on date NOT NULL
+);
+
+ALTER TABLE ONLY public.orders ATTACH PARTITION public.orders_2024 FOR VALUES FROM ('2024-01-01') TO ('2025-01-01');
+
+CREATE VIEW public.active_users AS
+ SELECT users.id
+   FROM public.users;
+
+COPY public.users (id, email) FROM stdin;
+1	a@example.com
+2	CREATE TABLE not_a_table (id int);
+\\.
+
+ALTER TABLE ONLY public.users
+    ADD CONSTRAINT users_pkey PRIMARY KEY (id);
+
+ALTER TABLE ONLY public.orders
+    ADD CONSTRAINT orders_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.users(id);
+
+CREATE UNIQUE INDEX users_email_idx ON public.users USING btree (email);
+"""
+
+MYSQL_DUMP = """-- MySQL dump 10.13  Distrib 8.0.36
+--
+-- Server version\t8.0.36
+
+/*!40101 SET NAMES utf8mb4 */;
+DROP TABLE IF EXISTS `users`;
+CREATE TABLE `users` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `name` varchar(100) DEFAULT 'it\\'s; fine' COMMENT 'Display name',
+  PRIMARY KEY (`id`),
+  KEY `users_name` (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='People';
+INSERT INTO `users` VALUES (1,'CREATE TABLE x (y int);');
+CREATE TABLE `posts` (
+  `id` int NOT NULL,
+  `user_id` int DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  CONSTRAINT `posts_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB;
+"""
+
+
+def write_dump(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_statements_are_split_on_top_level_delimiters():
+    lines = [
+        "CREATE TABLE a (b text DEFAULT 'x;y'); -- c;\n",
+        "CREATE FUNCTION f() AS $body$ SELECT 1; $body$;\n",
+        "DELIMITER ;;\n",
+        "CREATE TRIGGER t BEFORE INSERT ON a FOR EACH ROW SET NEW.b = 'z';;\n",
+        "DELIMITER ;\n",
+        "/* d; */ CREATE VIEW v AS SELECT 1;\n",
+    ]
+
+    assert list(read_statements(lines)) == [
+        "CREATE TABLE a (b text DEFAULT 'x;y')",
+        "CREATE FUNCTION f() AS $body$ SELECT 1; $body$",
+        "CREATE TRIGGER t BEFORE INSERT ON a FOR EACH ROW SET NEW.b = 'z'",
+        "/* d; */ CREATE VIEW v AS SELECT 1",
+    ]
+
+
+def test_pg_dump(tmp_path):
+    dump = parse_dump(write_dump(tmp_path, "schema.sql", PG_DUMP))
+
+    assert dump.flavor == "postgresql"
+    assert dump.server_version == "16.2"
+    # the partition is described as part of its parent, data is never parsed
+    assert dump.table_names(None) == ["active_users", "orders", "users"]
+
+    tables = dump.schema_tables(None)
+    users = tables["users"]
+    assert users.comment == "People who can log in"
+    assert [(c.name, c.comment) for c in users.columns] == [("id", ""), ("email", "Lower-cased")]
+    assert "PRIMARY KEY (id)" in users.constraints
+    assert any(c.startswith("CHECK") for c in users.constraints)
+    assert any("users_email_idx" in index for index in users.indexes)
+
+    orders = tables["orders"]
+    assert orders.partition_key == "RANGE (placed_on)"
+    assert orders.partition_count == 1
+    assert orders.columns[1].foreign_key == ("users", "id")
+
+    assert tables["active_users"].kind == "view"
+
+
+PARTITIONS_DUMP = """--
+-- PostgreSQL database dump
+--
+
+CREATE TABLE public.events (
+    id bigint NOT NULL,
+    kind text NOT NULL
+)
+PARTITION BY LIST (kind);
+
+CREATE TABLE public.events_click PARTITION OF public.events FOR VALUES IN ('click');
+
+CREATE TABLE public.events_view (
+    id bigint NOT NULL,
+    kind text NOT NULL
+);
+
+ALTER TABLE ONLY public.events ATTACH PARTITION public.events_view FOR VALUES IN ('view');
+ALTER TABLE ONLY public.events ATTACH PARTITION public.events_click FOR VALUES IN ('click');
+
+CREATE TABLE public.logs (
+    id bigint NOT NULL,
+    message text
+);
+
+CREATE TABLE public.logs_2023 (
+    archived_at timestamp
+)
+INHERITS (public.logs);
+"""
+
+
+def test_partitions_and_inheriting_tables_are_described_by_their_parent(tmp_path):
+    dump = parse_dump(write_dump(tmp_path, "schema.sql", PARTITIONS_DUMP))
+
+    assert dump.table_names(None) == ["events", "logs"]
+
+    tables = dump.schema_tables(None)
+    assert tables["events"].kind == "partitioned table"
+    assert tables["events"].partition_key == "LIST (kind)"
+    # a partition attached again is still counted once
+    assert tables["events"].partition_count == 2
+    assert tables["logs"].partition_count == 1
+
+    columns = tables["logs_2023"].columns
+    assert [column.name for column in columns] == ["id", "message", "archived_at"]
+
+
+def test_mysqldump(tmp_path):
+    dump = parse_dump(write_dump(tmp_path, "schema.sql", MYSQL_DUMP))
+
+    assert dump.flavor == "mysql"
+    assert dump.table_names(None) == ["posts", "users"]
+
+    tables = dump.schema_tables(None)
+    assert tables["users"].comment == "People"
+    assert tables["users"].columns[1].comment == "Display name"
+    assert tables["posts"].columns[1].foreign_key == ("users", "id")
+
+
+def test_sqlite_dump_matches_the_live_database(create_database, tmp_path):
+    db = create_database(
+        "app.db",
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE)",
+        "CREATE TABLE posts (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id))",
+        "CREATE INDEX posts_user_id ON posts (user_id)",
+        "INSERT INTO users VALUES (1, 'a;b')",
+    )
+    with closing(sqlite3.connect(db)) as conn:
+        text = "\n".join(conn.iterdump())
+
+    path = tmp_path / "app.sql.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(text)
+
+    dump = parse_dump(path)
+    assert dump.flavor == "sqlite"
+    assert dump.table_names(None) == ["posts", "users"]
+
+    tables = dump.schema_tables(None)
+    assert tables["posts"].columns[1].foreign_key == ("users", "id")
+    assert "CREATE INDEX posts_user_id ON posts (user_id);" in tables["posts"].ddl
+
+    prompt = asyncio.run(render_prompt(str(path), all_tables=True))
+    assert "no sample rows are available" in prompt
+    assert "# Table Schema for `users`" in prompt
@@ -0,0 +1,32 @@
+import re
+
+from click.testing import CliRunner
+
+from llm_sql_prompt import main
+from llm_sql_prompt.output import estimate_tokens
+
+TABLE_NAMES = ["t_a", "t_b", "t_c", "t_d", "t_e"]
+
+
+def render(db: str, *args) -> str:
+    result = CliRunner().invoke(main, [db, "--all", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_max_tokens_lists_the_tables_left_out(create_database):
+    db = create_database(
+        "app.db",
+        *[f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, name TEXT)" for name in TABLE_NAMES],
+        *[f"INSERT INTO {name} VALUES (1, 'x')" for name in TABLE_NAMES],
+    )
+    max_tokens = estimate_tokens(render(db)) // 2
+
+    prompt, omitted = render(db, "--max-tokens", str(max_tokens)).split(
+        "\nTables left out to keep this prompt short: "
+    )
+
+    written = re.findall(r"CREATE TABLE (\w+)", prompt)
+    assert estimate_tokens(prompt) <= max_tokens
+    assert 0 < len(written) < len(TABLE_NAMES)
+    assert written + re.findall(r"`(\w+)`", omitted) == TABLE_NAMES
@@ -0,0 +1,47 @@
+import asyncio
+import io
+import json
+
+from llm_sql_prompt.profiling import Profiler
+from llm_sql_prompt.prompt import render_prompt
+
+TABLE_NAMES = ["customers", "invoices", "payments"]
+
+
+def summary_rows(summary: str) -> dict[str, dict[str, list[str]]]:
+    "The summary's sections by title, each mapping its row names to their columns"
+    sections = {}
+    for block in summary.strip().split("\n\n")[1:]:
+        header, *lines = block.splitlines()
+        sections[header.split()[0]] = {line[:32].strip(): line[32:].split() for line in lines}
+
+    return sections
+
+
+def test_summary_breaks_queries_down(create_database):
+    db = create_database(
+        "app.db",
+        *[f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, note TEXT)" for name in TABLE_NAMES],
+        *[f"INSERT INTO {name} VALUES (1, 'a'), (2, 'b')" for name in TABLE_NAMES],
+    )
+
+    with Profiler() as profiler:
+        asyncio.run(render_prompt(db, all_tables=True))
+
+    stream = io.StringIO()
+    profiler.print_summary(stream)
+    sections = summary_rows(stream.getvalue())
+
+    assert {"connect", "list tables", "load schema", "sample"} <= sections["phase"].keys()
+    # queries, seconds, rows, bytes
+    assert sections["phase"]["list tables"][2] == str(len(TABLE_NAMES))
+    assert sections["query"]["list_tables"][0] == "1"
+    assert sorted(sections["table"]) == TABLE_NAMES
+    for queries, seconds, rows, size in sections["table"].values():
+        assert int(rows) >= 2
+        assert int(size) > 0
+
+    stream = io.StringIO()
+    profiler.write_json(stream)
+    records = json.loads(stream.getvalue())["queries"]
+    assert len(records) == sum(int(row[0]) for row in sections["phase"].values())
@@ -0,0 +1,62 @@
+from llm_sql_prompt.ranking import rank_tables, tokenize
+from llm_sql_prompt.schema import Column, Table
+
+TABLES = {
+    table.name: table
+    for table in [
+        Table("customers", columns=[Column("id", "integer"), Column("email", "text")]),
+        Table(
+            "invoices",
+            comment="Monthly revenue per customer",
+            columns=[
+                Column("id", "integer"),
+                Column("customer_id", "integer", foreign_key=("customers", "id")),
+                Column("amount", "numeric"),
+            ],
+        ),
+        Table(
+            "payments",
+            columns=[
+                Column("id", "integer"),
+                Column("invoice_id", "integer", foreign_key=("invoices", "id")),
+                Column("amount", "numeric"),
+            ],
+        ),
+        Table("audit_log", columns=[Column("id", "integer"), Column("message", "text")]),
+    ]
+}
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("userAccounts order_items the Categories") == [
+        "user",
+        "account",
+        "order",
+        "item",
+        "category",
+    ]
+
+
+def test_most_relevant_tables_come_first():
+    assert rank_tables("payment amounts", TABLES)[:2] == ["payments", "invoices"]
+
+
+def test_top_k_truncates_before_adding_referenced_tables():
+    # both tables have an amount, the shorter payments wins
+    assert rank_tables("amount", TABLES) == ["payments", "invoices", "customers"]
+    # only the foreign keys of the picked tables are followed
+    assert rank_tables("amount", TABLES, top_k=1) == ["payments", "invoices"]
+    # customers is only reached through the foreign key of invoices
+    assert rank_tables("monthly revenue", TABLES, top_k=1) == ["invoices", "customers"]
+
+
+def test_referenced_tables_are_added_once():
+    selected = rank_tables("invoice payment amount", TABLES, top_k=2)
+
+    assert selected[:2] == ["payments", "invoices"]
+    assert selected[2:] == ["customers"]
+
+
+def test_unmatched_question_selects_nothing(caplog):
+    assert rank_tables("weather forecast", TABLES) == []
+    assert "No tables matched the question" in caplog.text
@@ -0,0 +1,45 @@
+import asyncio
+import io
+import time
+
+import pytest
+
+from llm_sql_prompt import sqlite
+from llm_sql_prompt.dialect import get_dialect
+from llm_sql_prompt.output import PromptWriter
+from llm_sql_prompt.prompt import PromptOptions, generate_prompt
+
+
+@pytest.mark.parametrize("statement_timeout", [True, False])
+def test_slow_tables_are_described_without_data(create_database, monkeypatch, statement_timeout):
+    if not statement_timeout:
+        # the table's budget alone interrupts the query
+        monkeypatch.setattr(sqlite, "set_statement_timeout", lambda conn, timeout: None)
+
+    db = create_database(
+        "app.db",
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)",
+        "INSERT INTO users VALUES (1, 'a@example.com')",
+        # sorting a billion generated rows never finishes within the budget
+        """
+        CREATE VIEW slow AS
+        WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1000000000)
+        SELECT x FROM n ORDER BY random()
+        """,
+    )
+    dialect = get_dialect(db, safe_timeout=0.2)
+    output = io.StringIO()
+
+    started = time.perf_counter()
+    asyncio.run(
+        generate_prompt(
+            dialect,
+            PromptOptions(["slow", "users"], stats=True),
+            PromptWriter(output),
+        )
+    )
+    prompt = output.getvalue()
+
+    assert time.perf_counter() - started < 5
+    assert "(Reading data from `slow` timed out, no sample rows are shown)" in prompt
+    assert "'a@example.com'" in prompt
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from llm_sql_prompt.prompt import render_prompt
+
+
+@pytest.fixture
+def database(create_database):
+    return create_database(
+        "app.db",
+        'CREATE TABLE "weird name" (id INTEGER PRIMARY KEY, "the ""value""" TEXT)',
+        """INSERT INTO "weird name" VALUES (1, 'one'), (2, 'two')""",
+        "CREATE TABLE pairs (a INTEGER, b INTEGER, PRIMARY KEY (a, b)) WITHOUT ROWID",
+        "INSERT INTO pairs VALUES (1, 2)",
+        'CREATE VIEW "odd view" AS SELECT id FROM "weird name"',
+    )
+
+
+@pytest.mark.parametrize("strategy", ["auto", "random"])
+def test_names_needing_quotes_are_sampled(database, strategy):
+    prompt = asyncio.run(render_prompt(database, all_tables=True, sample_strategy=strategy))
+
+    assert "'one'" in prompt
+    assert "2 sample rows from the `weird name` table" in prompt
+    assert "1 sample rows from the `pairs` table" in prompt
+    assert "sample rows from the `odd view` table" in prompt
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from llm_sql_prompt import server as server_module
+from llm_sql_prompt.server import MAX_BODY_SIZE, PromptServer
+
+JSON = {"content-type": "application/json"}
+
+
+@pytest.fixture
+def database(create_database):
+    return create_database(
+        "app.db",
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)",
+        "INSERT INTO users VALUES (1, 'a@example.com')",
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id))",
+    )
+
+
+def request(server: PromptServer, body, path="/prompt", method="POST", headers=JSON):
+    async def send():
+        try:
+            return await server.handle(method, path, headers, json.dumps(body).encode())
+        finally:
+            await server.aclose()
+
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize(
+    "path, method, headers, status",
+    [
+        ("/other", "POST", JSON, 404),
+        ("/prompt", "GET", JSON, 405),
+        ("/prompt", "POST", {"content-type": "text/plain"}, 415),
+        ("/prompt", "POST", {}, 415),
+    ],
+)
+def test_other_requests_are_refused(database, path, method, headers, status):
+    body = {"url": database, "tables": ["users"]}
+
+    assert request(PromptServer(), body, path, method, headers)[0] == status
+
+
+@pytest.mark.parametrize(
+    "fields, error",
+    [
+        ({"all": True, "jobs": 8}, "Unknown fields: jobs"),
+        ({"all": True, "format": "yaml"}, "`format` must be one of sql, compact"),
+        ({}, "One of `tables`, `all` or `query` is required"),
+    ],
+)
+def test_invalid_requests_are_refused(database, fields, error):
+    status, response = request(PromptServer(), {"url": database, **fields})
+
+    assert status == 400
+    assert response == f"{error}\n"
+
+
+def test_requests_for_other_hosts_are_refused(database):
+    server = PromptServer(allowed_hosts={"localhost:8765", "127.0.0.1:8765"})
+    body = {"url": database, "tables": ["users"]}
+
+    status, response = request(server, body, headers={**JSON, "host": "evil.example:8765"})
+    assert status == 403
+
+    status, response = request(server, body, headers={**JSON, "host": "localhost:8765"})
+    assert status == 200
+    assert "'a@example.com'" in response
+
+
+@pytest.mark.parametrize(
+    "fields, error",
+    [
+        ({"tables": "users"}, "`tables` must be a list"),
+        ({"tables": ["users", 1]}, "`tables` must be a list of strings"),
+        ({"all": "yes"}, "`all` must be true or false"),
+        ({"all": True, "schema": ["main"]}, "`schema` must be a string"),
+        ({"all": True, "max_tokens": "1000"}, "`max_tokens` must be an integer"),
+        ({"all": True, "max_tokens": True}, "`max_tokens` must be an integer"),
+        ({"all": True, "max_tokens": 0}, "`max_tokens` must be at least 1"),
+    ],
+)
+def test_fields_of_the_wrong_type_are_refused(database, fields, error):
+    status, response = request(PromptServer(), {"url": database, **fields})
+
+    assert status == 400
+    assert response == f"{error}\n"
+
+
+def exchange(raw_request: bytes) -> bytes:
+    "Send a raw request to a server on a local port, returns the raw response"
+
+    async def send():
+        prompt_server = PromptServer()
+        server = await asyncio.start_server(prompt_server.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw_request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+
+        await prompt_server.aclose()
+        return response
+
+    return asyncio.run(send())
+
+
+def test_large_bodies_are_refused_unread():
+    response = exchange(
+        b"POST /prompt HTTP/1.1\r\n"
+        b"Content-Type: application/json\r\n"
+        + f"Content-Length: {MAX_BODY_SIZE + 1}\r\n\r\n".encode()
+    )
+
+    assert response.startswith(b"HTTP/1.1 413 Content Too Large\r\n")
+
+
+def test_requests_not_sent_in_time_are_answered(monkeypatch):
+    monkeypatch.setattr(server_module, "READ_TIMEOUT", 0.1)
+
+    # the body never arrives
+    response = exchange(b"POST /prompt HTTP/1.1\r\nContent-Length: 10\r\n\r\n")
+
+    assert response.startswith(b"HTTP/1.1 408 Request Timeout\r\n")
+
+
+def test_only_changed_tables_are_introspected_again(database):
+    loaded = []
+
+    async def run():
+        server = PromptServer()
+        dialect = server.database(database, None).dialect
+        load_schema = dialect.load_schema
+
+        async def record_load_schema(conn, table_names):
+            loaded.append(sorted(table_names))
+            return await load_schema(conn, table_names)
+
+        dialect.load_schema = record_load_schema
+        body = json.dumps({"url": database, "tables": ["users", "orders"]}).encode()
+        try:
+            first = await server.handle("POST", "/prompt", JSON, body)
+            with closing(sqlite3.connect(database)) as conn, conn:
+                conn.execute("ALTER TABLE orders ADD COLUMN total NUMERIC")
+            second = await server.handle("POST", "/prompt", JSON, body)
+        finally:
+            await server.aclose()
+
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first[0] == second[0] == 200
+    assert "total" not in first[1]
+    assert "total NUMERIC" in second[1]
+    assert loaded == [["orders", "users"], ["orders"]]
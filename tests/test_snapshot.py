@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from llm_sql_prompt.prompt import render_prompt
+
+
+@pytest.fixture
+def database(create_database):
+    return create_database(
+        "app.db",
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)",
+        "INSERT INTO users VALUES (1, 'a@example.com')",
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id))",
+        "INSERT INTO orders VALUES (1, 1)",
+    )
+
+
+def execute(db: str, *statements):
+    with closing(sqlite3.connect(db)) as conn, conn:
+        for statement in statements:
+            conn.execute(statement)
+
+
+def test_unchanged_tables_are_copied_from_the_snapshot(database, tmp_path, caplog):
+    since = str(tmp_path / "prompt.snapshot.json")
+    first = asyncio.run(render_prompt(database, all_tables=True, since=since))
+
+    # new rows don't change the schema, the snapshot's sample rows are kept
+    execute(database, "INSERT INTO users VALUES (2, 'b@example.com')")
+    with caplog.at_level("INFO"):
+        second = asyncio.run(render_prompt(database, all_tables=True, since=since))
+
+    assert second == first
+    assert "0 of 2 tables changed since the snapshot" in caplog.text
+
+
+def test_changed_tables_are_described_again(database, tmp_path, caplog):
+    since = str(tmp_path / "prompt.snapshot.json")
+    asyncio.run(render_prompt(database, all_tables=True, since=since))
+
+    execute(
+        database,
+        "INSERT INTO users VALUES (2, 'b@example.com')",
+        "INSERT INTO orders VALUES (2, 2)",
+        "ALTER TABLE orders ADD COLUMN total NUMERIC",
+    )
+    with caplog.at_level("INFO"):
+        prompt = asyncio.run(render_prompt(database, all_tables=True, since=since))
+
+    assert "1 of 2 tables changed since the snapshot" in caplog.text
+    assert "total NUMERIC" in prompt
+    assert "2 sample rows from the `orders` table" in prompt
+    assert "1 sample rows from the `users` table" in prompt
+
+
+def test_snapshot_taken_with_other_settings_is_ignored(database, tmp_path, caplog):
+    since = str(tmp_path / "prompt.snapshot.json")
+    asyncio.run(render_prompt(database, all_tables=True, since=since))
+
+    with caplog.at_level("INFO"):
+        prompt = asyncio.run(
+            render_prompt(database, all_tables=True, since=since, include_data=False)
+        )
+
+    assert "2 of 2 tables changed since the snapshot" in caplog.text
+    assert "sample rows" not in prompt